@@ -1,10 +1,15 @@
-from typing import Dict, List, Optional, Any
-import openai
+from typing import Dict, List, Optional, Any, Iterator, AsyncIterator
 from datetime import datetime, timezone
 import json
 import logging
 from database import SupabaseManager
-from pydantic import BaseModel
+from llm_cache import LLMCache, get_default_cache
+from llm_client import LLMClient, get_default_client
+from llm_executor import AsyncLLMExecutor, get_default_executor
+from prompt_compaction import PromptCompactor, get_default_compactor
+from json_stream import StreamingArrayParser
+from single_flight import SingleFlight
+from pydantic import BaseModel, ValidationError
 from enum import Enum
 
 # Configure logging
@@ -33,99 +38,237 @@ class TaskAnalysis(BaseModel):
     completion_percentage: float
     blockers: Optional[List[str]] = []
     dependencies: Optional[List[str]] = []
+    risks: Optional[List[str]] = []
 
 class AIAgent:
-    def __init__(self, openai_api_key: str):
+    def __init__(self,
+                 openai_api_key: str,
+                 cache: Optional[LLMCache] = None,
+                 compactor: Optional[PromptCompactor] = None,
+                 llm_client: Optional[LLMClient] = None,
+                 executor: Optional[AsyncLLMExecutor] = None):
         """Initialize the enhanced AI Agent"""
         if not openai_api_key:
             raise ValueError("OpenAI API key is required.")
         
-        openai.api_key = openai_api_key
         self.db = SupabaseManager()
+        self.cache = cache or get_default_cache()
+        self.compactor = compactor or get_default_compactor()
+        # The shared client, so its pool, breaker and stats cover this agent too
+        self.llm = llm_client or get_default_client(api_key=openai_api_key)
+        # Identical updates analysed at the same time share one LLM call
+        self.single_flight = SingleFlight("detailed_task_analysis")
+        # Runs the async methods for synchronous callers; its loop starts on first use
+        self._sync_executor = executor or get_default_executor()
+
+    @staticmethod
+    def _chat_messages(message: str) -> List[Dict[str, str]]:
+        prompt = f"You are a helpful assistant. Respond to the following message: {message}"
+        return [
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": prompt},
+        ]
 
     def process_message(self, message: str) -> str:
         """
         Process the incoming message and generate a response using OpenAI.
+        Blocking wrapper around aprocess_message for synchronous callers.
         """
         try:
-            prompt = f"You are a helpful assistant. Respond to the following message: {message}"
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.7,
-            )
-            return response['choices'][0]['message']['content']
+            return self._sync_executor.run(self.aprocess_message, message)
         except Exception as e:
             logger.error(f"Error in process_message: {str(e)}")
             return "Sorry, I encountered an error processing your message."
 
+    def stream_message(self, message: str) -> Iterator[str]:
+        """
+        Like process_message, but yield the response token by token as the model produces it.
+        Raises if the stream fails after tokens were yielded, since the reply is incomplete.
+        """
+        yield from self._sync_executor.iterate(self.astream_message, message)
+
+    async def aprocess_message(self, message: str) -> str:
+        """
+        Async version of process_message that doesn't hold a thread during the LLM call.
+        """
+        try:
+            messages = self._chat_messages(message)
+            cache_key = self.cache.make_key("gpt-3.5-turbo", messages, 0.7)
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                return cached
+
+            content = await self.llm.chat(messages, model="gpt-3.5-turbo", temperature=0.7)
+            await self.cache.aset(cache_key, content)
+            return content
+        except Exception as e:
+            logger.error(f"Error in aprocess_message: {str(e)}")
+            return "Sorry, I encountered an error processing your message."
+
+    async def astream_message(self, message: str) -> AsyncIterator[str]:
+        """
+        Async version of stream_message.
+
+        An error before the first token yields the usual apology; an error
+        after it is re-raised, so callers can't mistake a cut-off reply for
+        a complete one.
+        """
+        messages = self._chat_messages(message)
+        cache_key = self.cache.make_key("gpt-3.5-turbo", messages, 0.7)
+        cached = await self.cache.aget(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        try:
+            async for token in self.llm.stream_chat(messages, model="gpt-3.5-turbo", temperature=0.7):
+                chunks.append(token)
+                yield token
+            await self.cache.aset(cache_key, "".join(chunks))
+        except Exception as e:
+            logger.error(f"Error in astream_message: {str(e)}")
+            if chunks:
+                raise
+            yield "Sorry, I encountered an error processing your message."
+
+    def _task_analysis_messages(self, response_text: str) -> List[Dict[str, str]]:
+        template = """
+        Analyze the following employee update in detail:
+
+        {update}
+
+        Provide a comprehensive analysis including:
+        1. Task breakdown
+        2. Dependencies
+        3. Blockers
+        4. Estimated hours
+        5. Priority levels
+        6. Current status
+        7. Completion percentage
+        8. Risks
+
+        Format the response as JSON with the following structure:
+        {{
+            "tasks": [
+                {{
+                    "name": "task name",
+                    "description": "description",
+                    "priority": "high/medium/low",
+                    "status": "not_started/in_progress/completed/blocked/delayed",
+                    "estimated_hours": float,
+                    "completion_percentage": float,
+                    "blockers": ["blocker1", "blocker2"],
+                    "dependencies": ["dependency1", "dependency2"],
+                    "risks": ["risk1", "risk2"]
+                }}
+            ],
+            "overall_assessment": "assessment text",
+            "recommendations": ["rec1", "rec2"]
+        }}
+        """
+        # Long or repetitive updates are de-duplicated and trimmed to the token budget
+        prompt = self.compactor.compact("detailed_task_analysis", template, {'update': response_text})
+        return [
+            {"role": "system", "content": "You are an AI task analysis expert."},
+            {"role": "user", "content": prompt},
+        ]
+
+    @staticmethod
+    def _validate_task(task: Any) -> Optional[TaskAnalysis]:
+        """Validate one task object from the model against TaskAnalysis, or None if it doesn't fit"""
+        if not isinstance(task, dict):
+            return None
+        task = dict(task)
+        # The prompt asks for "name"; TaskAnalysis calls it task_name
+        if 'task_name' not in task and 'name' in task:
+            task['task_name'] = task.pop('name')
+        # Forgive "In Progress" / "High" style spellings of the enum values
+        for field in ('priority', 'status'):
+            if isinstance(task.get(field), str):
+                task[field] = task[field].strip().lower().replace(' ', '_').replace('-', '_')
+        if isinstance(task.get('completion_percentage'), str):
+            task['completion_percentage'] = task['completion_percentage'].strip().rstrip('%')
+        try:
+            return TaskAnalysis.parse_obj(task)
+        except ValidationError as e:
+            logger.warning(f"Skipping task that failed validation: {e.errors()}")
+            return None
+
+    async def stream_task_analysis(self,
+                                   response_text: str,
+                                   parser: Optional[StreamingArrayParser] = None) -> AsyncIterator[TaskAnalysis]:
+        """
+        Stream the detailed analysis of an update, yielding each task as soon
+        as the model has finished writing it and it validates as a TaskAnalysis.
+
+        Pass a ``parser`` to read the rest of the answer afterwards with
+        ``parser.finish()``. Answers are cached only if they arrived complete.
+        """
+        parser = parser if parser is not None else StreamingArrayParser("tasks")
+        messages = self._task_analysis_messages(response_text)
+        cache_key = self.cache.make_key("gpt-3.5-turbo", messages, 0.3)
+        cached = await self.cache.aget(cache_key)
+
+        if cached is not None:
+            for element in parser.feed(cached):
+                task = self._validate_task(element)
+                if task is not None:
+                    yield task
+            return
+
+        async for token in self.llm.stream_chat(messages, model="gpt-3.5-turbo", temperature=0.3):
+            for element in parser.feed(token):
+                task = self._validate_task(element)
+                if task is not None:
+                    yield task
+        if parser.complete and not parser.malformed:
+            await self.cache.aset(cache_key, parser.text)
+
     async def detailed_task_analysis(self, response_text: str) -> Dict[str, Any]:
         """
         Perform detailed analysis of tasks with dependencies and blockers.
+
+        Tasks are parsed and validated while the answer streams in. Malformed
+        or invalid tasks are skipped rather than failing the whole analysis,
+        and a truncated answer (or one that fails mid-stream) is returned as
+        far as it parses, marked ``partial``. Concurrent calls for the same
+        update share one analysis.
         """
+        return await self.single_flight.run(response_text, self._detailed_task_analysis, response_text)
+
+    async def _detailed_task_analysis(self, response_text: str) -> Dict[str, Any]:
+        parser = StreamingArrayParser("tasks")
+        tasks: List[TaskAnalysis] = []
+        error = None
         try:
-            prompt = f"""
-            Analyze the following employee update in detail:
-
-            {response_text}
-
-            Provide a comprehensive analysis including:
-            1. Task breakdown
-            2. Dependencies
-            3. Blockers
-            4. Estimated hours
-            5. Priority levels
-            6. Current status
-            7. Completion percentage
-            8. Risks
-
-            Format the response as JSON with the following structure:
-            {{
-                "tasks": [
-                    {{
-                        "name": "task name",
-                        "description": "description",
-                        "priority": "high/medium/low",
-                        "status": "not_started/in_progress/completed/blocked/delayed",
-                        "estimated_hours": float,
-                        "completion_percentage": float,
-                        "blockers": ["blocker1", "blocker2"],
-                        "dependencies": ["dependency1", "dependency2"],
-                        "risks": ["risk1", "risk2"]
-                    }}
-                ],
-                "overall_assessment": "assessment text",
-                "recommendations": ["rec1", "rec2"]
-            }}
-            """
-
-            completion = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an AI task analysis expert."},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.3
-            )
-
-            # Log the full response for debugging
-            logger.info(f"OpenAI Response: {completion}")
-
-            # Extract the content and clean up the JSON string
-            response_content = completion["choices"][0]["message"]["content"]
-            clean_json = response_content.strip("```json").strip("```")
-
-            # Parse and return the cleaned JSON content
-            return json.loads(clean_json)
-        except json.JSONDecodeError as e:
-            logger.error(f"Error in detailed_task_analysis: {str(e)} - Full Response: {completion}")
-            return {"error": f"Invalid JSON response: {str(e)}"}
+            async for task in self.stream_task_analysis(response_text, parser):
+                tasks.append(task)
         except Exception as e:
             logger.error(f"Error in detailed_task_analysis: {str(e)}")
-            return {"error": str(e)}
+            error = str(e)
+
+        analysis, complete = parser.finish()
+        if not isinstance(analysis, dict):
+            if error is None:
+                logger.error(f"Error in detailed_task_analysis: no JSON in response - Full Response: {parser.text}")
+                error = "Invalid JSON response"
+            return {"error": error}
+
+        # Tasks that only the repaired document contains (e.g. the one cut off at the end)
+        recovered = analysis.get('tasks') if isinstance(analysis.get('tasks'), list) else []
+        for element in recovered[parser.elements:]:
+            task = self._validate_task(element)
+            if task is not None:
+                tasks.append(task)
+
+        analysis['tasks'] = [task.dict() for task in tasks]
+        analysis['skipped_tasks'] = max(parser.elements, len(recovered)) - len(tasks)
+        if not complete or error is not None:
+            analysis['partial'] = True
+        if error is not None:
+            analysis['error'] = error
+        return analysis
 
 # Example usage
 if __name__ == "__main__":
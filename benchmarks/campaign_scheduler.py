@@ -0,0 +1,151 @@
+"""
+CampaignScheduler over a simulated day: per-minute send peak with the
+jittered spread vs. everyone at 09:00, how two shards split the employees,
+a scheduler killed mid-campaign and restarted on the same state file,
+which must finish the campaign without sending anyone anything twice, and
+the real WhatsAppIntegrator daily reminder against a fake Whapi server
+that rejects some sends and accepts-then-stalls others: rejected sends are
+retried, possibly-delivered ones are not, and nobody gets a message twice.
+
+    python -m benchmarks.campaign_scheduler --employees 2000 --spread 1800
+"""
+
+import os
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+from collections import Counter
+from datetime import date, datetime, time, timedelta, timezone
+
+from benchmarks.fake_whapi import FakeWhapiServer
+from campaign_scheduler import CampaignJob, CampaignScheduler, JobStateStore, default_jobs
+from whatsapp_service import WhatsAppService
+
+TIMEZONES = [None, None, None, "Asia/Kolkata", "Europe/London", "America/New_York", "Asia/Singapore"]
+
+
+def synthetic_employees(count: int):
+    return [
+        {"id": f"emp-{i}", "whatsapp_number": f"+100000{i:05d}", "timezone": random.choice(TIMEZONES)}
+        for i in range(count)
+    ]
+
+
+class Recorder:
+    def __init__(self):
+        self.sends = []  # (employee id, simulated time)
+        self.now = None
+
+    async def send(self, employee):
+        self.sends.append((employee["id"], self.now))
+
+
+async def simulate(scheduler, recorder, start, end, step=30):
+    now = start
+    while now < end:
+        recorder.now = now
+        await scheduler.tick(now)
+        while scheduler.stats()['in_flight']:
+            await asyncio.sleep(0.001)
+        now += timedelta(seconds=step)
+
+
+def scheduler_for(employees, recorder, path, spread, shard_index=0, shard_count=1):
+    async def load():
+        return employees
+    job = CampaignJob("morning_update_request", time(9, 0), recorder.send, spread=spread)
+    return CampaignScheduler(load, [job], store=JobStateStore(path), default_timezone="Asia/Kolkata",
+                             shard_index=shard_index, shard_count=shard_count, max_concurrency=50)
+
+
+async def integrator_check(people, path, day) -> None:
+    # The integrator's data manager opens no connections with this; its SQL is answered below
+    os.environ["DB_POOL_MIN_SIZE"] = "0"
+    from whatsapp.integrator import WhatsAppIntegrator
+
+    server = FakeWhapiServer(error_rate=0.1, stall_rate=0.05, stall_seconds=1.0, seed=7)
+    await server.start()
+    integrator = WhatsAppIntegrator(whatsapp=WhatsAppService(base_url=server.base_url, request_timeout=0.3))
+    employee_by_number = {employee["whatsapp_number"]: employee["id"] for employee in people}
+    logged = 0
+
+    async def execute(query, params, fetch="one", commit=True):
+        nonlocal logged
+        if "FROM employees" in query:
+            return (employee_by_number[params[0]],)
+        if "INSERT INTO message_logs" in query:
+            logged += 1
+            return (logged,)
+        raise NotImplementedError(query)
+
+    integrator.data_manager._execute = execute
+    jobs = [job._replace(spread=120) for job in default_jobs(integrator) if job.name == "daily_reminder"]
+
+    async def load():
+        return people
+    scheduler = CampaignScheduler(load, jobs, store=JobStateStore(path), default_timezone="UTC", max_concurrency=50)
+    recorder = Recorder()
+    start = datetime.combine(day, jobs[0].at, tzinfo=timezone.utc) - timedelta(minutes=1)
+    try:
+        await simulate(scheduler, recorder, start, start + timedelta(minutes=20))
+    finally:
+        await integrator.close()
+        await server.stop()
+    stats = scheduler.stats()
+    print(f"integrator: {len(people)} employees, {len(server.delivered)} received the reminder, "
+          f"max {max(server.delivered.values())} per employee; {stats['failed']} rejected sends retried, "
+          f"{stats['unconfirmed']} unconfirmed not retried, {logged} logged; runs {stats['runs']}")
+
+
+async def main(employees: int, spread: float) -> None:
+    people = synthetic_employees(employees)
+    day = date(2026, 10, 16)
+    # Every timezone's 09:00 on ``day`` falls in here, and no other day's does
+    start = datetime.combine(day, time(0, 0), tzinfo=timezone.utc) - timedelta(hours=4)
+    end = start + timedelta(hours=28)
+    workdir = tempfile.mkdtemp()
+
+    for label, job_spread in (("all at 09:00", 0.0), (f"spread {spread:g}s", spread)):
+        recorder = Recorder()
+        scheduler = scheduler_for(people, recorder, os.path.join(workdir, f"{job_spread}.db"), job_spread)
+        await simulate(scheduler, recorder, start, end)
+        per_minute = Counter(sent.replace(second=0) for _, sent in recorder.sends)
+        print(f"{label}: {len(recorder.sends)} sends, peak {max(per_minute.values())}/min "
+              f"over {len(per_minute)} minutes")
+
+    shard_sends = []
+    for shard in range(2):
+        recorder = Recorder()
+        scheduler = scheduler_for(people, recorder, os.path.join(workdir, f"shard{shard}.db"), spread, shard, 2)
+        await simulate(scheduler, recorder, start, end)
+        shard_sends.append({employee for employee, _ in recorder.sends})
+    print(f"2 shards: {len(shard_sends[0])} + {len(shard_sends[1])} employees, "
+          f"overlap {len(shard_sends[0] & shard_sends[1])}, missing {employees - len(shard_sends[0] | shard_sends[1])}")
+
+    # Kill the scheduler half way through the Kolkata morning, restart on the same file
+    path = os.path.join(workdir, "restart.db")
+    recorder = Recorder()
+    crash = datetime.combine(day, time(3, 45), tzinfo=timezone.utc)
+    await simulate(scheduler_for(people, recorder, path, spread), recorder, start, crash)
+    before = len(recorder.sends)
+    await simulate(scheduler_for(people, recorder, path, spread), recorder, crash, end)
+    per_employee = Counter(employee for employee, _ in recorder.sends)
+    print(f"restart: {before} sends before, {len(recorder.sends) - before} after, "
+          f"{sum(1 for n in per_employee.values() if n > 1)} employees messaged twice, "
+          f"{employees - len(per_employee)} employees never messaged")
+
+    # All in UTC, so everyone's 18:00 reminder falls in the simulated window
+    utc_people = [dict(employee, timezone=None) for employee in people[:300]]
+    await integrator_check(utc_people, os.path.join(workdir, "integrator.db"), day)
+
+
+if __name__ == "__main__":
+    logging.disable(logging.ERROR)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--spread", type=float, default=1800)
+    args = parser.parse_args()
+    random.seed(7)
+    asyncio.run(main(args.employees, args.spread))
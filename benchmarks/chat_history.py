@@ -0,0 +1,87 @@
+"""
+Chat history page latency: keyset pagination vs OFFSET.
+
+Fills a SQLite chat_messages table (same model and composite index as
+production) with ``--rows`` messages, then times fetching a page near
+the newest messages, in the middle and at the very end, once with
+ChatMessage.page() and once with LIMIT/OFFSET.
+
+    python -m benchmarks.chat_history --rows 1000000
+"""
+
+import os
+import time
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from chat_models import ChatMessage, Base
+
+
+def populate(engine, rows: int) -> None:
+    start = datetime(2024, 1, 1)
+    batch = 50_000
+    with engine.begin() as conn:
+        for offset in range(0, rows, batch):
+            conn.execute(ChatMessage.__table__.insert(), [
+                {
+                    'content': f"message {i}",
+                    # Pairs of messages share a timestamp so the id tie-break matters
+                    'timestamp': start + timedelta(seconds=i // 2),
+                    'message_type': 'user' if i % 2 == 0 else 'system',
+                    'status': 'pending'
+                }
+                for i in range(offset, min(offset + batch, rows))
+            ])
+
+
+def timed(fn, repeat: int = 20) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main(rows: int, limit: int) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "chat_history.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    populate(engine, rows)
+    db = sessionmaker(bind=engine)()
+
+    # Cursors for the first page, the middle of the table and the last page
+    positions = {'newest': 0, 'middle': rows // 2, 'oldest': rows - limit}
+    print(f"{rows} rows, page size {limit}")
+    for label, offset in positions.items():
+        before = None
+        if offset:
+            message_id, timestamp = db.query(ChatMessage.id, ChatMessage.timestamp).order_by(
+                ChatMessage.timestamp.desc(), ChatMessage.id.desc()
+            ).offset(offset - 1).limit(1).one()
+            before = ChatMessage.encode_cursor(timestamp, message_id)
+
+        keyset_page, _ = ChatMessage.page(db, before=before, limit=limit)
+        offset_rows = db.query(
+            ChatMessage.id, ChatMessage.content, ChatMessage.timestamp, ChatMessage.message_type, ChatMessage.status
+        ).order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc()).offset(offset).limit(limit).all()
+        assert keyset_page == ChatMessage.serialize_rows(offset_rows), label
+
+        keyset_ms = timed(lambda: ChatMessage.page(db, before=before, limit=limit))
+        offset_ms = timed(lambda: ChatMessage.serialize_rows(
+            db.query(
+                ChatMessage.id, ChatMessage.content, ChatMessage.timestamp, ChatMessage.message_type, ChatMessage.status
+            ).order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc()).offset(offset).limit(limit).all()
+        ))
+        print(f"{label:>7}: keyset {keyset_ms:7.2f}ms   offset {offset_ms:8.2f}ms")
+    db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+    main(args.rows, args.limit)
@@ -0,0 +1,88 @@
+"""
+Load test for the Flask chat backend with a fake slow LLM.
+
+Runs local_chat_interface in-process on a threaded WSGI server, backed by a
+throwaway SQLite database and a fake LLM client that sleeps
+for ``--latency`` seconds, then fires ``--chats`` concurrent
+/api/send_message requests. With LLM calls multiplexed on the executor's
+event loop, total time stays close to one LLM latency rather than growing
+with the number of chats.
+
+    python -m benchmarks.chat_load --chats 300 --latency 1.0
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+
+import aiohttp
+
+from benchmarks.fakes import FakeLLMClient
+
+
+def offline_app(latency: float, db_path: str):
+    """Import the chat app with SQLite, no Supabase/Postgres and a fake LLM."""
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    import database
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    database.engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    database.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=database.engine)
+
+    import ai_agent
+    import enhanced_data_manager
+    ai_agent.SupabaseManager = lambda: None
+    enhanced_data_manager.EnhancedDataManager.__init__ = lambda self, *args, **kwargs: None
+
+    import local_chat_interface
+    local_chat_interface.ai_agent.llm = FakeLLMClient(latency=latency, content="Sure, here is an answer.")
+    return local_chat_interface
+
+
+async def fire(url: str, chats: int):
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def one(i: int):
+            started = time.perf_counter()
+            async with session.post(url, json={"message": f"chat {i}"}) as response:
+                await response.read()
+                return response.status, time.perf_counter() - started
+
+        return await asyncio.gather(*(one(i) for i in range(chats)))
+
+
+def main(chats: int, latency: float, port: int):
+    from werkzeug.serving import make_server
+
+    db_path = os.path.join(tempfile.mkdtemp(), "chat_load.db")
+    chat = offline_app(latency, db_path)
+    chat.ai_agent.cache.clear()
+    server = make_server("127.0.0.1", port, chat.app, threaded=True)
+    server.socket.listen(1024)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    started = time.perf_counter()
+    results = asyncio.run(fire(f"http://127.0.0.1:{port}/api/send_message", chats))
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    latencies = sorted(duration for _, duration in results)
+    print(f"{chats} concurrent chats, fake LLM latency {latency}s")
+    print(f"total {elapsed:.2f}s, p50 {latencies[len(latencies) // 2]:.2f}s, max {latencies[-1]:.2f}s")
+    print(f"statuses: {statuses}, executor: {chat.llm_executor.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chats", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+    sys.exit(main(args.chats, args.latency, args.port))
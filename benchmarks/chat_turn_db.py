@@ -0,0 +1,81 @@
+"""
+Database time per chat turn: the old two-commit flow vs ChatMessage.record_turn().
+
+The old flow committed the user message, committed the reply separately
+and then serialized both (reloading each after the commit). The new flow
+writes both rows in one transaction. The LLM call is left out, so the
+timings are pure database time.
+
+    python -m benchmarks.chat_turn_db --turns 2000
+    python -m benchmarks.chat_turn_db --url postgresql://localhost/chat_bench
+"""
+
+import os
+import time
+import argparse
+import tempfile
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from chat_models import ChatMessage, Base
+
+
+def two_commit_turn(db, content: str):
+    user_message = ChatMessage.create_user_message(content)
+    db.add(user_message)
+    db.commit()
+    ai_message = ChatMessage.create_system_message(f"reply to {content}")
+    db.add(ai_message)
+    db.commit()
+    return user_message.to_dict(), ai_message.to_dict()
+
+
+def single_transaction_turn(db, content: str):
+    user_message = ChatMessage.create_user_message(content)
+    return ChatMessage.record_turn(db, user_message, f"reply to {content}")
+
+
+def measure(Session, turn, turns: int, counters: dict):
+    counters.update(statements=0, commits=0)
+    started = time.perf_counter()
+    for i in range(turns):
+        # A fresh session per turn, like a per-request session in the app
+        db = Session()
+        try:
+            turn(db, f"message {i}")
+        finally:
+            db.close()
+    elapsed = time.perf_counter() - started
+    return elapsed / turns * 1000, counters['statements'] / turns, counters['commits'] / turns
+
+
+def main(url: str, turns: int) -> None:
+    if url is None:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'chat_turn.db')}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    counters = {'statements': 0, 'commits': 0}
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count_statement(*args):
+        counters['statements'] += 1
+
+    @event.listens_for(engine, 'commit')
+    def count_commit(*args):
+        counters['commits'] += 1
+
+    print(f"{turns} turns against {engine.url.get_backend_name()}")
+    for label, turn in (('two commits', two_commit_turn), ('one transaction', single_transaction_turn)):
+        ms, statements, commits = measure(Session, turn, turns, counters)
+        print(f"{label:>15}: {ms:.3f}ms/turn, {statements:.1f} statements, {commits:.1f} commits")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default=None, help="SQLAlchemy URL (default: a temporary SQLite file)")
+    parser.add_argument("--turns", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.url, args.turns)
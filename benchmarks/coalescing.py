@@ -0,0 +1,62 @@
+"""
+Identical concurrent calls with and without single-flight coalescing: N
+callers asking for the same employee's insights (as a broadcast and
+webhook replies do) and N duplicate personalized messages, against a fake
+LLM with --latency seconds per call. "uncoalesced" calls the underlying
+method directly, which is what every caller used to do.
+
+    python -m benchmarks.coalescing --callers 50 --latency 0.2
+"""
+
+import time
+import asyncio
+import logging
+import argparse
+
+from benchmarks.fakes import FakeDataManager, FakeLLMClient
+from llm_cache import LLMCache
+from performance_analyzer import PerformanceAnalyzer
+from performance_rollup import PerformanceRollup
+from whatsapp.dynamic_templates import DynamicTemplateGenerator
+
+
+async def measure(label: str, fake: FakeLLMClient, callers: int, call) -> None:
+    calls_before = fake.calls
+    started = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(callers)))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {callers} callers in {elapsed:.2f}s, {fake.calls - calls_before} LLM calls")
+
+
+async def main(callers: int, latency: float) -> None:
+    fake = FakeLLMClient(latency=latency, content="Good morning! Here is your plan for today.")
+
+    def analyzer() -> PerformanceAnalyzer:
+        # No LLM cache and a fresh rollup, so every execution does the full work
+        return PerformanceAnalyzer(cache=LLMCache(max_entries=0), data_manager=FakeDataManager(),
+                                   rollup=PerformanceRollup(), llm_client=fake)
+
+    plain = analyzer()
+    await measure("insights uncoalesced", fake, callers,
+                  lambda: plain._generate_insights("employee-1", "1w"))
+    coalesced = analyzer()
+    await measure("insights coalesced", fake, callers,
+                  lambda: coalesced.generate_insights("employee-1", "1w"))
+    print(f"  {coalesced.single_flight.stats()}")
+
+    generator = DynamicTemplateGenerator(analyzer(), llm_client=fake)
+    await measure("messages uncoalesced", fake, callers,
+                  lambda: generator._generate_personalized_message("employee-1", "daily_updates/morning", None))
+    generator = DynamicTemplateGenerator(analyzer(), llm_client=fake)
+    await measure("messages coalesced", fake, callers,
+                  lambda: generator.generate_personalized_message("employee-1", "daily_updates/morning"))
+    print(f"  {generator.single_flight.stats()}")
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--callers", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+    asyncio.run(main(args.callers, args.latency))
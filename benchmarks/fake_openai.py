@@ -0,0 +1,119 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint, for running
+LLMClient (and everything built on it) offline.
+
+    python -m benchmarks.fake_openai --port 8900 --latency 0.3 --tail-rate 0.05
+    OPENAI_API_BASE=http://127.0.0.1:8900/v1 python main.py
+"""
+
+import json
+import time
+import random
+import asyncio
+import argparse
+import itertools
+from typing import Tuple
+
+from aiohttp import web
+
+from benchmarks.fakes import fake_answer
+
+
+class FakeOpenAIServer:
+    """
+    Answers ``POST /v1/chat/completions`` (plain or ``stream: true``) after
+    ``latency`` seconds. A ``tail_rate`` share of requests is slowed to
+    ``tail_latency`` seconds and an ``error_rate`` share fails with a 503,
+    to exercise deadlines, retries and hedging.
+    """
+
+    def __init__(self,
+                 latency: float = 0.0,
+                 tail_rate: float = 0.0,
+                 tail_latency: float = 2.0,
+                 error_rate: float = 0.0,
+                 content: str = "Sure, here is an answer.",
+                 seed: int = 0):
+        self.latency = latency
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.error_rate = error_rate
+        self.content = content
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._runner = None
+        self.base_url = None
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        body = await request.json()
+        if self._random.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response({"error": {"message": "The server is overloaded"}}, status=503)
+        slow = self._random.random() < self.tail_rate
+        await asyncio.sleep(self.tail_latency if slow else self.latency)
+
+        completion_id = f"chatcmpl-fake-{next(self._ids)}"
+        content = fake_answer(body["messages"][-1].get("content", ""), self.content)
+        if not body.get("stream"):
+            return web.json_response({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}]
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for token in content.split(" "):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {"content": token + " "}}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> Tuple[str, int]:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}/v1"
+        return host, port
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def serve(port: int, **options) -> None:
+    server = FakeOpenAIServer(**options)
+    await server.start(port=port)
+    print(f"Fake OpenAI API on {server.base_url} (Ctrl+C to stop)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--tail-rate", type=float, default=0.0)
+    parser.add_argument("--tail-latency", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.port, latency=args.latency, tail_rate=args.tail_rate,
+                          tail_latency=args.tail_latency, error_rate=args.error_rate))
+    except KeyboardInterrupt:
+        pass
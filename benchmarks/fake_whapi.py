@@ -0,0 +1,64 @@
+# fake_whapi.py
+
+import random
+import asyncio
+import itertools
+from collections import Counter
+from typing import Tuple
+
+from aiohttp import web
+
+
+class FakeWhapiServer:
+    """
+    Minimal local stand-in for the Whapi endpoints used by WhatsAppService.
+    Every send is acknowledged with a fake message id after an optional delay.
+
+    ``error_rate`` of sends are rejected with a 503 before being accepted;
+    ``stall_rate`` are accepted (counted as delivered) and then answered only
+    after ``stall_seconds``, so a client with a shorter timeout gives up on a
+    message that did go out. ``delivered`` counts accepted sends per recipient.
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0,
+                 stall_rate: float = 0.0, stall_seconds: float = 5.0, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.requests = 0
+        self.delivered = Counter()
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._runner = None
+        self.base_url = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        body = await request.json() if request.can_read_body else {}
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        roll = self._random.random()
+        if roll < self.error_rate:
+            return web.json_response({"error": "unavailable"}, status=503)
+        self.delivered[body.get("to")] += 1
+        if roll < self.error_rate + self.stall_rate:
+            await asyncio.sleep(self.stall_seconds)
+        return web.json_response({"sent": True, "message": {"id": f"fake-{next(self._ids)}"}})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> Tuple[str, int]:
+        app = web.Application()
+        app.router.add_post("/messages/{kind}", self._handle)
+        app.router.add_post("/messages/{message_id}/read", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return host, port
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
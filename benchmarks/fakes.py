@@ -0,0 +1,99 @@
+"""
+In-process fakes shared by the offline benchmarks.
+"""
+
+import re
+import json
+import asyncio
+import random
+from datetime import date, timedelta
+from typing import Any, AsyncIterator, Dict, List
+
+from circuit_breaker import CircuitBreaker
+
+
+def fake_answer(prompt: str, content: str) -> str:
+    """
+    Batch scoring prompts (numbered ``[n] Task Context`` entries) get a JSON
+    array with one score per entry; anything else gets ``content``.
+    """
+    entry_ids = re.findall(r"^\[(\d+)\] Task Context", prompt, re.MULTILINE)
+    if not entry_ids:
+        return content
+    return json.dumps([
+        {"id": int(entry_id), "completeness": 8, "clarity": 7, "professional_tone": 9,
+         "problem_solving": 7, "average_score": 7.75, "feedback": "Add more detail."}
+        for entry_id in entry_ids
+    ])
+
+
+class FakeLLMClient:
+    """
+    In-process stand-in for ``llm_client.LLMClient`` whose calls sleep for
+    ``latency`` seconds (plus up to ``jitter``) before answering with
+    ``fake_answer``. Streams pause ``token_delay`` seconds between tokens.
+    """
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.0, content: str = '{"average_score": 8}',
+                 token_delay: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.content = content
+        self.token_delay = token_delay
+        self.calls = 0
+        # Never fed, so always closed; present for callers that check it
+        self.breaker = CircuitBreaker("fake-llm")
+
+    async def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        return fake_answer(messages[-1].get("content", ""), self.content)
+
+    async def stream_chat(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        for token in re.findall(r"\S+\s*", await self.chat(messages)):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield token
+
+    async def close(self) -> None:
+        pass
+
+
+class FakeDataManager:
+    """
+    Stand-in for EnhancedDataManager serving synthetic daily_tasks history.
+    """
+
+    def __init__(self, days: int = 30, latency: float = 0.0):
+        self.days = days
+        self.latency = latency
+        self.history_reads = 0
+
+    def _rows(self, employee_id) -> List[Dict[str, Any]]:
+        today = date.today()
+        return [
+            {
+                'id': i + 1,
+                'employee_id': employee_id,
+                'task_date': (today - timedelta(days=i)).isoformat(),
+                'tasks_planned': "Task 1\nTask 2\nTask 3",
+                'tasks_completed': f"Task 1\nTask 2\nDay {i} extra"
+            }
+            for i in range(self.days)
+        ]
+
+    async def _read(self) -> None:
+        self.history_reads += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get_employee_performance_history(self, employee_id, start_date, end_date) -> List[Dict[str, Any]]:
+        await self._read()
+        return self._rows(employee_id)
+
+    async def get_team_performance_history(self, employee_ids, start_date, end_date) -> Dict[Any, List[Dict[str, Any]]]:
+        await self._read()
+        return {employee_id: self._rows(employee_id) for employee_id in employee_ids}
+
+    async def store_ai_feedback(self, employee_id, feedback_type, data):
+        return None
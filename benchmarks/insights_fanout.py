@@ -0,0 +1,51 @@
+"""
+Measure PerformanceAnalyzer.generate_insights latency for a 30-day window
+with a fake LLM that injects artificial latency, comparing one entry at a
+time, the concurrent fan-out and batched scoring.
+
+    python -m benchmarks.insights_fanout --days 30 --latency 0.2 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.fakes import FakeLLMClient, FakeDataManager
+from llm_cache import LLMCache
+from performance_analyzer import PerformanceAnalyzer
+
+
+async def run(label: str, days: int, concurrency: int, fake: FakeLLMClient,
+              batch_scoring: bool = False) -> float:
+    analyzer = PerformanceAnalyzer(
+        cache=LLMCache(max_entries=0),
+        data_manager=FakeDataManager(days),
+        max_concurrency=concurrency,
+        batch_scoring=batch_scoring,
+        llm_client=fake
+    )
+    calls_before = fake.calls
+    started = time.perf_counter()
+    insights = await analyzer.generate_insights("bench-employee", "1m")
+    elapsed = time.perf_counter() - started
+    scored = len(insights['performance_trend'].get('quality_trend', []))
+    print(f"{label:<12} {elapsed:.2f}s for {scored} entries ({fake.calls - calls_before} LLM calls)")
+    return elapsed
+
+
+async def main(days: int, latency: float, jitter: float, concurrency: int):
+    fake = FakeLLMClient(latency=latency, jitter=jitter)
+    sequential = await run("sequential", days, 1, fake)
+    concurrent = await run("concurrent", days, concurrency, fake)
+    batched = await run("batched", days, concurrency, fake, batch_scoring=True)
+    print(f"speedup: concurrent {sequential / concurrent:.1f}x, batched {sequential / batched:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(main(args.days, args.latency, args.jitter, args.concurrency))
@@ -0,0 +1,61 @@
+"""
+Repeated PerformanceAnalyzer.generate_insights calls with and without the
+incremental rollup.
+
+"rescan" forgets the employee's rollup state before every call, which is
+what generate_insights used to do: read the window's history and
+aggregate it again. "rollup" seeds once and then reads the running
+aggregates, with a daily_tasks completion applied between calls the way
+the data manager's write listener would. LLM scores are cached in both
+modes, so the difference is history reads and aggregation.
+
+    python -m benchmarks.insights_rollup --calls 200 --db-latency 0.005
+"""
+
+import time
+import asyncio
+import argparse
+from datetime import date
+
+from benchmarks.fakes import FakeDataManager, FakeLLMClient
+from llm_cache import LLMCache
+from performance_analyzer import PerformanceAnalyzer
+from performance_rollup import PerformanceRollup
+
+
+async def run(label: str, calls: int, days: int, db_latency: float, rescan: bool) -> None:
+    data_manager = FakeDataManager(days, latency=db_latency)
+    rollup = PerformanceRollup()
+    analyzer = PerformanceAnalyzer(cache=LLMCache(), data_manager=data_manager, rollup=rollup,
+                                   llm_client=FakeLLMClient(latency=0))
+    await analyzer.generate_insights("bench-employee", "1m")
+
+    started = time.perf_counter()
+    for i in range(calls):
+        if rescan:
+            rollup.forget("bench-employee")
+        else:
+            rollup.apply("bench-employee", {
+                'id': 1, 'task_date': date.today(), 'tasks_planned': "Task 1\nTask 2\nTask 3",
+                'tasks_completed': f"Task 1\nTask 2\nUpdate {i % 3}"
+            })
+        insights = await analyzer.generate_insights("bench-employee", "1m")
+    elapsed = time.perf_counter() - started
+    rollup_stats = rollup.stats()
+    print(f"{label:<7} {elapsed / calls * 1000:.2f}ms/call, {data_manager.history_reads} history reads, "
+          f"completion rate {insights['performance_trend']['completion_rate_trend']:.2f}, "
+          f"{rollup_stats['rows']} rows held")
+
+
+async def main(calls: int, days: int, db_latency: float) -> None:
+    await run("rescan", calls, days, db_latency, rescan=True)
+    await run("rollup", calls, days, db_latency, rescan=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--db-latency", type=float, default=0.005)
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.days, args.db_latency))
@@ -0,0 +1,70 @@
+"""
+A personalized-message broadcast during an LLM outage, with and without
+the circuit breaker, against a local fake OpenAI server that stops
+answering in time (every request takes --outage-latency seconds). Without
+the breaker every message waits out its deadline before falling back to
+the static template; with it, messages fall back immediately once the
+breaker has opened.
+
+    python -m benchmarks.llm_breaker --messages 200 --concurrency 20
+"""
+
+import time
+import asyncio
+import logging
+import argparse
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from benchmarks.fakes import FakeDataManager
+from circuit_breaker import CircuitBreaker
+from llm_cache import LLMCache
+from llm_client import LLMClient
+from performance_analyzer import PerformanceAnalyzer
+from whatsapp.dynamic_templates import DynamicTemplateGenerator
+
+
+async def broadcast(label: str, server: FakeOpenAIServer, breaker: CircuitBreaker,
+                    messages: int, concurrency: int, timeout: float) -> None:
+    client = LLMClient(api_key="bench", base_url=server.base_url, timeout=timeout, max_retries=0, breaker=breaker)
+    analyzer = PerformanceAnalyzer(cache=LLMCache(max_entries=0), data_manager=FakeDataManager(), llm_client=client)
+    generator = DynamicTemplateGenerator(analyzer, llm_client=client, llm_timeout=timeout)
+    semaphore = asyncio.Semaphore(concurrency)
+    requests_before = server.requests
+
+    async def one(i: int):
+        async with semaphore:
+            await generator.generate_personalized_message(f"employee-{i}", "daily_updates/morning")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(messages)))
+    elapsed = time.perf_counter() - started
+    await client.close()
+    stats = generator.stats()
+    print(f"{label:<10} {messages} messages in {elapsed:.2f}s, fallbacks {stats['fallbacks']}, "
+          f"{server.requests - requests_before} LLM requests, breaker {stats['breaker']['state']} "
+          f"(opened {stats['breaker']['times_opened']}x)")
+
+
+async def main(messages: int, concurrency: int, outage_latency: float, timeout: float) -> None:
+    server = FakeOpenAIServer(latency=outage_latency)
+    await server.start()
+    try:
+        # Thresholds above 100% never trip
+        disabled = CircuitBreaker("llm", failure_rate=2, slow_call_rate=2)
+        await broadcast("no breaker", server, disabled, messages, concurrency, timeout)
+        breaker = CircuitBreaker("llm", slow_call_seconds=timeout / 2, open_seconds=60)
+        await broadcast("breaker", server, breaker, messages, concurrency, timeout)
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    # Every failed call logs an error; keep the output to the results
+    logging.disable(logging.ERROR)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--outage-latency", type=float, default=30.0)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.concurrency, args.outage_latency, args.timeout))
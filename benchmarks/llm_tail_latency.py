@@ -0,0 +1,79 @@
+"""
+Latency percentiles and failure counts of LLMClient against a local fake
+OpenAI server that injects slow tails and 503s, with retries and hedging
+switched off, retries only, and retries plus hedged requests.
+
+    python -m benchmarks.llm_tail_latency --calls 1000 --concurrency 50
+"""
+
+import time
+import asyncio
+import logging
+import argparse
+from typing import List
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from llm_client import LLMClient, LLMError
+
+
+def percentile(values: List[float], share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+async def run(label: str, server: FakeOpenAIServer, calls: int, concurrency: int, **options) -> None:
+    client = LLMClient(api_key="bench", base_url=server.base_url, **options)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+    requests_before = server.requests
+
+    async def one(i: int):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await client.chat([{"role": "user", "content": f"question {i}"}])
+                latencies.append(time.perf_counter() - started)
+            except LLMError:
+                failures += 1
+
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    await client.close()
+    sent = server.requests - requests_before
+    print(
+        f"{label:<16} p50 {percentile(latencies, 0.5) * 1000:6.0f}ms  "
+        f"p95 {percentile(latencies, 0.95) * 1000:6.0f}ms  "
+        f"p99 {percentile(latencies, 0.99) * 1000:6.0f}ms  "
+        f"failed {failures:4d}  requests sent {sent} ({sent / calls:.2f}/call)"
+    )
+
+
+async def main(calls: int, concurrency: int, latency: float, tail_rate: float,
+               tail_latency: float, error_rate: float, hedge_after: float, timeout: float):
+    server = FakeOpenAIServer(latency=latency, tail_rate=tail_rate,
+                              tail_latency=tail_latency, error_rate=error_rate)
+    await server.start()
+    try:
+        await run("no retries", server, calls, concurrency, timeout=timeout, max_retries=0, hedge_after=0)
+        await run("retries", server, calls, concurrency, timeout=timeout, max_retries=3, hedge_after=0)
+        await run("retries+hedging", server, calls, concurrency, timeout=timeout, max_retries=3,
+                  hedge_after=hedge_after)
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    # One warning per retry would drown the results
+    logging.getLogger("llm_client").setLevel(logging.ERROR)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--tail-rate", type=float, default=0.05)
+    parser.add_argument("--tail-latency", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--hedge-after", type=float, default=0.3)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.concurrency, args.latency, args.tail_rate,
+                     args.tail_latency, args.error_rate, args.hedge_after, args.timeout))
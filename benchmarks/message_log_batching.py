@@ -0,0 +1,79 @@
+"""
+Compare rows/sec of per-row message_logs inserts (one INSERT + commit each)
+with the write-behind buffer, against a local Postgres configured through
+the usual DB_* environment variables, then flush one batch containing a
+single poisoned row (an employee_id that isn't a uuid): only that row's
+write may fail. Benchmark rows are tagged with message_type 'benchmark'
+and deleted afterwards.
+
+    python -m benchmarks.message_log_batching --rows 5000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import time
+
+from enhanced_data_manager import EnhancedDataManager
+
+EMPLOYEE_ID = "bf615338-8a52-450e-ba5d-5ac172936d93"
+
+
+async def run(label: str, manager: EnhancedDataManager, rows: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            return await manager.log_message(EMPLOYEE_ID, "benchmark", f"benchmark row {i}")
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(rows)))
+    elapsed = time.perf_counter() - started
+    failed = sum(1 for r in results if r is None)
+    rate = rows / elapsed
+    print(f"{label:<14} {rows} rows in {elapsed:.2f}s -> {rate:,.0f} rows/sec ({failed} failed)")
+    return rate
+
+
+async def poisoned_batch(manager: EnhancedDataManager, rows: int) -> None:
+    futures = [
+        manager.log_message_nowait("not-a-uuid" if i == rows // 2 else EMPLOYEE_ID, "benchmark", f"poison row {i}")
+        for i in range(rows)
+    ]
+    await manager.log_buffer.flush()
+    results = await asyncio.gather(*futures, return_exceptions=True)
+    failed = [i for i, r in enumerate(results) if isinstance(r, Exception)]
+    print(f"poisoned batch of {rows}: {rows - len(failed)} written, failed rows {failed}")
+
+
+async def cleanup(manager: EnhancedDataManager) -> None:
+    await manager._execute("DELETE FROM message_logs WHERE message_type = %s", ("benchmark",), fetch=None)
+
+
+async def main(rows: int, concurrency: int, batch_size: int):
+    direct = EnhancedDataManager(max_size=concurrency, write_behind=False)
+    try:
+        before = await run("per-row", direct, rows, concurrency)
+    finally:
+        await cleanup(direct)
+        await direct.close()
+
+    buffered = EnhancedDataManager(max_size=concurrency, write_behind=True)
+    buffered.log_buffer.max_batch_size = batch_size
+    try:
+        after = await run("write-behind", buffered, rows, concurrency)
+        print(f"flushes: {buffered.log_buffer.flushes}, speedup: {after / before:.2f}x")
+        await poisoned_batch(buffered, batch_size)
+    finally:
+        await buffered.close()
+        cleanup_manager = EnhancedDataManager(write_behind=False)
+        await cleanup(cleanup_manager)
+        await cleanup_manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.concurrency, args.batch_size))
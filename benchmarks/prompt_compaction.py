@@ -0,0 +1,78 @@
+"""
+Prompt size before and after compaction for the insights-driven WhatsApp
+prompts and detailed_task_analysis, using synthetic 30-day insights and a
+long, repetitive employee update.
+
+    python -m benchmarks.prompt_compaction --days 30 --budget 800
+"""
+
+import random
+import argparse
+
+from benchmarks.fakes import FakeDataManager
+from llm_cache import LLMCache
+from performance_analyzer import PerformanceAnalyzer
+from prompt_compaction import PromptCompactor
+from whatsapp.dynamic_templates import DynamicTemplateGenerator
+
+
+def synthetic_insights(days: int, seed: int = 3):
+    rng = random.Random(seed)
+    feedback = [
+        "Add more detail about blockers.",
+        "Good structure, but list the next steps.",
+        "Mention which tasks were carried over.",
+    ]
+    return {
+        'performance_trend': {
+            'completion_rate_trend': 0.82,
+            'quality_trend': [
+                {'id': i, 'completeness': 8, 'clarity': 7, 'professional_tone': 9, 'problem_solving': 7,
+                 'average_score': rng.choice([7.25, 7.75, 8.0]), 'feedback': rng.choice(feedback)}
+                for i in range(days)
+            ],
+            'trend_direction': 'improving'
+        },
+        'common_tasks': [(f"Task {i}", days - i) for i in range(5)],
+        'recommendations': [
+            {'area': 'Task Completion', 'observation': 'Below target completion rate',
+             'suggestion': 'Consider breaking down tasks into smaller, manageable chunks'},
+            {'area': 'Response Quality', 'observation': 'Quality scores below threshold in some areas',
+             'suggestion': 'Focus on providing more detailed and structured responses'}
+        ]
+    }
+
+
+def synthetic_update(lines: int, seed: int = 5) -> str:
+    rng = random.Random(seed)
+    tasks = ["Fixed login bug", "Reviewed PR for payments", "Standup", "Worked on dashboard charts",
+             "Investigated flaky test", "Client call about onboarding"]
+    return "\n".join(f"- {rng.choice(tasks)}" for _ in range(lines))
+
+
+def main(days: int, budget: int, update_lines: int) -> None:
+    compactor = PromptCompactor(budget=budget)
+    analyzer = PerformanceAnalyzer(cache=LLMCache(), data_manager=FakeDataManager())
+    generator = DynamicTemplateGenerator(analyzer, compactor=compactor)
+    insights = synthetic_insights(days)
+    for message_type in ("daily_updates/morning", "feedback/performance"):
+        prompt = generator._create_prompt(message_type, insights, {'employee_name': 'Asha', 'team': 'Platform'})
+        # Compaction must keep the context on its own, separated section
+        assert '\n\nAdditional context:\n{"employee_name":"Asha"' in prompt, prompt[-200:]
+
+    update = synthetic_update(update_lines)
+    compactor.compact_text("employee_update", update)
+
+    print(f"budget {budget} tokens, {days} days of insights, {update_lines}-line update")
+    for name, stats in compactor.stats().items():
+        print(f"{name:<22} {stats['tokens_before']:>6} -> {stats['tokens_after']:>5} tokens "
+              f"({stats['tokens_saved']} saved{', truncated' if stats['truncated'] else ''})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--budget", type=int, default=800)
+    parser.add_argument("--update-lines", type=int, default=400)
+    args = parser.parse_args()
+    main(args.days, args.budget, args.update_lines)
@@ -0,0 +1,83 @@
+"""
+AIAgent.detailed_task_analysis with streamed, validated parsing: time to
+the first validated task vs. the whole answer for a fake LLM that streams
+at --token-delay seconds per token, and how many tasks are recovered from
+answers cut off at random points, where json.loads of the whole answer
+recovers none.
+
+    python -m benchmarks.task_analysis_stream --tasks 8 --token-delay 0.02
+"""
+
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+
+from benchmarks.fakes import FakeLLMClient
+from llm_cache import LLMCache
+
+import ai_agent
+
+
+def synthetic_answer(tasks: int) -> str:
+    body = {
+        "tasks": [
+            {
+                "name": f"Task {i}", "description": "Redesign the settings page and fix layout bugs",
+                "priority": random.choice(["high", "Medium", "low"]),
+                "status": random.choice(["in_progress", "Completed", "blocked"]),
+                "estimated_hours": 3.5, "completion_percentage": 40,
+                "blockers": ["Waiting on design review"], "dependencies": ["API v2"],
+                "risks": ["Scope creep"]
+            }
+            for i in range(tasks)
+        ],
+        "overall_assessment": "Steady progress with one blocker.",
+        "recommendations": ["Escalate the design review"]
+    }
+    return "```json\n" + json.dumps(body, indent=2) + "\n```"
+
+
+def whole_answer_tasks(text: str) -> int:
+    """The pre-streaming parse: strip fences, json.loads everything or nothing"""
+    try:
+        return len(json.loads(text.strip("```json").strip("```"))["tasks"])
+    except (json.JSONDecodeError, KeyError):
+        return 0
+
+
+async def main(tasks: int, token_delay: float, cuts: int) -> None:
+    ai_agent.SupabaseManager = lambda: None
+    answer = synthetic_answer(tasks)
+    fake = FakeLLMClient(latency=0, content=answer, token_delay=token_delay)
+    agent = ai_agent.AIAgent("benchmark", cache=LLMCache(max_entries=0), llm_client=fake)
+
+    started = time.perf_counter()
+    first = None
+    async for _ in agent.stream_task_analysis("Worked on the settings page"):
+        if first is None:
+            first = time.perf_counter() - started
+    total = time.perf_counter() - started
+    print(f"{tasks} tasks streamed: first validated task after {first:.2f}s, whole answer {total:.2f}s")
+
+    fake.token_delay = 0
+    recovered = whole = 0
+    for _ in range(cuts):
+        fake.content = answer[:random.randint(len(answer) // 4, len(answer) - 1)]
+        analysis = await agent.detailed_task_analysis("Worked on the settings page")
+        recovered += len(analysis.get("tasks", []))
+        whole += whole_answer_tasks(fake.content)
+    print(f"{cuts} truncated answers: {recovered} tasks recovered (whole-answer json.loads: {whole})")
+
+
+if __name__ == "__main__":
+    logging.disable(logging.ERROR)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=8)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--cuts", type=int, default=50)
+    args = parser.parse_args()
+    random.seed(7)
+    asyncio.run(main(args.tasks, args.token_delay, args.cuts))
@@ -0,0 +1,57 @@
+"""
+Microbenchmark: render the weekly report template for many employees with
+the old per-call path (nested dict lookup + str.format + broad try/except)
+versus MessageTemplates.render_many over pre-compiled templates.
+
+    python -m benchmarks.template_render --employees 50000
+"""
+
+import argparse
+import time
+
+from whatsapp.templates import MessageTemplates
+
+
+def legacy_get_template(templates, category, template_type, **kwargs):
+    """The pre-compilation get_template body."""
+    try:
+        template = templates[category][template_type]
+        return template.format(**kwargs) if kwargs else template
+    except KeyError:
+        return "Template not found. Please check the category and type."
+    except Exception:
+        return "Error formatting template. Please check the parameters."
+
+
+def main(employees: int):
+    templates = MessageTemplates()
+    params_list = [
+        {
+            "week_range": "Jan 1 - Jan 7",
+            "completion_rate": 80 + i % 20,
+            "quality_score": 7 + i % 3,
+            "achievements": f"- Shipped feature {i}",
+            "focus_areas": "- Write more tests"
+        }
+        for i in range(employees)
+    ]
+
+    started = time.perf_counter()
+    legacy = [legacy_get_template(templates.templates, "reports", "weekly", **p) for p in params_list]
+    legacy_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    compiled = list(templates.render_many("reports", "weekly", params_list))
+    compiled_elapsed = time.perf_counter() - started
+
+    assert legacy == compiled
+    print(f"per-call get_template: {employees / legacy_elapsed:,.0f} renders/sec")
+    print(f"render_many:           {employees / compiled_elapsed:,.0f} renders/sec")
+    print(f"speedup: {legacy_elapsed / compiled_elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--employees", type=int, default=50000)
+    args = parser.parse_args()
+    main(args.employees)
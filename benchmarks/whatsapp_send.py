@@ -0,0 +1,72 @@
+"""
+Compare sends/sec of a fresh aiohttp session per send (the old behaviour)
+with the pooled WhatsAppService session, against a local fake Whapi server.
+
+    python -m benchmarks.whatsapp_send --sends 2000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import time
+
+import aiohttp
+
+from benchmarks.fake_whapi import FakeWhapiServer
+from whatsapp_service import WhatsAppService
+
+
+async def send_with_fresh_session(base_url: str, phone_number: str, message: str):
+    """Replicates the pre-pooling send path: one ClientSession per message."""
+    headers = {"Authorization": "Bearer bench", "Content-Type": "application/json"}
+    payload = {"typing_time": 0, "to": phone_number, "body": message}
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{base_url}/messages/text", headers=headers, json=payload) as response:
+            response.raise_for_status()
+            return await response.json()
+
+
+async def run(label: str, send, sends: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await send(f"+1555{i:07d}", "benchmark message")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(sends)))
+    elapsed = time.perf_counter() - started
+    rate = sends / elapsed
+    print(f"{label:<16} {sends} sends in {elapsed:.2f}s -> {rate:,.0f} sends/sec")
+    return rate
+
+
+async def main(sends: int, concurrency: int, latency: float):
+    server = FakeWhapiServer(latency=latency)
+    await server.start()
+    try:
+        before = await run(
+            "fresh session",
+            lambda to, body: send_with_fresh_session(server.base_url, to, body),
+            sends,
+            concurrency,
+        )
+
+        service = WhatsAppService(base_url=server.base_url, limit_per_host=concurrency)
+        await service.start()
+        try:
+            after = await run("pooled session", service.send_text_message, sends, concurrency)
+        finally:
+            await service.close()
+
+        print(f"speedup: {after / before:.2f}x")
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sends", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0, help="artificial server latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.sends, args.concurrency, args.latency))
@@ -0,0 +1,465 @@
+import os
+import heapq
+import random
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import aiohttp
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+logger = logging.getLogger(__name__)
+
+# Job run states in the state store
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+UNCONFIRMED = "unconfirmed"
+
+
+def failed_before_delivery(error: Exception) -> bool:
+    """
+    Whether a failed send certainly never reached the provider, so retrying
+    it can't message anyone twice: connection failures, HTTP error responses
+    and errors building the message. A timeout, a dropped connection or an
+    unreadable success response may come after the provider accepted it.
+    """
+    if isinstance(error, aiohttp.ClientConnectorError):
+        return True
+    if isinstance(error, aiohttp.ContentTypeError):
+        # The status was 2xx; only the body was unexpected
+        return False
+    if isinstance(error, aiohttp.ClientResponseError):
+        return True
+    return not isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+def _stable_hash(value: str) -> int:
+    """Hash that is the same in every process and across restarts, unlike hash()"""
+    return int.from_bytes(hashlib.sha1(value.encode()).digest()[:8], "big")
+
+
+class CampaignJob(NamedTuple):
+    """An outbound message sent to every employee once per (local) day it runs"""
+    name: str
+    at: time                                    # local time of day the sends start
+    send: Callable[[Dict[str, Any]], Awaitable[Any]]  # called with the employee record
+    weekdays: Optional[FrozenSet[int]] = None   # Monday=0; None for every day
+    spread: float = 1800.0                      # sends are spread over this many seconds after ``at``
+    window: float = 6 * 3600.0                  # a send still pending this long after its slot is skipped
+
+
+class JobStateStore:
+    """
+    Per (job, employee, local date) send state in a local SQLite file, so a
+    restarted scheduler knows what it already sent.
+
+    A run is claimed as ``sending`` before the message goes out and set to
+    ``sent``, ``failed`` (certainly not delivered; claimable again until its
+    attempts are used up) or ``unconfirmed`` (may have been delivered)
+    afterwards. Unconfirmed runs, and runs left in ``sending`` by a crash,
+    are never retried, so nobody gets the same message twice.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_attempts: int = 3):
+        """
+        Args:
+            path: SQLite file (``SCHEDULER_STATE_PATH``, ``scheduler_state.db``)
+            max_attempts: Sends tried per run before it is left as failed
+        """
+        self.path = path or os.getenv("SCHEDULER_STATE_PATH", "scheduler_state.db")
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_runs (
+                job TEXT NOT NULL,
+                employee_id TEXT NOT NULL,
+                run_date TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 1,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (job, employee_id, run_date)
+            )
+        """)
+
+    def claim_many(self, runs: Iterable[Tuple[str, str, str]]) -> List[Tuple[str, str, str]]:
+        """
+        Claim (job, employee_id, run_date) runs for sending in one transaction.
+
+        Returns:
+            The runs that were claimed: new ones, and failed ones with attempts left
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        claimed = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for run in runs:
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO job_runs (job, employee_id, run_date, status, attempts, updated_at) "
+                        "VALUES (?, ?, ?, ?, 1, ?)",
+                        (*run, SENDING, now)
+                    )
+                    if cursor.rowcount == 0:
+                        cursor = self._conn.execute(
+                            "UPDATE job_runs SET status = ?, attempts = attempts + 1, updated_at = ? "
+                            "WHERE job = ? AND employee_id = ? AND run_date = ? AND status = ? AND attempts < ?",
+                            (SENDING, now, *run, FAILED, self.max_attempts)
+                        )
+                    if cursor.rowcount == 1:
+                        claimed.append(run)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return claimed
+
+    def mark(self, job: str, employee_id: str, run_date: str, status: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE job_runs SET status = ?, updated_at = ? WHERE job = ? AND employee_id = ? AND run_date = ?",
+                (status, datetime.now(timezone.utc).isoformat(), job, employee_id, run_date)
+            )
+
+    def counts(self, run_date: Optional[str] = None) -> Dict[str, int]:
+        """Runs per status, optionally for one date"""
+        query = "SELECT status, COUNT(*) FROM job_runs"
+        params: Tuple = ()
+        if run_date is not None:
+            query += " WHERE run_date = ?"
+            params = (run_date,)
+        with self._lock:
+            return dict(self._conn.execute(query + " GROUP BY status", params).fetchall())
+
+    def prune(self, before: date) -> int:
+        """Delete runs dated before ``before``"""
+        with self._lock:
+            return self._conn.execute("DELETE FROM job_runs WHERE run_date < ?", (before.isoformat(),)).rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CampaignScheduler:
+    """
+    Runs daily and weekly outbound campaigns in-process.
+
+    Each employee gets each job at the job's local time in their own
+    timezone (``timezone`` on the employee record, else ``default_timezone``),
+    offset by a per-employee delay within ``spread`` so a campaign trickles
+    out instead of hitting the LLM and WhatsApp APIs all at 09:00. The delay
+    is a hash of job, employee and date, so a restarted scheduler computes
+    the same slots. With several scheduler processes, each owns the
+    employees whose id hashes to its shard. Send state lives in a
+    JobStateStore, so a restart resumes where it stopped without re-sending.
+    """
+
+    def __init__(self,
+                 load_employees: Callable[[], Awaitable[Iterable[Dict[str, Any]]]],
+                 jobs: Iterable[CampaignJob],
+                 store: Optional[JobStateStore] = None,
+                 default_timezone: str = "UTC",
+                 shard_index: Optional[int] = None,
+                 shard_count: Optional[int] = None,
+                 poll_interval: float = 30.0,
+                 refresh_interval: float = 300.0,
+                 max_concurrency: int = 20,
+                 retryable: Callable[[Exception], bool] = failed_before_delivery):
+        """
+        Args:
+            load_employees: Coroutine function returning employee records (``id``,
+                ``whatsapp_number``, optional ``timezone``)
+            jobs: Campaigns to run
+            store: Send state store (defaults to a JobStateStore at ``SCHEDULER_STATE_PATH``)
+            default_timezone: IANA timezone for employees without one, e.g. ``config.Settings.TIMEZONE``
+            shard_index: This worker's shard (``SCHEDULER_SHARD``, 0)
+            shard_count: Number of scheduler workers (``SCHEDULER_SHARDS``, 1)
+            poll_interval: Seconds between checks for due sends; a failed send
+                is retried after about ``poll_interval * 2**failures`` seconds
+            refresh_interval: Seconds the employee list is reused before reloading
+            max_concurrency: Sends in flight at once
+            retryable: Whether a send that raised this error may be retried;
+                by default only if it certainly wasn't delivered
+        """
+        self.load_employees = load_employees
+        self.jobs = list(jobs)
+        self.store = store or JobStateStore()
+        self.default_timezone = ZoneInfo(default_timezone)
+        self.shard_index = shard_index if shard_index is not None else int(os.getenv("SCHEDULER_SHARD", "0"))
+        self.shard_count = shard_count or int(os.getenv("SCHEDULER_SHARDS", "1"))
+        if not 0 <= self.shard_index < self.shard_count:
+            raise ValueError("Shard index must satisfy 0 <= shard_index < shard_count")
+        self.poll_interval = poll_interval
+        self.refresh_interval = refresh_interval
+        self.max_concurrency = max_concurrency
+        self.retryable = retryable
+        self._employees: Dict[str, Dict[str, Any]] = {}
+        self._employees_loaded_at: Optional[datetime] = None
+        self._zones: Dict[str, tzinfo] = {}
+        self._employee_zones: Set[tzinfo] = set()
+        self._jobs_by_name = {job.name: job for job in self.jobs}
+        # Upcoming sends as (due time, job, employee_id, run_date), earliest first;
+        # the due time is the slot, or a backed-off retry time after a failure
+        self._queue: List[Tuple[datetime, str, str, str]] = []
+        # Slot per queued (job, employee_id, run_date); an employee's timezone change applies from the next day
+        self._slots: Dict[Tuple[str, str, str], datetime] = {}
+        # Failed sends per run in this process, for the retry backoff
+        self._failures: Dict[Tuple[str, str, str], int] = {}
+        # Runs already claimed, sent or given up on; skipped without asking the store
+        self._settled: Set[Tuple[str, str, str]] = set()
+        self._planned_for: Optional[Tuple[datetime, FrozenSet[date]]] = None
+        self._in_flight: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pruned_on: Optional[date] = None
+        self.sent = 0
+        self.failed = 0
+        self.unconfirmed = 0
+        self.skipped_late = 0
+
+    def owns(self, employee_id: Any) -> bool:
+        """Whether this worker's shard is responsible for an employee"""
+        return _stable_hash(str(employee_id)) % self.shard_count == self.shard_index
+
+    def _timezone(self, employee: Dict[str, Any]) -> tzinfo:
+        name = employee.get("timezone")
+        if not name:
+            return self.default_timezone
+        zone = self._zones.get(name)
+        if zone is None:
+            try:
+                zone = ZoneInfo(name)
+            except (ZoneInfoNotFoundError, ValueError):
+                logger.warning(f"Unknown timezone {name!r} for employee {employee.get('id')}; using default")
+                zone = self.default_timezone
+            self._zones[name] = zone
+        return zone
+
+    def _offset(self, job: CampaignJob, employee_id: str, run_date: date) -> timedelta:
+        if job.spread <= 0:
+            return timedelta(0)
+        millis = _stable_hash(f"{job.name}:{employee_id}:{run_date.isoformat()}") % int(job.spread * 1000)
+        return timedelta(milliseconds=millis)
+
+    def slot(self, job: CampaignJob, employee: Dict[str, Any], run_date: date) -> datetime:
+        """When ``job`` is sent to ``employee`` for the local date ``run_date``"""
+        start = datetime.combine(run_date, job.at, tzinfo=self._timezone(employee))
+        return start + self._offset(job, str(employee["id"]), run_date)
+
+    async def _load(self, now: datetime) -> None:
+        stale = (self._employees_loaded_at is None
+                 or (now - self._employees_loaded_at).total_seconds() >= self.refresh_interval)
+        if not stale:
+            return
+        try:
+            employees = await self.load_employees()
+        except Exception as e:
+            # Keep going with the last known list
+            logger.error(f"Error loading employees for the scheduler: {e}")
+            return
+        if employees is None:
+            # The loader logged why; keep going with the last known list
+            return
+        self._employees = {
+            str(e["id"]): e for e in employees if e.get("id") is not None and self.owns(e["id"])
+        }
+        self._employee_zones = {self._timezone(e) for e in self._employees.values()}
+        self._employees_loaded_at = now
+
+    def _plan(self, now: datetime) -> None:
+        """Queue every employee's runs for today and yesterday (local) that aren't queued yet"""
+        local_dates: Dict[tzinfo, date] = {}
+        for employee_id, employee in self._employees.items():
+            zone = self._timezone(employee)
+            today = local_dates.get(zone)
+            if today is None:
+                today = local_dates[zone] = now.astimezone(zone).date()
+            for job in self.jobs:
+                # A slot late in the day can spill past midnight, so yesterday may still be due
+                for run_date in (today, today - timedelta(days=1)):
+                    if job.weekdays is not None and run_date.weekday() not in job.weekdays:
+                        continue
+                    key = (job.name, employee_id, run_date.isoformat())
+                    if key in self._slots:
+                        continue
+                    slot = self._slots[key] = self.slot(job, employee, run_date)
+                    heapq.heappush(self._queue, (slot, *key))
+
+    def due(self, now: datetime) -> List[Tuple[CampaignJob, Dict[str, Any], str]]:
+        """Take the (job, employee, run_date) sends whose slot has passed off the queue"""
+        due = []
+        while self._queue and self._queue[0][0] <= now:
+            due_at, job_name, employee_id, run_date = heapq.heappop(self._queue)
+            key = (job_name, employee_id, run_date)
+            employee = self._employees.get(employee_id)
+            if key in self._settled or employee is None:
+                # Already handled, or no longer active / in this shard
+                continue
+            job = self._jobs_by_name[job_name]
+            # The window counts from the original slot, not from a retry time
+            if (now - self._slots.get(key, due_at)).total_seconds() > job.window:
+                # e.g. the scheduler was down all morning; don't send a stale good-morning
+                self._settled.add(key)
+                self.skipped_late += 1
+                continue
+            due.append((job, employee, run_date))
+        return due
+
+    async def tick(self, now: Optional[datetime] = None) -> int:
+        """
+        Start every send that is due at ``now`` (default: the current time).
+
+        Returns:
+            Number of sends started
+        """
+        now = now or datetime.now(timezone.utc)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._prune(now)
+        await self._load(now)
+        # Re-plan only when the employee list was reloaded or a local date rolled over
+        planned_for = (self._employees_loaded_at, frozenset(now.astimezone(zone).date() for zone in self._employee_zones))
+        if planned_for != self._planned_for:
+            self._plan(now)
+            self._planned_for = planned_for
+
+        due = self.due(now)
+        if not due:
+            return 0
+        runs = [(job.name, str(employee["id"]), run_date) for job, employee, run_date in due]
+        claimed = set(await asyncio.to_thread(self.store.claim_many, runs))
+        self._settled.update(runs)
+        for (job, employee, run_date), run in zip(due, runs):
+            if run in claimed:
+                task = asyncio.create_task(self._send(job, employee, run_date, now))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+        if claimed:
+            logger.info(f"Scheduler started {len(claimed)} sends ({len(runs) - len(claimed)} already done)")
+        return len(claimed)
+
+    def _retry_at(self, key: Tuple[str, str, str], now: datetime) -> datetime:
+        failures = self._failures[key] = self._failures.get(key, 0) + 1
+        delay = self.poll_interval * 2 ** failures
+        # Equal jitter: at least half the backoff, so an outage's retries don't land together
+        return now + timedelta(seconds=random.uniform(delay / 2, delay))
+
+    async def _send(self, job: CampaignJob, employee: Dict[str, Any], run_date: str, now: datetime) -> None:
+        key = (job.name, str(employee["id"]), run_date)
+        async with self._semaphore:
+            try:
+                await job.send(employee)
+                status = SENT
+                self.sent += 1
+            except asyncio.CancelledError:
+                # Shutting down mid-send: leave the run as sending, never resend it
+                raise
+            except Exception as e:
+                if self.retryable(e):
+                    logger.error(f"Error sending {job.name} to employee {key[1]}: {e}")
+                    status = FAILED
+                    self.failed += 1
+                    # Requeue it with a backoff; the store stops it once its attempts
+                    # are used up, and due() once its window has passed
+                    self._settled.discard(key)
+                    if key in self._slots:
+                        heapq.heappush(self._queue, (self._retry_at(key, now), *key))
+                else:
+                    logger.error(f"Sending {job.name} to employee {key[1]} may have been delivered ({e!r}); not retrying")
+                    status = UNCONFIRMED
+                    self.unconfirmed += 1
+        await asyncio.to_thread(self.store.mark, *key, status)
+
+    def _prune(self, now: datetime) -> None:
+        today = now.date()
+        if self._pruned_on == today:
+            return
+        cutoff = (today - timedelta(days=2)).isoformat()
+        self._settled = {key for key in self._settled if key[2] >= cutoff}
+        self._slots = {key: slot for key, slot in self._slots.items() if key[2] >= cutoff}
+        self._failures = {key: count for key, count in self._failures.items() if key[2] >= cutoff}
+        self._queue = [entry for entry in self._queue if entry[3] >= cutoff]
+        heapq.heapify(self._queue)
+        self.store.prune(today - timedelta(days=14))
+        self._pruned_on = today
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scheduler tick failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def start(self) -> None:
+        """Start polling for due sends in the background"""
+        if self._task is not None:
+            return
+        interrupted = self.store.counts().get(SENDING, 0)
+        if interrupted:
+            logger.warning(f"{interrupted} scheduled sends were interrupted by a restart; not resending them")
+        self._task = asyncio.create_task(self._run(), name="campaign-scheduler")
+        logger.info(
+            f"Campaign scheduler started: shard {self.shard_index + 1}/{self.shard_count}, "
+            f"jobs {[job.name for job in self.jobs]}"
+        )
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Stop polling and give in-flight sends up to ``timeout`` seconds to finish"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if self._in_flight:
+            done, pending = await asyncio.wait(set(self._in_flight), timeout=timeout)
+            for task in pending:
+                task.cancel()
+        logger.info("Campaign scheduler stopped")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'running': self._task is not None,
+            'shard': f"{self.shard_index + 1}/{self.shard_count}",
+            'employees': len(self._employees),
+            'queued': len(self._queue),
+            'in_flight': len(self._in_flight),
+            'sent': self.sent,
+            'failed': self.failed,
+            'unconfirmed': self.unconfirmed,
+            'skipped_late': self.skipped_late,
+            'runs': self.store.counts()
+        }
+
+
+def default_jobs(integrator) -> List[CampaignJob]:
+    """
+    The WhatsAppIntegrator campaigns: the morning update request at 09:00,
+    the daily reminder at 18:00 and the weekly report on Fridays at 17:00.
+    Times are overridable with ``SCHEDULE_MORNING``, ``SCHEDULE_REMINDER``
+    and ``SCHEDULE_WEEKLY`` (``HH:MM``), the spread with ``SCHEDULE_SPREAD_SECONDS``.
+    """
+    spread = float(os.getenv("SCHEDULE_SPREAD_SECONDS", "1800"))
+
+    def at(name: str, default: str) -> time:
+        return time.fromisoformat(os.getenv(name, default))
+
+    return [
+        CampaignJob("morning_update_request", at("SCHEDULE_MORNING", "09:00"),
+                    lambda employee: integrator.send_morning_update_request(employee["id"]),
+                    spread=spread),
+        CampaignJob("daily_reminder", at("SCHEDULE_REMINDER", "18:00"),
+                    integrator.send_daily_reminder,
+                    spread=spread),
+        CampaignJob("weekly_report", at("SCHEDULE_WEEKLY", "17:00"),
+                    lambda employee: integrator.send_weekly_report(employee["id"]),
+                    weekdays=frozenset({4}), spread=spread),
+    ]
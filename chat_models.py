@@ -1,6 +1,7 @@
 from database import Base
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index, tuple_
 from datetime import datetime
+import base64
 
 class ChatMessage(Base):
     """
@@ -16,6 +17,11 @@ class ChatMessage(Base):
     message_type = Column(String(20))  # 'user' or 'system'
     status = Column(String(20), default='pending')  # 'pending', 'processed', 'responded'
 
+    # Backs keyset pagination: ORDER BY timestamp DESC, id DESC is a backward index scan
+    __table_args__ = (
+        Index('ix_chat_messages_timestamp_id', 'timestamp', 'id'),
+    )
+
     def to_dict(self):
         """
         Convert the message to a dictionary format for API responses
@@ -28,6 +34,91 @@ class ChatMessage(Base):
             'status': self.status,
         }
 
+    @staticmethod
+    def serialize_rows(rows):
+        """
+        Convert (id, content, timestamp, message_type, status) rows to API
+        dictionaries in one pass, without building ORM objects
+        """
+        return [
+            {
+                'id': message_id,
+                'content': content,
+                # Same output as strftime('%Y-%m-%d %H:%M:%S'), several times faster
+                'timestamp': timestamp.isoformat(' ', 'seconds'),
+                'message_type': message_type,
+                'status': status,
+            }
+            for message_id, content, timestamp, message_type, status in rows
+        ]
+
+    @staticmethod
+    def encode_cursor(timestamp, message_id):
+        """
+        Build an opaque pagination cursor pointing at a message
+        """
+        raw = f"{timestamp.isoformat()}|{message_id}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        Parse a cursor from encode_cursor into (timestamp, id).
+        Raises ValueError for malformed cursors.
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            timestamp, message_id = raw.rsplit('|', 1)
+            return datetime.fromisoformat(timestamp), int(message_id)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+
+    @classmethod
+    def page(cls, db, before=None, limit=50):
+        """
+        Fetch one page of messages, newest first, using keyset pagination
+        on (timestamp, id).
+
+        Unlike OFFSET, the cost does not grow with how far back the page
+        is: the database seeks straight to the cursor in the composite
+        index and reads ``limit + 1`` entries.
+
+        Returns a (messages, next_cursor) tuple; next_cursor is None on the
+        last page.
+        """
+        query = db.query(cls.id, cls.content, cls.timestamp, cls.message_type, cls.status)
+        if before is not None:
+            timestamp, message_id = cls.decode_cursor(before)
+            query = query.filter(tuple_(cls.timestamp, cls.id) < tuple_(timestamp, message_id))
+        rows = query.order_by(cls.timestamp.desc(), cls.id.desc()).limit(limit + 1).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = cls.encode_cursor(last.timestamp, last.id)
+        return cls.serialize_rows(rows), next_cursor
+
+    @classmethod
+    def record_turn(cls, db, user_message, response_content):
+        """
+        Persist a chat turn in a single transaction: the user message is
+        inserted (or, if already stored as pending, updated in place) with
+        status 'responded' alongside the system reply.
+
+        Both messages are serialized after the flush and before the commit,
+        so reading them back costs no extra round-trips.
+
+        Returns a (user_message_dict, ai_message_dict) tuple.
+        """
+        ai_message = cls.create_system_message(response_content)
+        user_message.status = 'responded'
+        db.add_all([user_message, ai_message])
+        db.flush()
+        serialized = (user_message.to_dict(), ai_message.to_dict())
+        db.commit()
+        return serialized
+
     @classmethod
     def create_system_message(cls, content):
         """
@@ -35,6 +126,7 @@ class ChatMessage(Base):
         """
         return cls(
             content=content,
+            timestamp=datetime.utcnow(),
             message_type='system',
             status='pending'
         )
@@ -42,10 +134,12 @@ class ChatMessage(Base):
     @classmethod
     def create_user_message(cls, content):
         """
-        Create a new user message
+        Create a new user message, stamped with the time it was received
+        rather than the time it is written
         """
         return cls(
             content=content,
+            timestamp=datetime.utcnow(),
             message_type='user',
             status='pending'
         )
@@ -0,0 +1,156 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of making a call while the breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency that is failing or too slow, so callers
+    can fall back immediately instead of each waiting out a timeout.
+
+    The outcomes of the last ``window_size`` calls are kept. Once at least
+    ``min_calls`` have been recorded, the breaker opens when the share of
+    failures reaches ``failure_rate`` or the share of calls slower than
+    ``slow_call_seconds`` reaches ``slow_call_rate``. While open every call
+    is rejected with CircuitOpenError. After ``open_seconds`` the breaker
+    goes half-open and lets ``half_open_calls`` probe calls through: if they
+    all succeed it closes with a fresh window, and any failure opens it again.
+    """
+
+    def __init__(self,
+                 name: str,
+                 failure_rate: Optional[float] = None,
+                 slow_call_seconds: Optional[float] = None,
+                 slow_call_rate: Optional[float] = None,
+                 window_size: int = 20,
+                 min_calls: int = 10,
+                 open_seconds: Optional[float] = None,
+                 half_open_calls: int = 1):
+        """
+        Args:
+            name: Dependency name used in logs and metrics
+            failure_rate: Share of failed calls that opens the breaker (``BREAKER_FAILURE_RATE``, 0.5)
+            slow_call_seconds: Calls taking longer than this count as slow (``BREAKER_SLOW_CALL_SECONDS``, 10)
+            slow_call_rate: Share of slow calls that opens the breaker (``BREAKER_SLOW_CALL_RATE``, 0.5)
+            window_size: Number of recent calls the rates are computed over
+            min_calls: Calls needed in the window before the breaker may open
+            open_seconds: Seconds to stay open before probing (``BREAKER_OPEN_SECONDS``, 30)
+            half_open_calls: Probe calls allowed while half-open
+        """
+        self.name = name
+        self.failure_rate = failure_rate or float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+        self.slow_call_seconds = slow_call_seconds or float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "10"))
+        self.slow_call_rate = slow_call_rate or float(os.getenv("BREAKER_SLOW_CALL_RATE", "0.5"))
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds or float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+        self.half_open_calls = half_open_calls
+        # (failed, slow) per call, most recent last
+        self._window: Deque[Tuple[bool, bool]] = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes = self._probe_successes = 0
+            logger.info(f"Circuit {self.name} half-open; probing")
+        return self._state
+
+    def _open(self, reason: str) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self.times_opened += 1
+        logger.warning(f"Circuit {self.name} opened ({reason}); failing fast for {self.open_seconds:g}s")
+
+    def allow(self) -> None:
+        """
+        Reserve a call, or raise CircuitOpenError if it must not be made.
+        Every allowed call must be followed by ``record()``.
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                return
+            self.rejected += 1
+        raise CircuitOpenError(f"Circuit {self.name} is open")
+
+    def record(self, duration: float, failed: bool) -> None:
+        """Record the outcome of a call made after ``allow()``"""
+        slow = duration > self.slow_call_seconds
+        with self._lock:
+            self.calls += 1
+            self.failures += int(failed)
+            self.slow_calls += int(slow)
+            if self._state == HALF_OPEN:
+                if failed or slow:
+                    self._open("probe failed" if failed else f"probe took {duration:.1f}s")
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_calls:
+                    self._state = CLOSED
+                    self._window.clear()
+                    logger.info(f"Circuit {self.name} closed")
+                return
+            if self._state == OPEN:
+                # A call that was already in flight when the breaker opened
+                return
+
+            self._window.append((failed, slow))
+            if len(self._window) < self.min_calls:
+                return
+            failure_rate, slow_rate = self._rates()
+            if failure_rate >= self.failure_rate:
+                self._open(f"{failure_rate:.0%} of recent calls failed")
+            elif slow_rate >= self.slow_call_rate:
+                self._open(f"{slow_rate:.0%} of recent calls took over {self.slow_call_seconds:g}s")
+
+    def _rates(self) -> Tuple[float, float]:
+        if not self._window:
+            return 0.0, 0.0
+        failed = sum(1 for f, _ in self._window if f)
+        slow = sum(1 for _, s in self._window if s)
+        return failed / len(self._window), slow / len(self._window)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            failure_rate, slow_rate = self._rates()
+            return {
+                'state': self._current_state(),
+                'calls': self.calls,
+                'failures': self.failures,
+                'slow_calls': self.slow_calls,
+                'rejected': self.rejected,
+                'times_opened': self.times_opened,
+                'window_failure_rate': round(failure_rate, 3),
+                'window_slow_call_rate': round(slow_rate, 3)
+            }
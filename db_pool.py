@@ -0,0 +1,158 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Tuple
+
+import psycopg2
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be acquired within the acquire timeout"""
+
+
+class AsyncConnectionPool:
+    """
+    Pool of psycopg2 connections usable from asyncio code.
+
+    Every blocking driver call runs on a dedicated thread pool sized to the
+    connection limit, so a slow query only occupies its own connection and
+    thread and never the event loop. Each operation checks out its own
+    connection, which keeps concurrent coroutines off each other's cursors.
+    """
+
+    def __init__(self,
+                 connect: Callable[[], Any],
+                 min_size: int = 1,
+                 max_size: int = 10,
+                 acquire_timeout: float = 10.0,
+                 health_check_interval: float = 30.0):
+        """
+        Open ``min_size`` connections up front.
+
+        Args:
+            connect: Zero-argument callable returning a new psycopg2 connection
+            min_size: Connections opened eagerly and kept idle
+            max_size: Upper bound on connections checked out at once
+            acquire_timeout: Seconds to wait for a free connection before raising PoolTimeout
+            health_check_interval: Idle connections unused for longer than this
+                are pinged with ``SELECT 1`` before being handed out
+        """
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        self._idle: Deque[Tuple[Any, float]] = deque()
+        self._semaphore = asyncio.Semaphore(max_size)
+        self._executor = ThreadPoolExecutor(max_workers=max_size, thread_name_prefix="db-pool")
+        self._closed = False
+        for _ in range(min_size):
+            self._idle.append((connect(), time.monotonic()))
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+    async def _in_thread(self, fn: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    @staticmethod
+    def _ping(conn) -> bool:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    @staticmethod
+    def _discard(conn) -> None:
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    async def acquire(self):
+        """Check out a healthy connection, opening a new one if none is idle"""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeout(
+                f"Timed out after {self.acquire_timeout}s waiting for a database connection"
+            )
+
+        try:
+            while self._idle:
+                conn, last_used = self._idle.pop()
+                if conn.closed:
+                    continue
+                if time.monotonic() - last_used > self.health_check_interval:
+                    if not await self._in_thread(self._ping, conn):
+                        logger.warning("Discarding unhealthy pooled database connection")
+                        await self._in_thread(self._discard, conn)
+                        continue
+                return conn
+            return await self._in_thread(self._connect)
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    async def release(self, conn) -> None:
+        """Return a connection to the pool, dropping it if it is broken"""
+        try:
+            if conn.closed:
+                return
+            if self._closed:
+                self._discard(conn)
+                return
+            if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    await self._in_thread(conn.rollback)
+                except psycopg2.Error:
+                    await self._in_thread(self._discard, conn)
+                    return
+            self._idle.append((conn, time.monotonic()))
+        finally:
+            self._semaphore.release()
+
+    @asynccontextmanager
+    async def connection(self):
+        conn = await self.acquire()
+        try:
+            yield conn
+        finally:
+            await self.release(conn)
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run ``fn(conn, *args)`` on a pooled connection in the pool's thread pool"""
+        async with self.connection() as conn:
+            return await self._in_thread(fn, conn, *args)
+
+    async def run_on(self, conn, fn: Callable, *args) -> Any:
+        """
+        Run ``fn(conn, *args)`` in the pool's thread pool on a connection
+        already checked out with ``connection()``, e.g. to keep a
+        server-side cursor open across several calls
+        """
+        return await self._in_thread(fn, conn, *args)
+
+    def close(self) -> None:
+        """Close idle connections and stop the worker threads"""
+        self._closed = True
+        while self._idle:
+            conn, _ = self._idle.pop()
+            self._discard(conn)
+        self._executor.shutdown(wait=False)
@@ -1,34 +1,123 @@
 import psycopg2
 import os
-from datetime import datetime
+import json
+import uuid
+import asyncio
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import logging
+from db_pool import AsyncConnectionPool
+from message_log_buffer import MessageLogBuffer
 
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Callbacks notified as listener(table, employee_id, row) after a per-employee write
+_write_listeners = []
+
+# daily_tasks columns returned by the performance history queries
+HISTORY_COLUMNS = ('id', 'employee_id', 'task_date', 'tasks_planned', 'tasks_completed', 'status', 'created_at')
+
 class EnhancedDataManager:
-    def __init__(self):
+    def __init__(self, min_size=None, max_size=None, acquire_timeout=None, write_behind=None):
         """
-        Initialize the database connection
+        Initialize the database connection pool.
+
+        With ``write_behind`` (or ``DB_WRITE_BEHIND=1``) message_logs inserts
+        and response updates are buffered and flushed in batches; call
+        ``close()`` on shutdown so buffered rows are written.
         """
-        self.conn = psycopg2.connect(
+        self.pool = AsyncConnectionPool(
+            self._connect,
+            min_size=min_size if min_size is not None else int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+            max_size=max_size if max_size is not None else int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            acquire_timeout=acquire_timeout if acquire_timeout is not None else float(os.getenv("DB_POOL_TIMEOUT", "10")),
+            health_check_interval=float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30")),
+        )
+        if write_behind is None:
+            write_behind = os.getenv("DB_WRITE_BEHIND", "0").lower() in ("1", "true", "yes")
+        self.log_buffer = MessageLogBuffer(
+            self.pool,
+            max_batch_size=int(os.getenv("DB_WRITE_BEHIND_BATCH_SIZE", "500")),
+            flush_interval=float(os.getenv("DB_WRITE_BEHIND_INTERVAL", "0.5")),
+        ) if write_behind else None
+
+    @staticmethod
+    def _connect():
+        return psycopg2.connect(
             dbname=os.getenv("DB_NAME", "postgres"),
             user=os.getenv("DB_USER", "postgres"),
             password=os.getenv("DB_PASSWORD"),
             host=os.getenv("DB_HOST"),
             port=os.getenv("DB_PORT", "5432")  # Default to PostgreSQL port
         )
-        self.cursor = self.conn.cursor()
 
     def close_connection(self):
         """
-        Close the database connection
+        Close the database connections
+        """
+        self.pool.close()
+
+    async def close(self):
         """
-        self.cursor.close()
-        self.conn.close()
+        Flush any buffered message logs, then close the database connections
+        """
+        if self.log_buffer is not None:
+            await self.log_buffer.close()
+        self.close_connection()
+
+    @staticmethod
+    def add_write_listener(listener):
+        """
+        Register a callback invoked as ``listener(table, employee_id, row)`` after
+        any manager writes a daily_tasks or message_logs row for an employee;
+        ``row`` holds the written columns (including ``id``). Returns a
+        function that unregisters it
+        """
+        _write_listeners.append(listener)
+        return lambda: EnhancedDataManager.remove_write_listener(listener)
+
+    @staticmethod
+    def remove_write_listener(listener):
+        if listener in _write_listeners:
+            _write_listeners.remove(listener)
+
+    @staticmethod
+    def _notify_write(table, employee_id, row=None):
+        for listener in list(_write_listeners):
+            try:
+                listener(table, employee_id, row)
+            except Exception as e:
+                logger.error(f"Error in write listener for {table}: {e}")
+
+    @staticmethod
+    def _run_query(conn, query, params, fetch, commit):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                if fetch == "one":
+                    result = cursor.fetchone()
+                elif fetch == "all":
+                    result = cursor.fetchall()
+                else:
+                    result = None
+            if commit:
+                conn.commit()
+            else:
+                # End the read-only transaction so the connection goes back idle
+                conn.rollback()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+
+    async def _execute(self, query, params, fetch="one", commit=True):
+        """
+        Run a single statement on its own pooled connection without blocking the event loop
+        """
+        return await self.pool.run(self._run_query, query, params, fetch, commit)
 
     async def store_task_analysis(self, employee_id, analysis_data):
         try:
@@ -37,9 +126,7 @@ class EnhancedDataManager:
                 VALUES (%s, %s, %s)
                 RETURNING id;
             """
-            self.cursor.execute(query, (employee_id, analysis_data, datetime.utcnow()))
-            self.conn.commit()
-            return self.cursor.fetchone()
+            return await self._execute(query, (employee_id, analysis_data, datetime.utcnow()))
         except Exception as e:
             logger.error(f"Error storing task analysis: {e}")
             return None
@@ -52,27 +139,87 @@ class EnhancedDataManager:
                 ORDER BY sent_at DESC
                 LIMIT 10;
             """
-            self.cursor.execute(query, (employee_id,))
-            return self.cursor.fetchall()
+            return await self._execute(query, (employee_id,), fetch="all", commit=False)
         except Exception as e:
             logger.error(f"Error fetching recent interactions: {e}")
             return None
 
     async def log_message(self, employee_id, message_type, content, attempt_number=1):
+        if self.log_buffer is not None:
+            try:
+                return await self._buffer_log(employee_id, message_type, content, attempt_number)
+            except Exception as e:
+                logger.error(f"Error logging message: {e}")
+                return None
         try:
             query = """
                 INSERT INTO message_logs (employee_id, message_type, message_content, sent_at, attempt_number)
                 VALUES (%s, %s, %s, %s, %s)
                 RETURNING id;
             """
-            self.cursor.execute(query, (employee_id, message_type, content, datetime.utcnow(), attempt_number))
-            self.conn.commit()
-            return self.cursor.fetchone()
+            sent_at = datetime.utcnow()
+            result = await self._execute(query, (employee_id, message_type, content, sent_at, attempt_number))
+            self._notify_write("message_logs", employee_id, {
+                'id': result[0], 'message_type': message_type, 'message_content': content,
+                'sent_at': sent_at, 'attempt_number': attempt_number
+            })
+            return result
         except Exception as e:
             logger.error(f"Error logging message: {e}")
             return None
 
+    async def store_message_log(self, phone_number, message_type, content, payload=None):
+        """
+        Log a message sent to or received from a WhatsApp number, e.g. an
+        ``inbound`` webhook message or an ``outbound`` reply.
+
+        The number is resolved to its employee, since message_logs is keyed by
+        employee; ``payload`` (the provider message or send response) is not
+        stored. Never raises, so a failed log write can't fail the send or
+        webhook it belongs to. Returns the ``(id,)`` row, or None if the number
+        is unknown or the write failed.
+        """
+        try:
+            query = """
+                SELECT id FROM employees
+                WHERE whatsapp_number = %s;
+            """
+            row = await self._execute(query, (phone_number,), commit=False)
+        except Exception as e:
+            logger.error(f"Error resolving employee for {phone_number}: {e}")
+            return None
+        if row is None:
+            logger.warning(f"Not logging {message_type} message for unknown number {phone_number}")
+            return None
+        return await self.log_message(row[0], message_type, content)
+
+    def _buffer_log(self, employee_id, message_type, content, attempt_number):
+        future = self.log_buffer.add_log(employee_id, message_type, content, attempt_number)
+        # Notify listeners once the row is written; failures are already logged
+        # by the buffer, so checking exception() here also marks them retrieved
+        future.add_done_callback(
+            lambda f: f.cancelled() or f.exception() or self._notify_write("message_logs", employee_id, {
+                'id': f.result()[0], 'message_type': message_type, 'message_content': content,
+                'attempt_number': attempt_number
+            })
+        )
+        return future
+
+    def log_message_nowait(self, employee_id, message_type, content, attempt_number=1):
+        """
+        Log a message without waiting for the write; returns a future for the ``(id,)`` row
+        """
+        if self.log_buffer is not None:
+            return self._buffer_log(employee_id, message_type, content, attempt_number)
+        return asyncio.ensure_future(self.log_message(employee_id, message_type, content, attempt_number))
+
     async def update_message_response(self, message_id, response):
+        if self.log_buffer is not None:
+            try:
+                return await self.log_buffer.add_response(message_id, response)
+            except Exception as e:
+                logger.error(f"Error updating message response: {e}")
+                return None
         try:
             query = """
                 UPDATE message_logs
@@ -80,9 +227,7 @@ class EnhancedDataManager:
                 WHERE id = %s
                 RETURNING id;
             """
-            self.cursor.execute(query, (response, datetime.utcnow(), message_id))
-            self.conn.commit()
-            return self.cursor.fetchone()
+            return await self._execute(query, (response, datetime.utcnow(), message_id))
         except Exception as e:
             logger.error(f"Error updating message response: {e}")
             return None
@@ -94,13 +239,40 @@ class EnhancedDataManager:
                 VALUES (%s, %s, %s, %s, %s)
                 RETURNING id;
             """
-            self.cursor.execute(query, (employee_id, datetime.utcnow().date(), tasks_planned, "pending", datetime.utcnow()))
-            self.conn.commit()
-            return self.cursor.fetchone()
+            now = datetime.utcnow()
+            result = await self._execute(query, (employee_id, now.date(), tasks_planned, "pending", now))
+            self._notify_write("daily_tasks", employee_id, {
+                'id': result[0], 'task_date': now.date(), 'tasks_planned': tasks_planned,
+                'tasks_completed': None, 'status': "pending", 'created_at': now
+            })
+            return result
         except Exception as e:
             logger.error(f"Error creating daily task: {e}")
             return None
 
+    async def complete_daily_task(self, task_id, tasks_completed):
+        """
+        Record the tasks an employee completed against a daily_tasks row
+        """
+        try:
+            query = """
+                UPDATE daily_tasks
+                SET tasks_completed = %s, status = %s
+                WHERE id = %s
+                RETURNING id, employee_id, task_date, tasks_planned, created_at;
+            """
+            result = await self._execute(query, (tasks_completed, "completed", task_id))
+            if result is not None:
+                row_id, employee_id, task_date, tasks_planned, created_at = result
+                self._notify_write("daily_tasks", employee_id, {
+                    'id': row_id, 'task_date': task_date, 'tasks_planned': tasks_planned,
+                    'tasks_completed': tasks_completed, 'status': "completed", 'created_at': created_at
+                })
+            return result
+        except Exception as e:
+            logger.error(f"Error completing daily task: {e}")
+            return None
+
     async def get_employee_history(self, employee_id):
         try:
             query = """
@@ -109,12 +281,113 @@ class EnhancedDataManager:
                 ORDER BY created_at DESC
                 LIMIT 10;
             """
-            self.cursor.execute(query, (employee_id,))
-            return self.cursor.fetchall()
+            return await self._execute(query, (employee_id,), fetch="all", commit=False)
         except Exception as e:
             logger.error(f"Error getting employee history: {e}")
             return None
 
+    @staticmethod
+    def _open_history_cursor(conn, query, params, batch_size):
+        # A named cursor keeps the result set on the server; rows cross the
+        # wire batch_size at a time instead of all at once
+        cursor = conn.cursor(name=f"history_{uuid.uuid4().hex}")
+        cursor.itersize = batch_size
+        cursor.execute(query, params)
+        return cursor
+
+    @staticmethod
+    def _fetch_history_batch(conn, cursor, batch_size):
+        return [dict(zip(HISTORY_COLUMNS, row)) for row in cursor.fetchmany(batch_size)]
+
+    @staticmethod
+    def _close_history_cursor(conn, cursor):
+        try:
+            cursor.close()
+            conn.rollback()
+        except psycopg2.Error:
+            # Already failed; the pool discards or resets the connection on release
+            pass
+
+    async def stream_performance_history(self, employee_ids, start_date, end_date, batch_size=None):
+        """
+        Stream daily_tasks rows for many employees and a date range
+        (inclusive) in batches, ordered by employee, date and creation time.
+
+        One query with ``employee_id = ANY(...)`` runs on a server-side
+        cursor, so memory stays bounded by ``batch_size`` however large the
+        range; it relies on the index in
+        migrations/001_daily_tasks_employee_date_index.sql. Unlike the other
+        methods, errors are raised to the caller.
+
+        Yields:
+            Lists of up to ``batch_size`` row dicts keyed by HISTORY_COLUMNS
+        """
+        batch_size = batch_size or int(os.getenv("DB_HISTORY_BATCH_SIZE", "2000"))
+        query = f"""
+            SELECT {', '.join(HISTORY_COLUMNS)} FROM daily_tasks
+            WHERE employee_id = ANY(%s::uuid[])
+              AND task_date BETWEEN %s AND %s
+            ORDER BY employee_id, task_date, created_at;
+        """
+        # psycopg2 sends a list of str as text[]; the cast matches the uuid column
+        params = ([str(employee_id) for employee_id in employee_ids], start_date, end_date)
+        async with self.pool.connection() as conn:
+            cursor = await self.pool.run_on(conn, self._open_history_cursor, query, params, batch_size)
+            try:
+                while True:
+                    batch = await self.pool.run_on(conn, self._fetch_history_batch, cursor, batch_size)
+                    if not batch:
+                        break
+                    yield batch
+            finally:
+                await self.pool.run_on(conn, self._close_history_cursor, cursor)
+
+    async def iter_team_performance_history(self, employee_ids, start_date, end_date, batch_size=None):
+        """
+        Like stream_performance_history, but yields ``(employee_id, rows)``
+        once per employee, so only one employee's rows are held at a time
+        """
+        current_id, rows = None, []
+        async for batch in self.stream_performance_history(employee_ids, start_date, end_date, batch_size):
+            for row in batch:
+                if row['employee_id'] != current_id and rows:
+                    yield current_id, rows
+                    rows = []
+                current_id = row['employee_id']
+                rows.append(row)
+        if rows:
+            yield current_id, rows
+
+    async def get_team_performance_history(self, employee_ids, start_date, end_date):
+        """
+        daily_tasks rows for many employees and a date range in one query,
+        grouped as ``{employee_id: [row, ...]}``; employees without rows map to ``[]``
+        """
+        try:
+            history = {employee_id: [] for employee_id in employee_ids}
+            # Key rows by the ids the caller passed, even if the column type differs (e.g. "12" vs 12)
+            requested = {str(employee_id): employee_id for employee_id in employee_ids}
+            async for employee_id, rows in self.iter_team_performance_history(employee_ids, start_date, end_date):
+                history[requested.get(str(employee_id), employee_id)] = rows
+            return history
+        except Exception as e:
+            logger.error(f"Error getting team performance history: {e}")
+            return None
+
+    async def get_employee_performance_history(self, employee_id, start_date, end_date):
+        """
+        One employee's daily_tasks rows between two dates (inclusive), oldest first
+        """
+        history = await self.get_team_performance_history([employee_id], start_date, end_date)
+        return None if history is None else history[employee_id]
+
+    async def store_ai_feedback(self, employee_id, feedback_type, data):
+        """
+        Store AI-generated feedback (e.g. performance insights) as a feedback record
+        """
+        content = json.dumps({'type': feedback_type, 'data': data}, default=str)
+        return await self.create_feedback_record(employee_id, content)
+
     async def create_feedback_record(self, employee_id, feedback_content):
         try:
             query = """
@@ -122,9 +395,82 @@ class EnhancedDataManager:
                 VALUES (%s, %s, %s)
                 RETURNING id;
             """
-            self.cursor.execute(query, (employee_id, feedback_content, datetime.utcnow()))
-            self.conn.commit()
-            return self.cursor.fetchone()
+            return await self._execute(query, (employee_id, feedback_content, datetime.utcnow()))
         except Exception as e:
             logger.error(f"Error creating feedback record: {e}")
             return None
+
+    async def get_employee(self, employee_id):
+        """Employee record as a dict, or None if not found"""
+        try:
+            query = """
+                SELECT to_jsonb(employees) FROM employees
+                WHERE id = %s;
+            """
+            row = await self._execute(query, (employee_id,), commit=False)
+            return row[0] if row else None
+        except Exception as e:
+            logger.error(f"Error fetching employee {employee_id}: {e}")
+            return None
+
+    async def get_active_employees(self):
+        """Records of every active employee as dicts"""
+        try:
+            query = """
+                SELECT to_jsonb(employees) FROM employees
+                WHERE status = 'active';
+            """
+            rows = await self._execute(query, (), fetch="all", commit=False)
+            return [row[0] for row in rows]
+        except Exception as e:
+            logger.error(f"Error fetching active employees: {e}")
+            return None
+
+    async def claim_webhook_message(self, message_id):
+        """
+        Record a provider message id; returns False if it was already recorded,
+        None if the database could not be reached
+        """
+        try:
+            # The table comes from migrations/002_processed_webhook_messages.sql
+            query = """
+                INSERT INTO processed_webhook_messages (message_id, processed_at)
+                VALUES (%s, %s)
+                ON CONFLICT (message_id) DO NOTHING
+                RETURNING message_id;
+            """
+            return await self._execute(query, (message_id, datetime.utcnow())) is not None
+        except Exception as e:
+            logger.error(f"Error claiming webhook message {message_id}: {e}")
+            return None
+
+    async def release_webhook_message(self, message_id):
+        try:
+            query = """
+                DELETE FROM processed_webhook_messages
+                WHERE message_id = %s;
+            """
+            await self._execute(query, (message_id,), fetch=None)
+        except Exception as e:
+            logger.error(f"Error releasing webhook message {message_id}: {e}")
+
+    async def prune_webhook_messages(self, older_than_days):
+        """
+        Delete processed webhook message ids older than ``older_than_days``;
+        providers stop redelivering long before that. Returns the number of
+        rows deleted, or None if the delete failed.
+        """
+        try:
+            query = """
+                WITH deleted AS (
+                    DELETE FROM processed_webhook_messages
+                    WHERE processed_at < %s
+                    RETURNING 1
+                )
+                SELECT count(*) FROM deleted;
+            """
+            cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+            return (await self._execute(query, (cutoff,)))[0]
+        except Exception as e:
+            logger.error(f"Error pruning processed webhook messages: {e}")
+            return None
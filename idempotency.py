@@ -0,0 +1,101 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyStore:
+    """
+    Remembers which provider message ids have already been processed so
+    webhook redeliveries are dropped before any expensive work starts.
+
+    A bounded in-memory LRU answers repeat ids without a round-trip; the
+    database unique key (via ``EnhancedDataManager.claim_webhook_message``)
+    catches duplicates across restarts and across processes. Database rows
+    older than ``retention_days`` are pruned in the background at most every
+    ``prune_interval`` seconds, so the table stays bounded too.
+    """
+
+    def __init__(self,
+                 data_manager=None,
+                 max_entries: int = 100_000,
+                 retention_days: float = 7,
+                 prune_interval: float = 3600):
+        self.data_manager = data_manager
+        self.max_entries = max_entries
+        self.retention_days = retention_days
+        self.prune_interval = prune_interval
+        self._seen: "OrderedDict[str, bool]" = OrderedDict()
+        self._next_prune = 0.0
+        self._prune_task: Optional[asyncio.Task] = None
+        self.claimed = 0
+        self.duplicates = 0
+        self.pruned = 0
+
+    def _remember(self, message_id: str) -> None:
+        self._seen[message_id] = True
+        self._seen.move_to_end(message_id)
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+
+    def _maybe_prune(self) -> None:
+        now = time.monotonic()
+        if self.data_manager is None or now < self._next_prune:
+            return
+        if self._prune_task is not None and not self._prune_task.done():
+            return
+        self._next_prune = now + self.prune_interval
+        # Off the claim path: a slow delete must not hold up webhook processing
+        self._prune_task = asyncio.ensure_future(self._prune())
+
+    async def _prune(self) -> None:
+        deleted = await self.data_manager.prune_webhook_messages(self.retention_days)
+        if deleted:
+            self.pruned += deleted
+            logger.info(f"Pruned {deleted} processed webhook message ids older than {self.retention_days} days")
+
+    async def claim(self, message_id: str) -> bool:
+        """
+        Claim a message id for processing.
+
+        Returns:
+            True if this is the first time the id is seen, False for a duplicate
+        """
+        self._maybe_prune()
+        message_id = str(message_id)
+        if message_id in self._seen:
+            self._seen.move_to_end(message_id)
+            self.duplicates += 1
+            return False
+        # Record the claim before awaiting so a concurrent duplicate in this
+        # process is rejected while the database check is in flight
+        self._remember(message_id)
+
+        if self.data_manager is not None:
+            first_time = await self.data_manager.claim_webhook_message(message_id)
+            if first_time is False:
+                self.duplicates += 1
+                return False
+
+        self.claimed += 1
+        return True
+
+    async def release(self, message_id: str) -> None:
+        """Forget a claim, e.g. when processing failed and a redelivery should be handled"""
+        message_id = str(message_id)
+        self._seen.pop(message_id, None)
+        if self.data_manager is not None:
+            await self.data_manager.release_webhook_message(message_id)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.claimed + self.duplicates
+        return {
+            'claimed': self.claimed,
+            'duplicates': self.duplicates,
+            'duplicate_rate': self.duplicates / total if total else 0,
+            'memory_entries': len(self._seen),
+            'pruned': self.pruned
+        }
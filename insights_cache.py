@@ -0,0 +1,125 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+from enhanced_data_manager import EnhancedDataManager
+from performance_analyzer import PerformanceAnalyzer
+
+logger = logging.getLogger(__name__)
+
+
+class InsightsCache:
+    """
+    Per-employee, per-period cache of ``PerformanceAnalyzer.generate_insights``.
+
+    Entries are dropped as soon as any EnhancedDataManager writes a
+    daily_tasks or message_logs row for that employee, and expire after
+    ``ttl`` seconds as a fallback for writes made outside this process.
+    At most ``max_entries`` are kept, least recently used evicted first.
+    Call ``close()`` when done so the write listener is unregistered.
+    """
+
+    def __init__(self,
+                 analyzer: PerformanceAnalyzer,
+                 ttl: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        self.analyzer = analyzer
+        self.ttl = ttl if ttl is not None else float(os.getenv("INSIGHTS_CACHE_TTL", "900"))
+        self.max_entries = max_entries or int(os.getenv("INSIGHTS_CACHE_SIZE", "10000"))
+        self._entries: "OrderedDict[tuple[str, str], tuple[Dict[str, Any], float]]" = OrderedDict()
+        # Computations in flight per employee, and a counter bumped when one of
+        # them is invalidated, so insights that are already stale aren't stored
+        self._computing: Dict[str, int] = {}
+        self._generations: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self._unsubscribe = EnhancedDataManager.add_write_listener(self._on_write)
+
+    def close(self) -> None:
+        """Stop listening for writes and drop every entry"""
+        self._unsubscribe()
+        self._entries.clear()
+
+    def _on_write(self, table: str, employee_id: Any, row: Optional[Dict[str, Any]] = None) -> None:
+        self.invalidate(employee_id)
+
+    def invalidate(self, employee_id: Any) -> None:
+        """Drop every cached period for an employee"""
+        employee_id = str(employee_id)
+        if employee_id in self._computing:
+            self._generations[employee_id] = self._generations.get(employee_id, 0) + 1
+        stale = [key for key in self._entries if key[0] == employee_id]
+        for key in stale:
+            del self._entries[key]
+        if stale:
+            self.invalidations += 1
+
+    async def get(self, employee_id: str, time_period: str = "1w") -> Dict[str, Any]:
+        """Return cached insights, computing and caching them on a miss"""
+        key = (str(employee_id), time_period)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        generation = self._generations.get(key[0], 0)
+        self._computing[key[0]] = self._computing.get(key[0], 0) + 1
+        try:
+            insights = await self.analyzer.generate_insights(employee_id, time_period)
+        finally:
+            stale = self._generations.get(key[0], 0) != generation
+            self._computing[key[0]] -= 1
+            if not self._computing[key[0]]:
+                del self._computing[key[0]]
+                self._generations.pop(key[0], None)
+        # generate_insights returns an empty skeleton on failure; don't cache that
+        if insights.get('performance_trend') and not stale:
+            self._entries[key] = (insights, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return insights
+
+    async def warm_up(self,
+                      employee_ids: Iterable[str],
+                      time_period: str = "1w",
+                      concurrency: int = 4) -> Dict[str, int]:
+        """
+        Precompute insights for many employees, e.g. from an off-peak scheduler job
+        """
+        employee_ids = list(employee_ids)
+        # One history query for everyone instead of one per employee
+        await self.analyzer.preload_history(employee_ids)
+        semaphore = asyncio.Semaphore(concurrency)
+        warmed = failed = 0
+
+        async def warm(employee_id):
+            nonlocal warmed, failed
+            async with semaphore:
+                self._entries.pop((str(employee_id), time_period), None)
+                insights = await self.get(employee_id, time_period)
+                if insights.get('performance_trend'):
+                    warmed += 1
+                else:
+                    failed += 1
+
+        await asyncio.gather(*(warm(employee_id) for employee_id in employee_ids))
+        logger.info(f"Warmed {time_period} insights for {warmed} employees ({failed} failed)")
+        return {'warmed': warmed, 'failed': failed}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'evictions': self.evictions,
+            'entries': len(self._entries)
+        }
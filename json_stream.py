@@ -0,0 +1,226 @@
+import json
+import logging
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_CLOSERS = {'{': '}', '[': ']'}
+
+# How many cut points repair_json tries, from the end of the text backwards
+MAX_REPAIR_ATTEMPTS = 256
+
+
+def repair_json(text: str) -> Optional[Any]:
+    """
+    Parse the JSON object in ``text``, recovering as much as possible if it
+    was cut off.
+
+    Anything before the first ``{`` (code fences, preamble) is ignored, and
+    so is anything after the object closes. A truncated object is cut back
+    to the last point where a value ended and its open strings, arrays and
+    objects are closed, so e.g. ``{"a": [1, 2], "b": "unfinish`` parses as
+    ``{"a": [1, 2], "b": "unfinish"}``.
+
+    Returns:
+        The parsed value, or None if no usable prefix parses
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+
+    stack: List[str] = []
+    in_string = escape = False
+    # (end index, open brackets at that point) where a value just ended
+    cut_points: List[Tuple[int, Tuple[str, ...]]] = []
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+                cut_points.append((i + 1, tuple(stack)))
+            continue
+        if char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(char)
+        elif char in '}]':
+            if stack:
+                stack.pop()
+            if not stack:
+                try:
+                    return json.loads(text[start:i + 1])
+                except json.JSONDecodeError:
+                    break
+            cut_points.append((i + 1, tuple(stack)))
+        elif char == ',':
+            cut_points.append((i, tuple(stack)))
+
+    candidates = []
+    if in_string:
+        # Keep the partial string value itself
+        candidates.append(text[start:] + '"' + ''.join(_CLOSERS[c] for c in reversed(stack)))
+    candidates.append(text[start:] + ''.join(_CLOSERS[c] for c in reversed(stack)))
+    for end, open_brackets in reversed(cut_points[-MAX_REPAIR_ATTEMPTS:]):
+        prefix = text[start:end].rstrip().rstrip(',')
+        candidates.append(prefix + ''.join(_CLOSERS[c] for c in reversed(open_brackets)))
+
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+class StreamingArrayParser:
+    """
+    Pulls the objects of one array out of a JSON document while it is still
+    arriving, e.g. the ``tasks`` of an LLM answer streamed token by token.
+
+    ``feed()`` takes the next chunk of text and returns every element of
+    ``<key>`` on the top-level object that was completed by it, so callers
+    can act on early elements long before the answer ends. Text before the
+    first ``{`` (code fences, preamble) is skipped. ``finish()`` parses the
+    whole document, falling back to ``repair_json`` if it was cut off.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.elements = 0
+        self.malformed = 0
+        self._text = ""
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._end: Optional[int] = None
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._pending_key: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._array_done = False
+        self._element_start: Optional[int] = None
+        # (start, end) of elements that did not parse, to drop them in finish()
+        self._malformed_spans: List[Tuple[int, int]] = []
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    @property
+    def complete(self) -> bool:
+        """Whether the top-level object has been closed"""
+        return self._end is not None
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Add the next piece of the document and return the elements it completed"""
+        self._text += chunk
+        if self._end is not None:
+            return []
+        if self._start is None:
+            start = self._text.find('{', self._pos)
+            if start == -1:
+                self._pos = len(self._text)
+                return []
+            self._start = self._pos = start
+
+        completed = []
+        text, stack = self._text, self._stack
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:i + 1]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == ':':
+                if len(stack) == 1 and self._last_string is not None:
+                    try:
+                        self._pending_key = json.loads(self._last_string)
+                    except json.JSONDecodeError:
+                        self._pending_key = None
+            elif char == ',':
+                self._pending_key = None
+            elif char in _CLOSERS:
+                if self._array_depth is not None and len(stack) == self._array_depth and char == '{':
+                    self._element_start = i
+                stack.append(char)
+                if char == '[' and self._pending_key == self.key and not self._array_done and len(stack) == 2:
+                    self._array_depth = len(stack)
+                self._pending_key = None
+            elif char in '}]':
+                if stack:
+                    stack.pop()
+                if self._array_depth is not None:
+                    if char == '}' and len(stack) == self._array_depth and self._element_start is not None:
+                        completed.extend(self._element(self._element_start, i))
+                        self._element_start = None
+                    elif char == ']' and len(stack) == self._array_depth - 1:
+                        self._array_depth = None
+                        self._array_done = True
+                if not stack:
+                    self._end = i
+                    break
+        self._pos = len(text) if self._end is None else self._end + 1
+        return completed
+
+    def _element(self, start: int, end: int) -> List[Any]:
+        self.elements += 1
+        try:
+            return [json.loads(self._text[start:end + 1])]
+        except json.JSONDecodeError as e:
+            self.malformed += 1
+            self._malformed_spans.append((start, end))
+            logger.warning(f"Skipping malformed {self.key} element: {e}")
+            return []
+
+    def _without_malformed(self) -> str:
+        """The document with malformed elements (and one adjoining comma each) cut out"""
+        text = self._text[:self._end + 1]
+        for start, end in reversed(self._malformed_spans):
+            after = end + 1
+            while after < len(text) and text[after].isspace():
+                after += 1
+            if after < len(text) and text[after] == ',':
+                text = text[:start] + text[after + 1:]
+                continue
+            before = start - 1
+            while before > 0 and text[before].isspace():
+                before -= 1
+            if text[before] == ',':
+                start = before
+            text = text[:start] + text[end + 1:]
+        return text[self._start:]
+
+    def finish(self) -> Tuple[Optional[Any], bool]:
+        """
+        Parse the document received so far.
+
+        Returns:
+            (document, complete): the parsed document (None if nothing could
+            be recovered) and whether it parsed without repair
+        """
+        if self._end is not None:
+            try:
+                return json.loads(self._text[self._start:self._end + 1]), True
+            except json.JSONDecodeError as e:
+                logger.warning(f"Streamed JSON document is malformed ({e}); recovering what parses")
+            if self._malformed_spans:
+                try:
+                    return json.loads(self._without_malformed()), False
+                except json.JSONDecodeError:
+                    pass
+        return repair_json(self._text), False
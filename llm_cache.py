@@ -0,0 +1,216 @@
+import os
+import re
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class LLMCache:
+    """
+    Cache for LLM completions keyed on model, normalized prompt and temperature.
+
+    Lookups go to an in-memory LRU first and then, if configured, to a SQLite
+    file that survives restarts. Both tiers expire entries after ``ttl``
+    seconds; the file is also cut back to ``max_disk_entries`` every
+    ``PRUNE_EVERY`` writes, dropping the entries closest to expiry first. The cache is thread-safe so the
+    synchronous Flask path and the async analyzers can share one instance.
+    Async code should use ``aget``/``aset``, which keep the SQLite I/O off
+    the event loop.
+    """
+
+    # Writes between prunes of expired and excess rows from the SQLite tier
+    PRUNE_EVERY = 100
+
+    def __init__(self,
+                 max_entries: int = 1024,
+                 ttl: float = 3600,
+                 sqlite_path: Optional[str] = None,
+                 max_disk_entries: int = 100_000):
+        """
+        Args:
+            max_entries: Maximum entries kept in the in-memory LRU
+            ttl: Seconds an entry stays valid in either tier
+            sqlite_path: Optional SQLite file for the persistent tier
+            max_disk_entries: Maximum entries kept in the SQLite tier
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Separate, so memory lookups never wait behind disk I/O
+        self._db_lock = threading.Lock()
+        self._writes_since_prune = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._db = None
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_expires_at ON llm_cache (expires_at)")
+            self._prune()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Collapse whitespace and case so trivially different prompts share an entry"""
+        return _WHITESPACE.sub(" ", text).strip().casefold()
+
+    @classmethod
+    def make_key(cls,
+                 model: str,
+                 messages: List[Dict[str, str]],
+                 temperature: Optional[float] = None) -> str:
+        normalized = [[m.get("role"), cls.normalize(m.get("content", ""))] for m in messages]
+        raw = json.dumps([model, normalized, temperature], separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at >= now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+            if self._db is None:
+                self.misses += 1
+            return None
+
+    def _disk_get(self, key: str, now: float) -> Optional[str]:
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading LLM cache entry: {e}")
+            row = None
+        with self._lock:
+            if row is not None and row[1] >= now:
+                self._remember(key, row[0], row[1])
+                self.hits += 1
+                self.disk_hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def _disk_set(self, key: str, value: str, expires_at: float) -> None:
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at)
+                )
+                self._db.commit()
+                self._writes_since_prune += 1
+                if self._writes_since_prune < self.PRUNE_EVERY:
+                    return
+            self._prune()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing LLM cache entry: {e}")
+
+    def _prune(self) -> None:
+        """Delete expired entries, then the ones closest to expiry beyond ``max_disk_entries``"""
+        with self._db_lock:
+            self._writes_since_prune = 0
+            self._db.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+            self._db.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,)
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up an entry; blocks on the SQLite tier, so async code should use ``aget``"""
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None and self._db is not None:
+            value = self._disk_get(key, now)
+        return value
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Like ``get``, with the SQLite lookup run in a worker thread"""
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None and self._db is not None:
+            value = await asyncio.to_thread(self._disk_get, key, now)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """Store an entry; blocks on the SQLite tier, so async code should use ``aset``"""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+        if self._db is not None:
+            self._disk_set(key, value, expires_at)
+
+    async def aset(self, key: str, value: str) -> None:
+        """Like ``set``, with the SQLite write run in a worker thread"""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_set, key, value, expires_at)
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'disk_hits': self.disk_hits,
+                'hit_rate': self.hits / lookups if lookups else 0,
+                'memory_entries': len(self._memory)
+            }
+
+
+_default_cache: Optional[LLMCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> LLMCache:
+    """
+    Process-wide cache configured from LLM_CACHE_SIZE, LLM_CACHE_TTL, LLM_CACHE_PATH
+    and LLM_CACHE_DISK_SIZE
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache(
+                max_entries=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+                ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+                sqlite_path=os.getenv("LLM_CACHE_PATH") or None,
+                max_disk_entries=int(os.getenv("LLM_CACHE_DISK_SIZE", "100000"))
+            )
+        return _default_cache
@@ -0,0 +1,393 @@
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import aiohttp
+
+from circuit_breaker import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+# Rate limiting and transient server errors are worth another attempt
+RETRYABLE_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class LLMError(Exception):
+    """The LLM API call failed: an error response, a broken connection or a malformed answer"""
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        # No status means the request never got an answer (connection reset, DNS, ...)
+        return self.status is None or self.status in RETRYABLE_STATUSES
+
+
+class LLMDeadlineExceeded(LLMError):
+    """The call's deadline passed before any attempt succeeded"""
+
+
+def _retry_after(response: aiohttp.ClientResponse) -> Optional[float]:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+class LLMClient:
+    """
+    Async client for an OpenAI-compatible chat completions API.
+
+    One instance is meant to be shared by everything that talks to the
+    model. Requests go over a pooled keep-alive ``aiohttp`` session (one
+    per event loop, since sessions cannot cross loops) and each call has a
+    single deadline that covers every attempt. Connection errors, 429s and
+    5xx answers are retried with full-jitter exponential backoff (honouring
+    ``Retry-After``) while the deadline allows. With ``hedge_after`` set, a
+    call still unanswered after that many seconds gets a second, identical
+    request and whichever answers first wins; this trims tail latency at
+    the cost of the occasional duplicate completion.
+
+    Calls also go through a circuit breaker: once too many recent calls
+    failed or were slow, calls raise CircuitOpenError straight away so
+    callers can use their fallback instead of waiting out the deadline.
+
+    Point ``base_url`` (or ``OPENAI_API_BASE``) at a local fake server,
+    e.g. ``python -m benchmarks.fake_openai``, to run fully offline.
+    """
+
+    def __init__(self,
+                 api_key: Optional[str] = None,
+                 base_url: Optional[str] = None,
+                 model: str = "gpt-3.5-turbo",
+                 timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None,
+                 backoff_base: float = 0.25,
+                 backoff_max: float = 4.0,
+                 hedge_after: Optional[float] = None,
+                 limit: int = 100,
+                 ttl_dns_cache: int = 300,
+                 keepalive_timeout: float = 30.0,
+                 breaker: Optional[CircuitBreaker] = None):
+        """
+        Args:
+            api_key: Bearer token (defaults to ``OPENAI_API_KEY``)
+            base_url: API root up to and including the version (``OPENAI_API_BASE``,
+                ``https://api.openai.com/v1``)
+            model: Model used when a call doesn't name one
+            timeout: Default per-call deadline in seconds, retries included (``LLM_TIMEOUT``, 30)
+            max_retries: Retries after the first attempt (``LLM_MAX_RETRIES``, 2)
+            backoff_base: First retry waits up to this many seconds, doubling each retry
+            backoff_max: Upper bound on a single backoff
+            hedge_after: Seconds before a hedged second request is sent (``LLM_HEDGE_AFTER``;
+                unset or 0 disables hedging)
+            limit: Maximum simultaneous connections per event loop
+            ttl_dns_cache: Seconds to cache DNS lookups for
+            keepalive_timeout: Seconds an idle connection is kept open for reuse
+            breaker: Circuit breaker guarding the API (defaults to one configured from the environment)
+        """
+        # Resolved when the session is created, so a .env loaded after construction still applies
+        self.api_key = api_key
+        self.base_url = (base_url or os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")).rstrip('/')
+        self.model = model
+        self.timeout = timeout or float(os.getenv("LLM_TIMEOUT", "30"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "2"))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        if hedge_after is None:
+            hedge_after = float(os.getenv("LLM_HEDGE_AFTER", "0"))
+        self.hedge_after = hedge_after
+        self.limit = limit
+        self.ttl_dns_cache = ttl_dns_cache
+        self.keepalive_timeout = keepalive_timeout
+        self.breaker = breaker or CircuitBreaker("llm")
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+        self._sessions_lock = threading.Lock()
+        self.requests = 0
+        self.attempts = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failures = 0
+        self.deadlines_exceeded = 0
+
+    async def start(self) -> aiohttp.ClientSession:
+        """Create the pooled session for the running event loop. Safe to call more than once."""
+        loop = asyncio.get_running_loop()
+        with self._sessions_lock:
+            session = self._sessions.get(loop)
+            if session is not None and not session.closed:
+                return session
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                ttl_dns_cache=self.ttl_dns_cache,
+                use_dns_cache=True,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                headers={
+                    "Authorization": f"Bearer {self.api_key or os.getenv('OPENAI_API_KEY')}",
+                    "Content-Type": "application/json"
+                },
+            )
+            self._sessions[loop] = session
+        logger.info(f"LLM HTTP session started for {self.base_url} (limit={self.limit})")
+        return session
+
+    async def close(self) -> None:
+        """Close the running event loop's session and release its connections"""
+        with self._sessions_lock:
+            session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+            logger.info("LLM HTTP session closed")
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        session = self._sessions.get(asyncio.get_running_loop())
+        if session is None or session.closed:
+            session = await self.start()
+        return session
+
+    def _payload(self, messages: List[Dict[str, str]], model: Optional[str],
+                 temperature: Optional[float], params: Dict[str, Any]) -> Dict[str, Any]:
+        payload = {"model": model or self.model, "messages": messages, **params}
+        if temperature is not None:
+            payload["temperature"] = temperature
+        return payload
+
+    async def _open(self, payload: Dict[str, Any], deadline: float) -> aiohttp.ClientResponse:
+        """Send one request and return the response once its status is known to be good"""
+        remaining = deadline - asyncio.get_running_loop().time()
+        if remaining <= 0:
+            raise LLMDeadlineExceeded("LLM call deadline exceeded")
+        session = await self._get_session()
+        self.attempts += 1
+        try:
+            response = await session.post(
+                f"{self.base_url}/chat/completions",
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=remaining)
+            )
+        except asyncio.TimeoutError:
+            raise LLMDeadlineExceeded(f"No answer from the LLM API within {remaining:.1f}s")
+        except aiohttp.ClientError as e:
+            raise LLMError(f"LLM request failed: {e}")
+
+        if response.status >= 400:
+            try:
+                body = await response.text()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                body = ""
+            finally:
+                response.release()
+            raise LLMError(
+                f"LLM API returned {response.status}: {body[:200]}",
+                status=response.status,
+                retry_after=_retry_after(response)
+            )
+        return response
+
+    async def _attempt(self, payload: Dict[str, Any], deadline: float) -> str:
+        response = await self._open(payload, deadline)
+        try:
+            data = await response.json(content_type=None)
+            return data["choices"][0]["message"]["content"]
+        except asyncio.TimeoutError:
+            raise LLMDeadlineExceeded("LLM call deadline exceeded while reading the answer")
+        except aiohttp.ClientError as e:
+            raise LLMError(f"LLM response interrupted: {e}")
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise LLMError(f"Malformed LLM response: {e}", status=response.status)
+        finally:
+            response.release()
+
+    async def _hedged(self, payload: Dict[str, Any], deadline: float, hedge_after: float) -> str:
+        """Race a second request against the first if it hasn't answered in ``hedge_after`` seconds"""
+        first = asyncio.ensure_future(self._attempt(payload, deadline))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_after)
+            if not done:
+                self.hedges += 1
+                pending.add(asyncio.ensure_future(self._attempt(payload, deadline)))
+
+            error = None
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _backoff(self, error: LLMError, attempt: int, deadline: float) -> float:
+        """Seconds to wait before retry number ``attempt + 1``; re-raises ``error`` if there shouldn't be one"""
+        if isinstance(error, LLMDeadlineExceeded):
+            self.deadlines_exceeded += 1
+            raise error
+        if not error.retryable or attempt >= self.max_retries:
+            self.failures += 1
+            raise error
+        if error.retry_after is not None:
+            delay = error.retry_after
+        else:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if asyncio.get_running_loop().time() + delay >= deadline:
+            self.deadlines_exceeded += 1
+            raise LLMDeadlineExceeded(f"LLM call deadline exceeded after {attempt + 1} attempts ({error})")
+        self.retries += 1
+        logger.warning(f"LLM call failed ({error}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+        return delay
+
+    async def _guarded(self, call, *args) -> Any:
+        """Run ``call(*args)`` through the circuit breaker, recording its duration and outcome"""
+        self.breaker.allow()
+        started = time.monotonic()
+        failed = False
+        try:
+            return await call(*args)
+        except LLMError as e:
+            # A rejected request (bad prompt, auth) says nothing about the API's health
+            failed = e.retryable
+            raise
+        finally:
+            self.breaker.record(time.monotonic() - started, failed)
+
+    async def _with_retries(self, send, payload: Dict[str, Any], deadline: float, *args) -> Any:
+        attempt = 0
+        while True:
+            try:
+                return await send(payload, deadline, *args)
+            except LLMError as e:
+                delay = self._backoff(e, attempt, deadline)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def chat(self,
+                   messages: List[Dict[str, str]],
+                   model: Optional[str] = None,
+                   temperature: Optional[float] = None,
+                   timeout: Optional[float] = None,
+                   hedge_after: Optional[float] = None,
+                   **params) -> str:
+        """
+        Run a chat completion and return the assistant message content.
+
+        Args:
+            messages: Chat messages
+            model: Model name (defaults to ``self.model``)
+            temperature: Sampling temperature (API default if None)
+            timeout: Deadline for the whole call in seconds, retries included
+            hedge_after: Override ``self.hedge_after`` for this call (0 disables)
+            **params: Extra request fields, e.g. ``max_tokens``
+
+        Returns:
+            The content of the first choice
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open; no request was sent
+            LLMDeadlineExceeded: If no attempt succeeded before the deadline
+            LLMError: If the API rejected the request or every retry failed
+        """
+        payload = self._payload(messages, model, temperature, params)
+        deadline = asyncio.get_running_loop().time() + (timeout or self.timeout)
+        hedge_after = self.hedge_after if hedge_after is None else hedge_after
+        self.requests += 1
+        if hedge_after:
+            return await self._guarded(self._with_retries, self._hedged, payload, deadline, hedge_after)
+        return await self._guarded(self._with_retries, self._attempt, payload, deadline)
+
+    async def stream_chat(self,
+                          messages: List[Dict[str, str]],
+                          model: Optional[str] = None,
+                          temperature: Optional[float] = None,
+                          timeout: Optional[float] = None,
+                          **params) -> AsyncIterator[str]:
+        """
+        Stream a chat completion, yielding content deltas as they arrive.
+
+        Failures before the response starts are retried like ``chat``;
+        once tokens have been yielded an error is raised to the caller, and
+        streams are never hedged. The circuit breaker judges the time to the
+        start of the response.
+        """
+        payload = self._payload(messages, model, temperature, {**params, "stream": True})
+        deadline = asyncio.get_running_loop().time() + (timeout or self.timeout)
+        self.requests += 1
+        response = await self._guarded(self._with_retries, self._open, payload, deadline)
+
+        try:
+            async for line in response.content:
+                line = line.strip()
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[len(b"data:"):].strip()
+                if data == b"[DONE]":
+                    return
+                chunk = json.loads(data)
+                choices = chunk.get("choices") or [{}]
+                token = (choices[0].get("delta") or {}).get("content")
+                if token:
+                    yield token
+        except asyncio.TimeoutError:
+            self.deadlines_exceeded += 1
+            raise LLMDeadlineExceeded("LLM call deadline exceeded while streaming")
+        except aiohttp.ClientError as e:
+            self.failures += 1
+            raise LLMError(f"LLM stream interrupted: {e}")
+        except ValueError as e:
+            self.failures += 1
+            raise LLMError(f"Malformed LLM stream chunk: {e}")
+        finally:
+            response.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'attempts': self.attempts,
+            'retries': self.retries,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'failures': self.failures,
+            'deadlines_exceeded': self.deadlines_exceeded,
+            'sessions': len(self._sessions),
+            'breaker': self.breaker.stats()
+        }
+
+
+_default_client: Optional[LLMClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client(api_key: Optional[str] = None) -> LLMClient:
+    """
+    Process-wide client configured from the environment, shared by every LLM caller.
+
+    Args:
+        api_key: Key for the shared client if it isn't created yet (defaults
+            to ``OPENAI_API_KEY``). A caller whose key differs from the shared
+            client's gets a client of its own, since the key is per session.
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = LLMClient(api_key=api_key)
+        elif api_key and api_key != (_default_client.api_key or os.getenv("OPENAI_API_KEY")):
+            logger.warning("API key differs from the shared LLM client's; using a separate client")
+            return LLMClient(api_key=api_key)
+        return _default_client
@@ -0,0 +1,207 @@
+import os
+import queue
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorBusy(Exception):
+    """Raised when the executor's queue is full and a call is rejected"""
+
+
+class AsyncLLMExecutor:
+    """
+    Runs LLM coroutines on one background event loop for synchronous callers
+    such as Flask request handlers.
+
+    All in-flight LLM calls share a single loop thread instead of each
+    occupying a worker for the length of the call. At most
+    ``max_concurrency`` calls run at once, up to ``max_queue`` more wait
+    their turn, and anything beyond that is rejected with ExecutorBusy so
+    overload surfaces as a fast error instead of an ever-growing backlog.
+    """
+
+    def __init__(self,
+                 max_concurrency: int = 100,
+                 max_queue: int = 500,
+                 timeout: float = 60.0):
+        """
+        Args:
+            max_concurrency: LLM calls allowed to run at the same time
+            max_queue: Calls allowed to wait for a free slot before rejecting
+            timeout: Default seconds a caller waits before the call is cancelled
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run_loop():
+                asyncio.set_event_loop(self._loop)
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                ready.set()
+                self._loop.run_forever()
+
+            self._thread = threading.Thread(target=run_loop, name="llm-executor", daemon=True)
+            self._thread.start()
+            ready.wait()
+            logger.info(
+                f"LLM executor started (max_concurrency={self.max_concurrency}, max_queue={self.max_queue})"
+            )
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._thread = None
+            self._loop = None
+
+    def _reserve(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_concurrency + self.max_queue:
+                self.rejected += 1
+                raise ExecutorBusy("Too many LLM requests in flight; try again shortly")
+            self._pending += 1
+
+    def _release(self, future: concurrent.futures.Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+
+    async def _bounded(self, coro: Awaitable[Any]) -> Any:
+        async with self._semaphore:
+            self.running += 1
+            try:
+                return await coro
+            finally:
+                self.running -= 1
+
+    def submit(self, coro_fn: Callable[..., Awaitable[Any]], *args) -> concurrent.futures.Future:
+        """
+        Schedule ``coro_fn(*args)`` on the executor loop.
+
+        Raises:
+            ExecutorBusy: If the queue is full
+        """
+        if self._thread is None:
+            self.start()
+        self._reserve()
+        future = asyncio.run_coroutine_threadsafe(self._bounded(coro_fn(*args)), self._loop)
+        # Released on completion or cancellation, even if the task never started
+        future.add_done_callback(self._release)
+        return future
+
+    def run(self, coro_fn: Callable[..., Awaitable[Any]], *args, timeout: Optional[float] = None) -> Any:
+        """
+        Run ``coro_fn(*args)`` on the executor loop and wait for its result.
+
+        Raises:
+            ExecutorBusy: If the queue is full
+            concurrent.futures.TimeoutError: If the call did not finish in time (it is cancelled)
+        """
+        future = self.submit(coro_fn, *args)
+        try:
+            return future.result(timeout if timeout is not None else self.timeout)
+        except concurrent.futures.TimeoutError:
+            self.timed_out += 1
+            future.cancel()
+            raise
+
+    def iterate(self,
+                agen_fn: Callable[..., AsyncIterator[Any]],
+                *args,
+                timeout: Optional[float] = None) -> Iterator[Any]:
+        """
+        Drive an async generator on the executor loop and yield its items to a
+        synchronous caller (e.g. a streaming response), waiting at most
+        ``timeout`` seconds for each item.
+
+        Raises:
+            ExecutorBusy: Immediately, if the queue is full
+        """
+        items: "queue.Queue" = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for item in agen_fn(*args):
+                    items.put((False, item))
+            except Exception as e:
+                items.put((True, e))
+            finally:
+                items.put((False, done))
+
+        future = self.submit(pump)
+        return self._drain(items, done, future, timeout if timeout is not None else self.timeout)
+
+    def _drain(self, items: "queue.Queue", done: object, future: concurrent.futures.Future, timeout: float) -> Iterator[Any]:
+        try:
+            while True:
+                try:
+                    is_error, item = items.get(timeout=timeout)
+                except queue.Empty:
+                    self.timed_out += 1
+                    raise concurrent.futures.TimeoutError()
+                if is_error:
+                    raise item
+                if item is done:
+                    return
+                yield item
+        finally:
+            # Stops the generator if the client went away or we timed out
+            future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = self._pending
+        return {
+            'running': self.running,
+            'queued': max(0, pending - self.running),
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'max_concurrency': self.max_concurrency,
+            'max_queue': self.max_queue
+        }
+
+
+_default_executor: Optional[AsyncLLMExecutor] = None
+_default_executor_lock = threading.Lock()
+
+
+def get_default_executor() -> AsyncLLMExecutor:
+    """
+    Process-wide executor shared by every synchronous LLM caller, configured
+    with ``CHAT_LLM_CONCURRENCY`` (100), ``CHAT_LLM_QUEUE`` (500) and
+    ``CHAT_LLM_TIMEOUT`` (60)
+    """
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = AsyncLLMExecutor(
+                max_concurrency=int(os.getenv("CHAT_LLM_CONCURRENCY", "100")),
+                max_queue=int(os.getenv("CHAT_LLM_QUEUE", "500")),
+                timeout=float(os.getenv("CHAT_LLM_TIMEOUT", "60"))
+            )
+        return _default_executor
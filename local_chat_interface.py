@@ -1,11 +1,15 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, g
 from database import SessionLocal, engine
 from chat_models import ChatMessage, Base
 from ai_agent import AIAgent
 from enhanced_data_manager import EnhancedDataManager
+from llm_executor import ExecutorBusy, get_default_executor
 from datetime import datetime
+from concurrent.futures import TimeoutError as LLMTimeout
 from dotenv import load_dotenv
 import os
+import json
+import time
 import logging
 
 # Load environment variables
@@ -25,21 +29,43 @@ app = Flask(__name__)
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+# create_all() skips indexes on tables that already exist
+for index in ChatMessage.__table__.indexes:
+    index.create(bind=engine, checkfirst=True)
+
+HISTORY_PAGE_SIZE = int(os.getenv("CHAT_HISTORY_PAGE_SIZE", "50"))
+HISTORY_MAX_PAGE_SIZE = 200
 
 # Initialize components
 ai_agent = AIAgent(openai_api_key=OPENAI_API_KEY)
 data_manager = EnhancedDataManager()
 
+# LLM calls run on a shared background event loop so a request thread never
+# does blocking network I/O itself; excess load is queued, then rejected.
+# The agent's own synchronous wrappers use the same executor
+llm_executor = get_default_executor()
+llm_executor.start()
+
 def get_db():
     """
-    Get a database session
+    Get the database session for the current request.
+
+    One session is opened lazily per request and closed by close_db() when
+    the request ends, whether the view returned, raised or streamed.
+    """
+    if 'db' not in g:
+        # Objects never outlive the request, so there is nothing to gain from
+        # expiring them on commit and reloading them on the next access
+        g.db = SessionLocal(expire_on_commit=False)
+    return g.db
+
+@app.teardown_appcontext
+def close_db(exception=None):
     """
-    db = SessionLocal()
-    try:
-        yield db
-    except Exception as e:
-        logger.error(f"Error in database session: {e}")
-    finally:
+    Close the request's database session, rolling back anything uncommitted
+    """
+    db = g.pop('db', None)
+    if db is not None:
         db.close()
 
 @app.route('/')
@@ -48,20 +74,41 @@ def chat_interface():
     Render the main chat interface
     """
     try:
-        db = next(get_db())
-        messages = db.query(ChatMessage).order_by(ChatMessage.timestamp.desc()).limit(50).all()
+        messages, _ = ChatMessage.page(get_db(), limit=HISTORY_PAGE_SIZE)
         return render_template('chat.html', messages=messages)
     except Exception as e:
         logger.error(f"Error rendering chat interface: {e}")
         return "An error occurred while loading the chat interface.", 500
 
+@app.route('/api/messages', methods=['GET'])
+def list_messages():
+    """
+    Page through chat history, newest first.
+
+    Pass the ``next_cursor`` from one response as ``before`` to get the
+    next older page; ``limit`` defaults to CHAT_HISTORY_PAGE_SIZE.
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    try:
+        messages, next_cursor = ChatMessage.page(get_db(), before=request.args.get('before'), limit=limit)
+        return jsonify({'messages': messages, 'next_cursor': next_cursor})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in /api/messages: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/send_message', methods=['POST'])
 def send_message():
     """
     Handle incoming messages from the user
     """
     try:
-        db = next(get_db())
+        db = get_db()
         content = request.json.get('message')
         if not content:
             logger.error("No message content provided.")
@@ -70,28 +117,93 @@ def send_message():
         # Log the incoming message
         logger.info(f"Received message: {content}")
 
-        # Create user message
+        # Create user message; it is written together with the reply below
         user_message = ChatMessage.create_user_message(content)
-        db.add(user_message)
-        db.commit()
 
         # Process with AI agent
-        ai_response = ai_agent.process_message(content)
+        try:
+            ai_response = llm_executor.run(ai_agent.aprocess_message, content)
+        except Exception:
+            # Keep the user's message even though the turn failed
+            db.add(user_message)
+            db.commit()
+            raise
         logger.info(f"AI Response: {ai_response}")
 
-        # Create AI response message
-        ai_message = ChatMessage.create_system_message(ai_response)
-        db.add(ai_message)
-        db.commit()
-
+        user_dict, ai_dict = ChatMessage.record_turn(db, user_message, ai_response)
         return jsonify({
-            'user_message': user_message.to_dict(),
-            'ai_response': ai_message.to_dict()
+            'user_message': user_dict,
+            'ai_response': ai_dict
         })
 
+    except ExecutorBusy as e:
+        logger.warning(f"Rejected /api/send_message: {e}")
+        return jsonify({'error': str(e)}), 503
+    except LLMTimeout:
+        logger.error("Timed out waiting for the AI response")
+        return jsonify({'error': 'Timed out waiting for the AI response'}), 504
     except Exception as e:
         logger.error(f"Error in /api/send_message: {e}")
         return jsonify({'error': str(e)}), 500
 
+def _sse(event, data):
+    """
+    Format one Server-Sent Events message
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/send_message/stream', methods=['POST'])
+def send_message_stream():
+    """
+    Handle a user message and stream the AI response as Server-Sent Events.
+
+    Emits a ``user_message`` event as soon as the message is stored, one
+    ``token`` event per model token, and a ``done`` event carrying the
+    persisted AI message once the stream completes. If the reply is cut
+    off, an ``error`` event with ``partial: true`` tells the client to
+    discard the tokens it got; the reply is not stored and the user
+    message stays pending.
+    """
+    content = (request.json or {}).get('message')
+    if not content:
+        logger.error("No message content provided.")
+        return jsonify({'error': 'Message content is required'}), 400
+
+    logger.info(f"Received message: {content}")
+
+    def generate():
+        db = get_db()
+        started = time.perf_counter()
+        tokens = []
+        try:
+            user_message = ChatMessage.create_user_message(content)
+            db.add(user_message)
+            db.commit()
+            yield _sse('user_message', user_message.to_dict())
+
+            for token in llm_executor.iterate(ai_agent.astream_message, content):
+                if not tokens:
+                    logger.info(f"Time to first token: {time.perf_counter() - started:.3f}s")
+                tokens.append(token)
+                yield _sse('token', {'token': token})
+
+            # Only reached when the stream ended normally. The user row is
+            # already stored as pending; mark it responded and add the reply
+            # in one transaction
+            _, ai_dict = ChatMessage.record_turn(db, user_message, "".join(tokens))
+            yield _sse('done', {'ai_response': ai_dict})
+        except LLMTimeout:
+            logger.error("Timed out waiting for the AI response")
+            yield _sse('error', {'error': 'Timed out waiting for the AI response', 'partial': bool(tokens)})
+        except Exception as e:
+            logger.error(f"Error in /api/send_message/stream: {e}")
+            yield _sse('error', {'error': str(e), 'partial': bool(tokens)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
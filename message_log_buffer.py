@@ -0,0 +1,203 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+import psycopg2
+from psycopg2.extras import execute_batch, execute_values
+
+from db_pool import AsyncConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+class MessageLogBufferClosed(RuntimeError):
+    """Set on the future of a write queued after the buffer was closed"""
+
+
+class MessageLogBuffer:
+    """
+    Write-behind buffer for ``message_logs``.
+
+    Inserts and response updates are collected in memory and written in one
+    transaction per flush: inserts as a single multi-row ``INSERT ... RETURNING
+    id`` and updates as one batched round-trip. A flush happens when
+    ``max_batch_size`` operations are pending or ``flush_interval`` seconds
+    after the first pending one, whichever comes first. Every queued operation
+    gets a future that resolves to the same ``(id,)`` row the unbuffered
+    query returns, so callers that need the id can still await it. Writes
+    queued after ``close()`` are rejected: their future fails with
+    MessageLogBufferClosed instead of the call raising. If a batch is
+    rejected because of its data (a bad value or a foreign key violation),
+    it is split in half and retried until the offending rows are isolated,
+    so only their futures fail.
+    """
+
+    INSERT_QUERY = """
+        INSERT INTO message_logs (employee_id, message_type, message_content, sent_at, attempt_number)
+        VALUES %s
+        RETURNING id;
+    """
+
+    UPDATE_QUERY = """
+        UPDATE message_logs
+        SET response = %s, response_time = %s
+        WHERE id = %s;
+    """
+
+    def __init__(self,
+                 pool: AsyncConnectionPool,
+                 max_batch_size: int = 500,
+                 flush_interval: float = 0.5):
+        self.pool = pool
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self._inserts: List[Tuple[tuple, asyncio.Future]] = []
+        self._updates: List[Tuple[tuple, Any, asyncio.Future]] = []
+        self._flush_lock = asyncio.Lock()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._pending_flushes = set()
+        self._flush_requested = False
+        self._closed = False
+        self.rows_written = 0
+        self.flushes = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._inserts) + len(self._updates)
+
+    def add_log(self, employee_id, message_type, content, attempt_number=1) -> asyncio.Future:
+        """Queue a message_logs insert; the future resolves to ``(id,)``"""
+        row = (employee_id, message_type, content, datetime.utcnow(), attempt_number)
+        future = self._new_future()
+        if not future.done():
+            self._inserts.append((row, future))
+            self._schedule_flush()
+        return future
+
+    def add_response(self, message_id, response) -> asyncio.Future:
+        """Queue a response update; the future resolves to ``(message_id,)``"""
+        params = (response, datetime.utcnow(), message_id)
+        future = self._new_future()
+        if not future.done():
+            self._updates.append((params, message_id, future))
+            self._schedule_flush()
+        return future
+
+    def _new_future(self) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        if self._closed:
+            future.set_exception(MessageLogBufferClosed("Message log buffer is closed; write not queued"))
+        return future
+
+    def _schedule_flush(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self.pending >= self.max_batch_size:
+            if self._flush_requested:
+                return
+            self._cancel_timer()
+            self._spawn_flush(loop)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.flush_interval, self._spawn_flush, loop)
+
+    def _spawn_flush(self, loop) -> None:
+        self._timer = None
+        self._flush_requested = True
+        task = loop.create_task(self.flush())
+        # Held until done so the task can't be garbage-collected mid-flush
+        self._pending_flushes.add(task)
+        task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task: asyncio.Task) -> None:
+        self._pending_flushes.discard(task)
+        # flush() handles write errors itself; anything else would otherwise go unreported
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Message log flush task failed: {task.exception()!r}")
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    @classmethod
+    def _write_batch(cls, conn, insert_rows, update_params):
+        try:
+            with conn.cursor() as cursor:
+                ids = []
+                if insert_rows:
+                    ids = execute_values(
+                        cursor, cls.INSERT_QUERY, insert_rows,
+                        page_size=len(insert_rows), fetch=True
+                    )
+                if update_params:
+                    execute_batch(cursor, cls.UPDATE_QUERY, update_params, page_size=len(update_params))
+            conn.commit()
+            return ids
+        except Exception:
+            conn.rollback()
+            raise
+
+    async def flush(self) -> int:
+        """Write everything queued so far; returns the number of operations written"""
+        async with self._flush_lock:
+            self._cancel_timer()
+            self._flush_requested = False
+            inserts, self._inserts = self._inserts, []
+            updates, self._updates = self._updates, []
+            if not inserts and not updates:
+                return 0
+
+            written = await self._write(inserts, updates)
+            if written:
+                self.rows_written += written
+                self.flushes += 1
+            return written
+
+    async def _write(self, inserts, updates) -> int:
+        """Write one batch, bisecting it on data errors; returns the number of operations written"""
+        try:
+            ids = await self.pool.run(
+                self._write_batch,
+                [row for row, _ in inserts],
+                [params for params, _, _ in updates]
+            )
+        except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+            operations = [(True, op) for op in inserts] + [(False, op) for op in updates]
+            if len(operations) == 1:
+                logger.error(f"Error writing message log row, dropping it: {e}")
+                future = operations[0][1][-1]
+                if not future.done():
+                    future.set_exception(e)
+                return 0
+            # One bad row rolls back the whole batch; retry each half without it
+            middle = len(operations) // 2
+            written = 0
+            for half in (operations[:middle], operations[middle:]):
+                written += await self._write(
+                    [op for is_insert, op in half if is_insert],
+                    [op for is_insert, op in half if not is_insert]
+                )
+            return written
+        except Exception as e:
+            # Connection-level failures would fail every retry too
+            logger.error(f"Error flushing {len(inserts) + len(updates)} message log writes: {e}")
+            for *_, future in inserts + updates:
+                if not future.done():
+                    future.set_exception(e)
+            return 0
+
+        for (_, future), row_id in zip(inserts, ids):
+            if not future.done():
+                future.set_result(row_id)
+        for _, message_id, future in updates:
+            if not future.done():
+                future.set_result((message_id,))
+        return len(inserts) + len(updates)
+
+    async def close(self) -> None:
+        """Stop accepting writes and flush whatever is still buffered"""
+        self._closed = True
+        self._cancel_timer()
+        if self._pending_flushes:
+            await asyncio.gather(*self._pending_flushes, return_exceptions=True)
+        await self.flush()
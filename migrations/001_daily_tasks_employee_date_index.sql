@@ -0,0 +1,8 @@
+-- Index for EnhancedDataManager.stream_performance_history and the
+-- performance history getters built on it:
+--   WHERE employee_id = ANY(...) AND task_date BETWEEN ... ORDER BY employee_id, task_date
+-- CONCURRENTLY avoids blocking writes to daily_tasks while it builds; it
+-- can't run inside a transaction, so apply this file on its own, e.g.
+--   psql "$DATABASE_URL" -f migrations/001_daily_tasks_employee_date_index.sql
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_daily_tasks_employee_date
+    ON daily_tasks (employee_id, task_date);
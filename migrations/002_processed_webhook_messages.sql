@@ -0,0 +1,13 @@
+-- Provider message ids already handled, for IdempotencyStore via
+-- EnhancedDataManager.claim_webhook_message / release_webhook_message.
+-- Rows older than the retention window are deleted by
+-- EnhancedDataManager.prune_webhook_messages; the processed_at index keeps
+-- that delete from scanning the whole table. Apply with e.g.
+--   psql "$DATABASE_URL" -f migrations/002_processed_webhook_messages.sql
+CREATE TABLE IF NOT EXISTS processed_webhook_messages (
+    message_id TEXT PRIMARY KEY,
+    processed_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_processed_webhook_messages_processed_at
+    ON processed_webhook_messages (processed_at);
@@ -1,19 +1,51 @@
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timezone, timedelta
+import asyncio
 import logging
 from enhanced_data_manager import EnhancedDataManager
-import openai
+from llm_cache import LLMCache, get_default_cache
+from llm_client import LLMClient, get_default_client
+from performance_rollup import PERIOD_DAYS, PerformanceRollup, get_default_rollup
+from prompt_compaction import count_tokens
+from single_flight import SingleFlight
 from dotenv import load_dotenv
+import json
 import os
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SCORE_FIELDS = ('completeness', 'clarity', 'professional_tone', 'problem_solving')
+
+# Rough allowance for the JSON score object the model returns per entry
+SCORE_OUTPUT_TOKENS = 80
+
 class PerformanceAnalyzer:
-    def __init__(self):
+    def __init__(self,
+                 cache: Optional[LLMCache] = None,
+                 data_manager: Optional[EnhancedDataManager] = None,
+                 max_concurrency: Optional[int] = None,
+                 batch_scoring: Optional[bool] = None,
+                 batch_size: Optional[int] = None,
+                 batch_token_budget: Optional[int] = None,
+                 rollup: Optional[PerformanceRollup] = None,
+                 llm_client: Optional[LLMClient] = None):
         load_dotenv()
-        self.data_manager = EnhancedDataManager()
-        openai.api_key = os.getenv("OPENAI_API_KEY")
+        self.data_manager = data_manager or EnhancedDataManager()
+        self.llm = llm_client or get_default_client()
+        self.cache = cache or get_default_cache()
+        # Cap on history entries analysed in parallel by generate_insights
+        self.max_concurrency = max_concurrency or int(os.getenv("ANALYZER_CONCURRENCY", "8"))
+        # Score many history entries per LLM call instead of one call per entry
+        if batch_scoring is None:
+            batch_scoring = os.getenv("ANALYZER_BATCH_SCORING", "1").lower() in ("1", "true", "yes")
+        self.batch_scoring = batch_scoring
+        self.batch_size = batch_size or int(os.getenv("ANALYZER_BATCH_SIZE", "20"))
+        self.batch_token_budget = batch_token_budget or int(os.getenv("ANALYZER_BATCH_TOKENS", "3000"))
+        # Running completion/trend/task aggregates, kept current by data manager writes
+        self.rollup = rollup or get_default_rollup()
+        # A broadcast and a webhook reply asking for the same employee share one computation
+        self.single_flight = SingleFlight("generate_insights")
         
     async def analyze_task_completion(self, 
                                     employee_id: str,
@@ -63,12 +95,14 @@ class PerformanceAnalyzer:
             Return evaluation as JSON with scores and specific feedback for improvement.
             """
             
-            response = await openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            evaluation = response.choices[0].message.content
+            messages = [{"role": "user", "content": prompt}]
+            cache_key = self.cache.make_key("gpt-3.5-turbo", messages)
+            evaluation = await self.cache.aget(cache_key)
+            if evaluation is not None:
+                return evaluation
+
+            evaluation = await self.llm.chat(messages, model="gpt-3.5-turbo")
+            await self.cache.aset(cache_key, evaluation)
             return evaluation
         except Exception as e:
             logger.error(f"Error in evaluate_response_quality: {e}")
@@ -77,60 +111,250 @@ class PerformanceAnalyzer:
                 'details': str(e)
             }
             
-    async def generate_insights(self,
-                              employee_id: str,
-                              time_period: str = "1w") -> Dict[str, Any]:
-        """Generate actionable insights based on performance data"""
+    def _batch_scoring_prompt(self, items: List[Dict[str, Any]]) -> str:
+        entries = "\n\n".join(
+            f"[{item['id']}] Task Context: {item['context']}\nResponse: {item['text']}"
+            for item in items
+        )
+        return f"""
+Analyze each numbered task response below for quality and completeness.
+
+Evaluate every response based on:
+1. Completeness (1-10)
+2. Clarity (1-10)
+3. Professional tone (1-10)
+4. Problem-solving approach (1-10)
+
+Return ONLY a JSON array with exactly one object per response:
+[{{"id": <response number>, "completeness": <1-10>, "clarity": <1-10>, "professional_tone": <1-10>, "problem_solving": <1-10>, "average_score": <number>, "feedback": "<specific feedback for improvement>"}}]
+
+Responses:
+{entries}
+        """.strip()
+
+    def _split_batches(self, items: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Pack items into batches that stay under batch_size and the token budget"""
+        overhead = count_tokens(self._batch_scoring_prompt([]))
+        batches, current, current_tokens = [], [], overhead
+        for item in items:
+            cost = item['tokens'] + SCORE_OUTPUT_TOKENS
+            if current and (len(current) >= self.batch_size or current_tokens + cost > self.batch_token_budget):
+                batches.append(current)
+                current, current_tokens = [], overhead
+            current.append(item)
+            current_tokens += cost
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def _parse_batch_scores(content: str, expected_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Extract valid per-entry scores from a batch answer, keyed by entry id"""
+        expected = set(expected_ids)
+        start, end = content.find('['), content.rfind(']')
+        if start == -1 or end <= start:
+            return {}
         try:
-            # Calculate date range
-            end_date = datetime.now(timezone.utc)
-            if time_period == "1w":
-                start_date = end_date - timedelta(days=7)
-            elif time_period == "1m":
-                start_date = end_date - timedelta(days=30)
-            
-            # Get historical data
+            parsed = json.loads(content[start:end + 1])
+        except json.JSONDecodeError:
+            return {}
+
+        scores = {}
+        for score in parsed if isinstance(parsed, list) else []:
+            if not isinstance(score, dict):
+                continue
+            try:
+                entry_id = int(score.get('id'))
+                values = [float(score[field]) for field in SCORE_FIELDS]
+            except (TypeError, ValueError, KeyError):
+                continue
+            if entry_id not in expected:
+                continue
+            score = dict(score)
+            score['average_score'] = float(score.get('average_score') or sum(values) / len(values))
+            scores[entry_id] = score
+        return scores
+
+    async def _score_batch(self, items: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        messages = [{"role": "user", "content": self._batch_scoring_prompt(items)}]
+        content = await self.llm.chat(messages, model="gpt-3.5-turbo", temperature=0)
+        return self._parse_batch_scores(content, [item['id'] for item in items])
+
+    async def evaluate_response_quality_batch(self,
+                                              entries: List[Dict[str, Any]],
+                                              max_attempts: int = 2) -> Dict[str, Any]:
+        """
+        Score many task responses with as few LLM calls as possible.
+
+        Entries are packed into prompts of up to ``batch_size`` responses that
+        stay under ``batch_token_budget`` tokens; the model answers with a JSON
+        array of per-entry scores. Entries missing from or unparseable in an
+        answer, or in a batch whose call failed, are retried one entry per
+        call, so a single bad entry can't fail its neighbours again; each
+        entry gets up to ``max_attempts`` tries in total.
+
+        Args:
+            entries: Dicts with ``response_text`` and ``task_context``
+
+        Returns:
+            Dict with ``scores`` (one score dict or None per entry, in input
+            order) and ``failed`` (indices of entries that could not be scored)
+        """
+        scores: List[Optional[Dict[str, Any]]] = [None] * len(entries)
+        pending = []
+        for index, entry in enumerate(entries):
+            messages = [{"role": "user", "content": f"{entry['task_context']}\n{entry['response_text']}"}]
+            cache_key = self.cache.make_key("gpt-3.5-turbo:batch-score", messages, 0)
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                scores[index] = json.loads(cached)
+                continue
+            text = entry['response_text'] or ''
+            context = entry['task_context']
+            pending.append({
+                'id': index + 1,
+                'index': index,
+                'text': text,
+                'context': context,
+                'cache_key': cache_key,
+                'tokens': count_tokens(f"{context}{text}")
+            })
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def score(batch):
+            async with semaphore:
+                return await self._score_batch(batch)
+
+        for attempt in range(max_attempts):
+            if not pending:
+                break
+            # After the first pass, score leftovers individually
+            batches = self._split_batches(pending) if attempt == 0 else [[item] for item in pending]
+            results = await asyncio.gather(*(score(batch) for batch in batches), return_exceptions=True)
+
+            retry = []
+            for batch, result in zip(batches, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error scoring batch of {len(batch)} entries: {result}")
+                    result = {}
+                for item in batch:
+                    parsed = result.get(item['id'])
+                    if parsed is None:
+                        retry.append(item)
+                        continue
+                    scores[item['index']] = parsed
+                    await self.cache.aset(item['cache_key'], json.dumps(parsed))
+            if retry:
+                logger.warning(f"Batch scoring attempt {attempt + 1}: {len(retry)} entries failed")
+            pending = retry
+
+        return {
+            'scores': scores,
+            'failed': sorted(item['index'] for item in pending)
+        }
+
+    async def _seed_rollup(self, employee_id: str) -> None:
+        """Load the widest rollup window of history for an employee not seen yet, or whose seed expired"""
+        end_date = datetime.now(timezone.utc)
+        start_date = end_date - timedelta(days=self.rollup.max_days)
+        # Writes that land during the fetch are replayed by seed()
+        with self.rollup.seeding([employee_id]):
             history = await self.data_manager.get_employee_performance_history(
                 employee_id,
                 start_date.date().isoformat(),
                 end_date.date().isoformat()
             )
-            
-            # Analyze trends
-            completion_rates = []
-            response_qualities = []
-            task_patterns = {}
-            
-            for entry in history:
-                try:
-                    metrics = await self.analyze_task_completion(employee_id, entry)
-                    completion_rates.append(metrics['completion_rate'])
+            if history is None:
+                raise RuntimeError(f"Could not load performance history for {employee_id}")
+            self.rollup.seed(employee_id, history)
+
+    async def preload_history(self, employee_ids: List[str]) -> int:
+        """
+        Seed the rollup for many employees with a single history query,
+        e.g. before generating insights for a whole team.
+
+        Returns:
+            Number of employees seeded
+        """
+        pending = [employee_id for employee_id in employee_ids if not self.rollup.is_seeded(employee_id)]
+        if not pending:
+            return 0
+        end_date = datetime.now(timezone.utc)
+        start_date = end_date - timedelta(days=self.rollup.max_days)
+        with self.rollup.seeding(pending):
+            history = await self.data_manager.get_team_performance_history(
+                pending,
+                start_date.date().isoformat(),
+                end_date.date().isoformat()
+            )
+            if history is None:
+                return 0
+            for employee_id, rows in history.items():
+                self.rollup.seed(employee_id, rows)
+        return len(history)
+
+    async def generate_insights(self,
+                              employee_id: str,
+                              time_period: str = "1w") -> Dict[str, Any]:
+        """
+        Generate actionable insights based on performance data.
+        Concurrent calls for the same employee and period share one computation.
+        """
+        return await self.single_flight.run(
+            (str(employee_id), time_period), self._generate_insights, employee_id, time_period
+        )
+
+    async def _generate_insights(self, employee_id: str, time_period: str) -> Dict[str, Any]:
+        try:
+            days = PERIOD_DAYS[time_period]
+
+            # Completion rate, trend and task frequencies come from the rollup;
+            # history is only read when an employee is new or their seed expired
+            if not self.rollup.is_seeded(employee_id):
+                await self._seed_rollup(employee_id)
+            summary = self.rollup.summary(employee_id, days)
+            history = self.rollup.window_rows(employee_id, days)
+
+            # Without batch scoring, entries are scored concurrently (bounded
+            # by max_concurrency); gather keeps results in history order and a
+            # failing entry is returned as an exception instead of cancelling the rest
+            semaphore = asyncio.Semaphore(self.max_concurrency)
 
-                    quality = await self.evaluate_response_quality(
-                        entry.get('tasks_completed', ''),
+            async def score_entry(entry):
+                async with semaphore:
+                    return await self.evaluate_response_quality(
+                        entry.get('tasks_completed') or '',
                         {'date': entry['task_date']}
                     )
-                    response_qualities.append(quality)
-                    
-                    # Track task patterns
-                    for task in entry.get('tasks_completed', '').split('\n'):
-                        task_patterns[task] = task_patterns.get(task, 0) + 1
-                except Exception as e:
-                    logger.error(f"Error processing entry {entry}: {e}")
+
+            if self.batch_scoring:
+                results = await self._score_entries_batched(history)
+            else:
+                results = await asyncio.gather(
+                    *(score_entry(entry) for entry in history),
+                    return_exceptions=True
+                )
+
+            response_qualities = []
+            for entry, result in zip(history, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error processing entry {entry}: {result}")
                     continue
+                response_qualities.append(result)
             
             # Generate insights
             insights = {
                 'performance_trend': {
-                    'completion_rate_trend': sum(completion_rates) / len(completion_rates) if completion_rates else 0,
+                    'completion_rate_trend': summary['completion_rate'],
                     'quality_trend': response_qualities,
-                    'trend_direction': 'improving' if completion_rates and completion_rates[-1] > completion_rates[0] else 'declining'
+                    'trend_direction': summary['trend_direction']
                 },
-                'common_tasks': sorted(task_patterns.items(), key=lambda x: x[1], reverse=True)[:5],
+                'common_tasks': summary['common_tasks'],
                 'recommendations': await self._generate_recommendations(
-                    completion_rates,
+                    summary['completion_rate'],
                     response_qualities,
-                    task_patterns
+                    summary['distinct_tasks']
                 )
             }
             
@@ -150,16 +374,30 @@ class PerformanceAnalyzer:
                 'recommendations': []
             }
             
+    async def _score_entries_batched(self, history: List[Dict[str, Any]]) -> List[Any]:
+        """Per-entry quality results, scored in batches"""
+        batch = await self.evaluate_response_quality_batch([
+            {
+                'response_text': entry.get('tasks_completed') or '',
+                'task_context': {'date': entry.get('task_date')}
+            }
+            for entry in history
+        ])
+        failed = set(batch['failed'])
+        return [
+            {'error': 'Unable to evaluate response quality'} if index in failed else score
+            for index, score in enumerate(batch['scores'])
+        ]
+
     async def _generate_recommendations(self,
-                                      completion_rates: List[float],
+                                      avg_completion: float,
                                       quality_scores: List[Dict],
-                                      task_patterns: Dict[str, int]) -> List[str]:
+                                      distinct_tasks: int) -> List[str]:
         """Generate specific recommendations based on performance data"""
         try:
             recommendations = []
             
             # Analyze completion rate trend
-            avg_completion = sum(completion_rates) / len(completion_rates) if completion_rates else 0
             if avg_completion < 0.8:
                 recommendations.append({
                     'area': 'Task Completion',
@@ -177,7 +415,7 @@ class PerformanceAnalyzer:
                 })
             
             # Analyze task patterns
-            if len(task_patterns) < 3:
+            if distinct_tasks < 3:
                 recommendations.append({
                     'area': 'Task Variety',
                     'observation': 'Limited variety in tasks',
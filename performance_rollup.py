@@ -0,0 +1,314 @@
+import os
+import time
+import heapq
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from enhanced_data_manager import EnhancedDataManager
+
+logger = logging.getLogger(__name__)
+
+# Days covered by each insights period
+PERIOD_DAYS = {"1w": 7, "1m": 30}
+
+
+def split_tasks(text: Optional[str]) -> List[str]:
+    """Non-empty task lines of a tasks_planned / tasks_completed value"""
+    if not text:
+        return []
+    return [task for task in map(str.strip, text.split('\n')) if task]
+
+
+def _as_date(value: Any) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+class _Window:
+    """Running sums over the daily_tasks rows of the last ``days`` days"""
+
+    __slots__ = ('days', 'heap', 'members', 'rate_sum', 'tasks', '_top')
+
+    def __init__(self, days: int):
+        self.days = days
+        self.heap: List[Tuple[date, str]] = []
+        self.members: Dict[str, Tuple[float, Tuple[str, ...]]] = {}
+        self.rate_sum = 0.0
+        self.tasks: Counter = Counter()
+        self._top: Optional[List[Tuple[str, int]]] = None
+
+    def add(self, key: str, rate: float, tasks: Tuple[str, ...]) -> None:
+        self.members[key] = (rate, tasks)
+        self.rate_sum += rate
+        self.tasks.update(tasks)
+        self._top = None
+
+    def remove(self, key: str) -> None:
+        rate, tasks = self.members.pop(key)
+        self.rate_sum -= rate
+        self.tasks.subtract(tasks)
+        for task in tasks:
+            if self.tasks[task] <= 0:
+                del self.tasks[task]
+        self._top = None
+
+    def evict(self, today: date) -> None:
+        cutoff = today - timedelta(days=self.days)
+        while self.heap and self.heap[0][0] < cutoff:
+            _, key = heapq.heappop(self.heap)
+            if key in self.members:
+                self.remove(key)
+
+    def top(self, n: int) -> List[Tuple[str, int]]:
+        # Recomputed only after the window changed; repeated reads are free
+        if self._top is None or len(self._top) < min(n, len(self.tasks)):
+            self._top = self.tasks.most_common(n)
+        return self._top[:n]
+
+
+class _EmployeeRollup:
+    __slots__ = ('rows', 'windows', 'ewma_fast', 'ewma_slow', 'completions', 'seeded', 'seeded_at')
+
+    def __init__(self, window_days: Iterable[int]):
+        # key -> (task_date, completion rate, completed task lines, row)
+        self.rows: Dict[str, Tuple[date, float, Tuple[str, ...], Dict[str, Any]]] = {}
+        self.windows = {days: _Window(days) for days in window_days}
+        self.ewma_fast: Optional[float] = None
+        self.ewma_slow: Optional[float] = None
+        self.completions = 0
+        self.seeded = False
+        self.seeded_at = 0.0
+
+
+class PerformanceRollup:
+    """
+    Per-employee performance aggregates maintained incrementally as
+    daily_tasks rows are created and completed.
+
+    Each window (7 and 30 days by default) keeps a running completion-rate
+    sum and task counts that are adjusted by the row's delta on every write
+    and decremented as rows age out, so reading a summary never rescans
+    history. The trend is a pair of exponentially weighted moving averages
+    of completion rate (fast vs. slow) fed by completions in date order.
+
+    State is in-process: an employee's aggregates are only authoritative
+    once ``seed()`` has loaded their history, after which the
+    EnhancedDataManager write listener keeps them current. The listener
+    can't see writes from other processes or from SupabaseManager, so a
+    seed is only trusted for ``reseed_seconds``; after that ``is_seeded()``
+    is False and the caller reloads the employee's history. Callers fetch
+    that history inside ``seeding()``, so writes that land between the
+    fetch and ``seed()`` are replayed onto the new aggregates, not lost.
+    """
+
+    def __init__(self,
+                 window_days: Iterable[int] = (7, 30),
+                 top_n: int = 5,
+                 fast_alpha: Optional[float] = None,
+                 slow_alpha: Optional[float] = None,
+                 reseed_seconds: Optional[float] = None):
+        self.window_days = tuple(sorted(window_days))
+        self.top_n = top_n
+        self.fast_alpha = fast_alpha or float(os.getenv("ROLLUP_FAST_ALPHA", "0.5"))
+        self.slow_alpha = slow_alpha or float(os.getenv("ROLLUP_SLOW_ALPHA", "0.1"))
+        self.reseed_seconds = reseed_seconds or float(os.getenv("ROLLUP_RESEED_SECONDS", "300"))
+        self._employees: Dict[str, _EmployeeRollup] = {}
+        # Per employee with a history fetch in flight: [open fetches, rows written since the first began]
+        self._seeding: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+        self._unsubscribe = EnhancedDataManager.add_write_listener(self._on_write)
+
+    def close(self) -> None:
+        """Stop listening for writes"""
+        self._unsubscribe()
+
+    @property
+    def max_days(self) -> int:
+        return self.window_days[-1]
+
+    def _on_write(self, table: str, employee_id: Any, row: Optional[Dict[str, Any]] = None) -> None:
+        if table == "daily_tasks" and row is not None:
+            self.apply(employee_id, row)
+
+    @staticmethod
+    def _completion_rate(row: Dict[str, Any]) -> float:
+        planned = set(split_tasks(row.get('tasks_planned')))
+        completed = set(split_tasks(row.get('tasks_completed')))
+        return len(completed) / len(planned) if planned else 0.0
+
+    def _state(self, employee_id: str) -> _EmployeeRollup:
+        state = self._employees.get(employee_id)
+        if state is None:
+            state = self._employees[employee_id] = _EmployeeRollup(self.window_days)
+        return state
+
+    def _advance(self, state: _EmployeeRollup, today: date) -> None:
+        for window in state.windows.values():
+            window.evict(today)
+        # Rows that left the widest window are no longer needed
+        widest = state.windows[self.max_days].members
+        if len(state.rows) > len(widest):
+            for key in [key for key in state.rows if key not in widest]:
+                del state.rows[key]
+
+    def _apply(self, state: _EmployeeRollup, row: Dict[str, Any], today: date) -> None:
+        task_date = _as_date(row['task_date'])
+        key = str(row.get('id') or f"{task_date}:{row.get('tasks_planned')}")
+        rate = self._completion_rate(row)
+        tasks = tuple(split_tasks(row.get('tasks_completed')))
+        previous = state.rows.get(key)
+
+        for window in state.windows.values():
+            if key in window.members:
+                window.remove(key)
+            elif task_date >= today - timedelta(days=window.days):
+                heapq.heappush(window.heap, (task_date, key))
+            else:
+                continue
+            window.add(key, rate, tasks)
+        if task_date >= today - timedelta(days=self.max_days):
+            state.rows[key] = (task_date, rate, tasks, row)
+
+        # Only a new or changed completion moves the trend
+        if tasks and (previous is None or previous[2] != tasks):
+            state.completions += 1
+            if state.ewma_fast is None:
+                state.ewma_fast = state.ewma_slow = rate
+            else:
+                state.ewma_fast += self.fast_alpha * (rate - state.ewma_fast)
+                state.ewma_slow += self.slow_alpha * (rate - state.ewma_slow)
+
+    def apply(self, employee_id: Any, row: Dict[str, Any]) -> None:
+        """
+        Fold one created or updated daily_tasks row into the aggregates.
+        Re-applying a row replaces its previous contribution.
+        """
+        today = datetime.now(timezone.utc).date()
+        with self._lock:
+            seeding = self._seeding.get(str(employee_id))
+            if seeding is not None:
+                # The history being fetched may predate this row; seed() replays it
+                seeding[1].append(row)
+            state = self._state(str(employee_id))
+            self._advance(state, today)
+            try:
+                self._apply(state, row, today)
+            except (KeyError, ValueError) as e:
+                logger.error(f"Skipping malformed daily_tasks row for {employee_id}: {e}")
+
+    @contextmanager
+    def seeding(self, employee_ids: Iterable[Any]) -> Iterator[None]:
+        """
+        Wrap the history fetch for ``seed()``: rows written for these
+        employees while it runs are replayed by ``seed()`` on top of the
+        fetched history, which may not include them.
+        """
+        keys = [str(employee_id) for employee_id in employee_ids]
+        with self._lock:
+            for key in keys:
+                self._seeding.setdefault(key, [0, []])[0] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                for key in keys:
+                    seeding = self._seeding[key]
+                    seeding[0] -= 1
+                    if not seeding[0]:
+                        del self._seeding[key]
+
+    def seed(self, employee_id: Any, history: Iterable[Dict[str, Any]]) -> None:
+        """
+        Replace an employee's aggregates with their history (covering at
+        least ``max_days``) and mark them authoritative for ``reseed_seconds``.
+        Inside ``seeding()``, rows written since it began are applied on top.
+        """
+        today = datetime.now(timezone.utc).date()
+        rows = sorted(history, key=lambda row: (_as_date(row['task_date']), str(row.get('created_at', ''))))
+        # Built from scratch, so rows deleted or changed elsewhere don't linger
+        state = _EmployeeRollup(self.window_days)
+        for row in rows:
+            self._apply(state, row, today)
+        state.seeded = True
+        state.seeded_at = time.monotonic()
+        with self._lock:
+            seeding = self._seeding.get(str(employee_id))
+            # Re-applying a row the history already has just replaces its contribution
+            for row in seeding[1] if seeding is not None else ():
+                try:
+                    self._apply(state, row, today)
+                except (KeyError, ValueError) as e:
+                    logger.error(f"Skipping malformed daily_tasks row for {employee_id}: {e}")
+            self._employees[str(employee_id)] = state
+
+    def is_seeded(self, employee_id: Any) -> bool:
+        """Whether the employee was seeded less than ``reseed_seconds`` ago"""
+        state = self._employees.get(str(employee_id))
+        return (state is not None and state.seeded
+                and time.monotonic() - state.seeded_at < self.reseed_seconds)
+
+    def forget(self, employee_id: Any) -> None:
+        """Drop an employee's state so the next read reseeds it"""
+        with self._lock:
+            self._employees.pop(str(employee_id), None)
+
+    def summary(self, employee_id: Any, days: int) -> Dict[str, Any]:
+        """
+        Aggregates for the last ``days`` days (one of ``window_days``)
+
+        Returns:
+            Dict with ``entries``, ``completion_rate``, ``trend_direction``,
+            ``ewma_completion_rate``, ``distinct_tasks`` and ``common_tasks``
+            (top ``top_n`` (task, count) pairs)
+        """
+        today = datetime.now(timezone.utc).date()
+        with self._lock:
+            state = self._state(str(employee_id))
+            self._advance(state, today)
+            window = state.windows[days]
+            entries = len(window.members)
+            improving = state.ewma_fast is not None and state.ewma_fast > state.ewma_slow
+            return {
+                'entries': entries,
+                'completion_rate': window.rate_sum / entries if entries else 0,
+                'trend_direction': 'improving' if improving else 'declining',
+                'ewma_completion_rate': state.ewma_fast or 0,
+                'distinct_tasks': len(window.tasks),
+                'common_tasks': window.top(self.top_n)
+            }
+
+    def window_rows(self, employee_id: Any, days: int) -> List[Dict[str, Any]]:
+        """The daily_tasks rows currently in the ``days`` window, oldest first"""
+        with self._lock:
+            state = self._state(str(employee_id))
+            members = state.windows[days].members
+            rows = [state.rows[key] for key in members if key in state.rows]
+        return [row for _, _, _, row in sorted(rows, key=lambda item: item[0])]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'employees': len(self._employees),
+            'seeded': sum(1 for state in self._employees.values() if state.seeded),
+            'stale': sum(1 for employee_id in list(self._employees) if not self.is_seeded(employee_id)),
+            'rows': sum(len(state.rows) for state in self._employees.values())
+        }
+
+
+_default_rollup: Optional[PerformanceRollup] = None
+_default_rollup_lock = threading.Lock()
+
+
+def get_default_rollup() -> PerformanceRollup:
+    """Process-wide rollup fed by every EnhancedDataManager in this process"""
+    global _default_rollup
+    with _default_rollup_lock:
+        if _default_rollup is None:
+            _default_rollup = PerformanceRollup()
+        return _default_rollup
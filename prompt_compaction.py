@@ -0,0 +1,201 @@
+import os
+import re
+import logging
+import threading
+from functools import lru_cache
+from string import Formatter
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Word pieces and individual punctuation; close to BPE token counts for English text
+_TOKEN_PATTERN = re.compile(r"\w{1,8}|[^\w\s]")
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    """tiktoken encoding for a model, or None if tiktoken or its data files are unavailable"""
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable for {model} ({e}); using approximate token counts")
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    """
+    Count tokens locally: exact with tiktoken when it is installed (and its
+    encoding files are cached), otherwise a word-piece approximation
+    """
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-3.5-turbo") -> str:
+    """Cut text to at most ``max_tokens`` tokens, ending on a token boundary"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _encoding(model)
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    for index, match in enumerate(_TOKEN_PATTERN.finditer(text)):
+        if index == max_tokens:
+            return text[:match.start()].rstrip()
+    return text
+
+
+def dedupe_lines(text: str) -> str:
+    """Drop blank lines and repeats of a line (ignoring case and surrounding whitespace), keeping the first"""
+    seen = set()
+    lines = []
+    for line in text.split('\n'):
+        key = ' '.join(line.split()).casefold()
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        lines.append(line.rstrip())
+    return '\n'.join(lines)
+
+
+def fit_lines(text: str, max_tokens: int, model: str = "gpt-3.5-turbo") -> str:
+    """
+    Keep whole lines from the start of ``text`` while they fit in
+    ``max_tokens``, and note how many lines were left out
+    """
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    kept, used = [], 0
+    lines = text.split('\n')
+    # Leave room for the "(N more lines omitted)" marker
+    budget = max_tokens - 8
+    for line in lines:
+        cost = count_tokens(line, model) + 1
+        if used + cost > budget:
+            if not kept:
+                # A single oversized line: cut inside it
+                kept.append(truncate_to_tokens(line, budget, model) + ' …')
+            break
+        kept.append(line)
+        used += cost
+    omitted = len(lines) - len(kept)
+    if omitted:
+        kept.append(f"({omitted} more lines omitted)")
+    return '\n'.join(kept)
+
+
+class PromptCompactor:
+    """
+    Fits prompts into a token budget before they are sent to the model.
+
+    A prompt is a template with fixed instructions plus named variable
+    sections. Each section is de-duplicated line by line; if the sections
+    still don't fit in what the instructions leave of the budget, the
+    budget is shared out so small sections stay intact and only the
+    largest ones are cut, line by line. Token counts before and after are
+    recorded per prompt name.
+    """
+
+    def __init__(self, budget: Optional[int] = None, model: str = "gpt-3.5-turbo"):
+        """
+        Args:
+            budget: Default token budget per prompt (``PROMPT_TOKEN_BUDGET``, 1500)
+            model: Model whose tokenizer is used for counting
+        """
+        self.budget = budget or int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))
+        self.model = model
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _allocate(self, sizes: Dict[str, int], available: int) -> Dict[str, int]:
+        """Water-filling: sections under their fair share keep everything, the rest split what remains"""
+        allocation = {}
+        remaining = max(available, 0)
+        pending = sorted(sizes, key=sizes.get)
+        while pending:
+            share = remaining // len(pending)
+            name = pending.pop(0)
+            allocation[name] = min(sizes[name], share)
+            remaining -= allocation[name]
+        return allocation
+
+    def compact(self,
+                name: str,
+                template: str,
+                sections: Dict[str, str],
+                budget: Optional[int] = None,
+                original: Optional[str] = None) -> str:
+        """
+        Render ``template`` with its sections compacted to fit the budget.
+
+        Args:
+            name: Prompt name the savings are recorded under
+            template: ``str.format`` template with one placeholder per section
+            sections: Section text by placeholder name
+            budget: Token budget for the whole prompt (defaults to ``self.budget``)
+            original: The prompt as it would have been sent uncompacted, for the
+                savings metric (defaults to the template filled with the raw sections)
+
+        Returns:
+            The compacted prompt
+        """
+        budget = budget or self.budget
+        # Sections the template doesn't reference must not take a share of the budget
+        used = {field for _, field, _, _ in Formatter().parse(template) if field}
+        sections = {key: value for key, value in sections.items() if key in used}
+        if original is None:
+            original = template.format(**sections)
+        deduped = {key: dedupe_lines(value) for key, value in sections.items()}
+        fixed = count_tokens(template.format(**{key: '' for key in sections}), self.model)
+        sizes = {key: count_tokens(value, self.model) for key, value in deduped.items()}
+
+        truncated = False
+        if fixed + sum(sizes.values()) > budget:
+            allocation = self._allocate(sizes, budget - fixed)
+            for key, limit in allocation.items():
+                if sizes[key] > limit:
+                    deduped[key] = fit_lines(deduped[key], limit, self.model)
+                    truncated = True
+
+        prompt = template.format(**deduped)
+        self._record(name, count_tokens(original, self.model), count_tokens(prompt, self.model), truncated)
+        return prompt
+
+    def compact_text(self, name: str, text: str, budget: Optional[int] = None) -> str:
+        """Compact a single free-text block (e.g. an employee update) on its own"""
+        return self.compact(name, "{text}", {'text': text}, budget=budget)
+
+    def _record(self, name: str, before: int, after: int, truncated: bool) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(name, {
+                'requests': 0, 'tokens_before': 0, 'tokens_after': 0, 'tokens_saved': 0, 'truncated': 0
+            })
+            stats['requests'] += 1
+            stats['tokens_before'] += before
+            stats['tokens_after'] += after
+            stats['tokens_saved'] += max(before - after, 0)
+            stats['truncated'] += int(truncated)
+        logger.info(f"Prompt {name}: {before} -> {after} tokens ({before - after} saved)")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-prompt request count and token totals before/after compaction"""
+        with self._lock:
+            return {name: dict(values) for name, values in self._stats.items()}
+
+
+_default_compactor: Optional[PromptCompactor] = None
+_default_compactor_lock = threading.Lock()
+
+
+def get_default_compactor() -> PromptCompactor:
+    """Process-wide compactor, so savings from every caller land in one set of metrics"""
+    global _default_compactor
+    with _default_compactor_lock:
+        if _default_compactor is None:
+            _default_compactor = PromptCompactor()
+        return _default_compactor
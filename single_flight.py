@@ -0,0 +1,85 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: while a call for a key is in
+    flight, further calls for the same key wait for its result instead of
+    starting their own.
+
+    The work runs in its own task, so a caller that is cancelled (e.g. a
+    client that went away) only stops waiting; the others still get the
+    result. The work itself is cancelled once every caller waiting on it
+    has been. Keys are tracked per event loop, since a task cannot be
+    awaited from another loop.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], _Flight] = {}
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def run(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args) -> Any:
+        """
+        Return ``await fn(*args)``, sharing one execution among concurrent
+        calls with the same ``key``. Exceptions are raised to every caller.
+        """
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        flight = self._flights.get(flight_key)
+        if flight is None:
+            self.executed += 1
+            flight = _Flight(loop.create_task(fn(*args)))
+            self._flights[flight_key] = flight
+            flight.task.add_done_callback(lambda task: self._done(flight_key, task))
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # Nobody else wants the result; later calls start afresh
+                self.abandoned += 1
+                flight.task.cancel()
+                self._forget(flight_key, flight.task)
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, flight_key: Tuple[asyncio.AbstractEventLoop, Hashable], task: asyncio.Task) -> None:
+        flight = self._flights.get(flight_key)
+        if flight is not None and flight.task is task:
+            del self._flights[flight_key]
+
+    def _done(self, flight_key: Tuple[asyncio.AbstractEventLoop, Hashable], task: asyncio.Task) -> None:
+        self._forget(flight_key, task)
+        # Mark the exception retrieved even if every caller was cancelled
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Single-flight {self.name} call failed: {task.exception()}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'executed': self.executed,
+            'coalesced': self.coalesced,
+            'abandoned': self.abandoned,
+            'in_flight': len(self._flights)
+        }
@@ -0,0 +1,186 @@
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
+
+import numpy as np
+
+from performance_rollup import split_tasks
+
+# Share of planned tasks an entry must complete to count as on track
+ON_TRACK_RATIO = 0.8
+
+
+class TaskColumns(NamedTuple):
+    """
+    daily_tasks rows for many employees in columnar form.
+
+    Task lists are interned to integer ids and stored ragged: the tasks of
+    row ``i`` are ``planned[planned_offsets[i]:planned_offsets[i + 1]]``
+    (likewise for ``completed``).
+    """
+    employee_ids: np.ndarray       # (rows,)
+    task_dates: np.ndarray         # (rows,) datetime64[D]
+    planned: np.ndarray            # int64 task ids
+    planned_offsets: np.ndarray    # (rows + 1,)
+    completed: np.ndarray          # int64 task ids
+    completed_offsets: np.ndarray  # (rows + 1,)
+    vocabulary: Tuple[str, ...]    # task id -> task text
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> "TaskColumns":
+        """
+        Build columns from daily_tasks dicts (``employee_id``, ``task_date``,
+        ``tasks_planned``, ``tasks_completed``). This is the only per-row
+        Python work; everything downstream is vectorized.
+        """
+        vocabulary: Dict[str, int] = {}
+        intern = vocabulary.setdefault
+        employee_ids, task_dates = [], []
+        planned, planned_lengths, completed, completed_lengths = [], [], [], []
+        for row in rows:
+            employee_ids.append(row['employee_id'])
+            task_dates.append(str(row['task_date'])[:10])
+            tasks = split_tasks(row.get('tasks_planned'))
+            planned.extend(intern(task, len(vocabulary)) for task in tasks)
+            planned_lengths.append(len(tasks))
+            tasks = split_tasks(row.get('tasks_completed'))
+            completed.extend(intern(task, len(vocabulary)) for task in tasks)
+            completed_lengths.append(len(tasks))
+
+        return cls(
+            employee_ids=np.asarray(employee_ids),
+            task_dates=np.asarray(task_dates, dtype='datetime64[D]'),
+            planned=np.asarray(planned, dtype=np.int64),
+            planned_offsets=_offsets(planned_lengths),
+            completed=np.asarray(completed, dtype=np.int64),
+            completed_offsets=_offsets(completed_lengths),
+            vocabulary=tuple(vocabulary)
+        )
+
+    def __len__(self) -> int:
+        return len(self.employee_ids)
+
+
+class TaskCompletionColumns(NamedTuple):
+    """Per-row metrics, aligned with the input TaskColumns"""
+    planned: np.ndarray
+    completed: np.ndarray
+    completion_rate: np.ndarray
+    on_track: np.ndarray
+    incomplete: np.ndarray
+    additional: np.ndarray
+
+
+class TeamCompletion(NamedTuple):
+    """Per-employee aggregates, one element per employee in ``employee_ids`` order"""
+    employee_ids: np.ndarray
+    entries: np.ndarray
+    completion_rate: np.ndarray
+    on_track_rate: np.ndarray
+    incomplete: np.ndarray
+    additional: np.ndarray
+    trend_slope: np.ndarray  # change in completion rate per day (least squares)
+
+    def to_dict(self) -> Dict[str, List[Any]]:
+        """JSON-friendly columns, e.g. for a dashboard API"""
+        return {field: getattr(self, field).tolist() for field in self._fields}
+
+
+def _offsets(lengths: List[int]) -> np.ndarray:
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def _unique_row_keys(task_ids: np.ndarray, offsets: np.ndarray, vocabulary_size: int) -> np.ndarray:
+    """Sorted unique row * vocabulary_size + task_id keys, i.e. each row's task set"""
+    rows = np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))
+    # Sort and drop repeats by hand; np.unique is several times slower on large int arrays
+    keys = np.sort(rows * vocabulary_size + task_ids)
+    keep = np.ones(len(keys), dtype=bool)
+    np.not_equal(keys[1:], keys[:-1], out=keep[1:])
+    return keys[keep]
+
+
+def task_completion_metrics(columns: TaskColumns) -> TaskCompletionColumns:
+    """
+    Vectorized ``PerformanceAnalyzer.analyze_task_completion`` for every row.
+
+    Planned and completed tasks are treated as sets per row, exactly like
+    the single-row version: duplicates within a row count once.
+    """
+    rows = len(columns)
+    vocabulary_size = max(len(columns.vocabulary), 1)
+    planned_keys = _unique_row_keys(columns.planned, columns.planned_offsets, vocabulary_size)
+    completed_keys = _unique_row_keys(columns.completed, columns.completed_offsets, vocabulary_size)
+
+    planned = np.bincount(planned_keys // vocabulary_size, minlength=rows)
+    completed = np.bincount(completed_keys // vocabulary_size, minlength=rows)
+    matched = np.bincount(
+        completed_keys // vocabulary_size,
+        weights=np.isin(completed_keys, planned_keys, assume_unique=True),
+        minlength=rows
+    ).astype(np.int64)
+
+    completion_rate = np.divide(
+        completed, planned,
+        out=np.zeros(rows, dtype=np.float64),
+        where=planned > 0
+    )
+    return TaskCompletionColumns(
+        planned=planned,
+        completed=completed,
+        completion_rate=completion_rate,
+        on_track=completed >= planned * ON_TRACK_RATIO,
+        incomplete=planned - matched,
+        additional=completed - matched
+    )
+
+
+def analyze_team_completion(columns: TaskColumns) -> TeamCompletion:
+    """
+    Completion analytics for a whole team over a date range.
+
+    Row metrics are computed with array operations and then reduced per
+    employee with ``bincount``; the trend slope is an ordinary least-squares
+    fit of completion rate against day, computed from per-employee sums.
+
+    Args:
+        columns: Every employee's daily_tasks rows for the range
+
+    Returns:
+        TeamCompletion with one entry per employee, sorted by employee id
+    """
+    if len(columns) == 0:
+        empty = np.zeros(0)
+        return TeamCompletion(np.asarray([]), empty.astype(np.int64), empty, empty,
+                              empty.astype(np.int64), empty.astype(np.int64), empty)
+
+    metrics = task_completion_metrics(columns)
+    employee_ids, group = np.unique(columns.employee_ids, return_inverse=True)
+    employees = len(employee_ids)
+
+    def per_employee(values):
+        return np.bincount(group, weights=values, minlength=employees)
+
+    entries = np.bincount(group, minlength=employees)
+    rate = metrics.completion_rate
+    day = (columns.task_dates - columns.task_dates.min()).astype(np.float64)
+
+    sum_x, sum_y = per_employee(day), per_employee(rate)
+    sum_xx, sum_xy = per_employee(day * day), per_employee(day * rate)
+    denominator = entries * sum_xx - sum_x * sum_x
+    trend_slope = np.divide(
+        entries * sum_xy - sum_x * sum_y, denominator,
+        out=np.zeros(employees, dtype=np.float64),
+        # One entry, or every entry on the same day: no trend
+        where=denominator > 0
+    )
+
+    return TeamCompletion(
+        employee_ids=employee_ids,
+        entries=entries,
+        completion_rate=sum_y / entries,
+        on_track_rate=per_employee(metrics.on_track) / entries,
+        incomplete=per_employee(metrics.incomplete).astype(np.int64),
+        additional=per_employee(metrics.additional).astype(np.int64),
+        trend_slope=trend_slope
+    )
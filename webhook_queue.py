@@ -0,0 +1,137 @@
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookQueue:
+    """
+    Bounded in-process queue that lets the webhook endpoint acknowledge
+    deliveries immediately while a pool of workers does the real processing.
+
+    Tracks queue depth, worker utilization and processing lag (time from
+    enqueue until a worker picks the payload up) so back-pressure is visible.
+    """
+
+    def __init__(self,
+                 handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 maxsize: int = 1000,
+                 workers: int = 8):
+        """
+        :param handler: Coroutine function that processes one webhook payload.
+        :param maxsize: Maximum number of queued payloads before submit() rejects.
+        :param workers: Number of concurrent worker tasks.
+        """
+        self.handler = handler
+        self.maxsize = maxsize
+        self.worker_count = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._accepting = False
+        self._started_at = 0.0
+        self._busy = 0
+        self._busy_time = 0.0
+        self.accepted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._total_lag = 0.0
+        self._picked = 0
+
+    async def start(self) -> None:
+        """Start the worker pool."""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._started_at = time.monotonic()
+        self._accepting = True
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"webhook-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+        logger.info(f"Webhook queue started with {self.worker_count} workers (maxsize={self.maxsize})")
+
+    def submit(self, payload: Dict[str, Any]) -> bool:
+        """
+        Enqueue a payload without waiting.
+
+        :return: False if the queue is full or shutting down, True otherwise.
+        """
+        if not self._accepting:
+            self.rejected += 1
+            return False
+        try:
+            self._queue.put_nowait((time.monotonic(), payload))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning("Webhook queue full, rejecting delivery")
+            return False
+        self.accepted += 1
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            enqueued_at, payload = await self._queue.get()
+            started = time.monotonic()
+            lag = started - enqueued_at
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self._total_lag += lag
+            self._picked += 1
+            self._busy += 1
+            try:
+                result = await self.handler(payload)
+                if isinstance(result, dict) and result.get("status") == "error":
+                    self.failed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error processing queued webhook: {str(e)}")
+            finally:
+                self._busy -= 1
+                self._busy_time += time.monotonic() - started
+                self.processed += 1
+                self._queue.task_done()
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """
+        Stop accepting payloads, let the workers drain the queue and shut them down.
+
+        :param timeout: Seconds to wait for the queue to drain before cancelling.
+        """
+        if not self._workers:
+            return
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Webhook queue did not drain within {timeout}s; {self._queue.qsize()} payloads dropped")
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info("Webhook queue stopped")
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, worker utilization and processing lag."""
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        capacity = elapsed * self.worker_count
+        return {
+            "depth": self._queue.qsize() if self._queue else 0,
+            "maxsize": self.maxsize,
+            "workers": self.worker_count,
+            "busy_workers": self._busy,
+            "utilization": self._busy_time / capacity if capacity else 0.0,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "failed": self.failed,
+            "lag_last": self.last_lag,
+            "lag_avg": self._total_lag / self._picked if self._picked else 0.0,
+            "lag_max": self.max_lag
+        }
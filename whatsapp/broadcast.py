@@ -0,0 +1,237 @@
+# broadcast.py
+
+import os
+import time
+import random
+import asyncio
+import inspect
+import logging
+from typing import Dict, Any, Optional, Callable, Awaitable, Iterable, List, Union
+
+import aiohttp
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Status codes that are worth retrying: provider throttling and server errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Async token-bucket rate limiter.
+
+    Tokens refill continuously at ``rate`` per second up to ``capacity``.
+    Waiters are served in arrival order. ``pause`` empties the bucket and
+    blocks every caller for a while, which is how a 429 from the provider
+    slows down the whole broadcast instead of just one worker.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[int] = None):
+        if rate <= 0:
+            raise ValueError("Token bucket rate must be positive.")
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Drain the bucket and hold all callers for ``seconds``."""
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0.0
+        self._updated = self._paused_until
+
+
+class BroadcastEngine:
+    """
+    Sends one message to many recipients concurrently.
+
+    A bounded pool of workers pulls recipients from a queue, renders each
+    message, takes a token from the shared rate limiter and sends it.
+    Throttling (429) and server errors (5xx) are retried with jittered
+    exponential backoff; other client errors fail the recipient immediately.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, str], Awaitable[Dict[str, Any]]],
+        rate_per_second: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        max_retries: int = 3,
+        base_backoff: float = 0.5,
+        max_backoff: float = 30.0
+    ):
+        """
+        Args:
+            send: Coroutine function ``send(phone_number, message)``, usually
+                ``WhatsAppService.send_text_message``
+            rate_per_second: Sustained send rate allowed by the provider quota
+                (defaults to ``WHAPI_RATE_LIMIT`` or 50)
+            burst: Token bucket capacity (defaults to ``WHAPI_RATE_BURST`` or the rate)
+            max_workers: Number of concurrent workers (defaults to ``BROADCAST_WORKERS`` or 32)
+            max_retries: Retries per recipient after the first attempt
+            base_backoff: First retry delay in seconds, doubled on each retry
+            max_backoff: Upper bound for a single retry delay in seconds
+        """
+        rate_per_second = rate_per_second or float(os.getenv("WHAPI_RATE_LIMIT", "50"))
+        burst = burst or int(os.getenv("WHAPI_RATE_BURST", "0")) or None
+        self.send = send
+        self.rate_limiter = TokenBucket(rate_per_second, burst)
+        self.max_workers = max_workers or int(os.getenv("BROADCAST_WORKERS", "32"))
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(self.max_backoff, retry_after)
+        delay = min(self.max_backoff, self.base_backoff * (2 ** (attempt - 1)))
+        # Equal jitter (half fixed, half random) keeps retrying workers from synchronising
+        return random.uniform(delay / 2, delay)
+
+    @staticmethod
+    def _retry_after(error: aiohttp.ClientResponseError) -> Optional[float]:
+        headers = error.headers or {}
+        value = headers.get("Retry-After")
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
+
+    async def _send_with_retries(self, phone_number: str, message: str) -> Dict[str, Any]:
+        attempt = 0
+        while True:
+            attempt += 1
+            await self.rate_limiter.acquire()
+            try:
+                response = await self.send(phone_number, message)
+                return {"status": "sent", "attempts": attempt, "response": response}
+            except aiohttp.ClientResponseError as e:
+                if e.status not in RETRYABLE_STATUSES or attempt > self.max_retries:
+                    return {"status": "failed", "attempts": attempt, "error": f"HTTP {e.status}: {e.message}"}
+                delay = self._backoff_delay(attempt, self._retry_after(e))
+                if e.status == 429:
+                    # The quota is shared, so every worker has to slow down
+                    self.rate_limiter.pause(delay)
+                logger.warning(f"Send to {phone_number} got HTTP {e.status}, retrying in {delay:.2f}s")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt > self.max_retries:
+                    return {"status": "failed", "attempts": attempt, "error": str(e) or type(e).__name__}
+                delay = self._backoff_delay(attempt)
+                logger.warning(f"Send to {phone_number} failed ({e!r}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def broadcast(
+        self,
+        recipients: Iterable[Dict[str, Any]],
+        message_factory: Callable[[Dict[str, Any]], Union[str, Awaitable[str]]],
+        on_progress: Optional[Callable[[Dict[str, Any]], Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Send a message to every recipient and collect per-recipient results.
+
+        Args:
+            recipients: Employee records with ``whatsapp_number`` (and ideally ``id``)
+            message_factory: Builds the message for one recipient; may be a coroutine
+            on_progress: Optional callback (sync or async) called after each
+                recipient with its result plus ``completed`` and ``total`` counts
+
+        Returns:
+            Summary with ``total``, ``sent``, ``failed``, ``duration`` and the
+            ordered list of per-recipient ``results``
+        """
+        recipients = list(recipients)
+        total = len(recipients)
+        results: List[Optional[Dict[str, Any]]] = [None] * total
+        queue: asyncio.Queue = asyncio.Queue()
+        for index, recipient in enumerate(recipients):
+            queue.put_nowait((index, recipient))
+
+        completed = 0
+        started = time.monotonic()
+
+        async def process(recipient: Dict[str, Any]) -> Dict[str, Any]:
+            phone_number = recipient.get("whatsapp_number")
+            result = {
+                "employee_id": recipient.get("id"),
+                "whatsapp_number": phone_number
+            }
+            if not phone_number:
+                return {**result, "status": "failed", "attempts": 0, "error": "Missing whatsapp_number"}
+            try:
+                message = message_factory(recipient)
+                if inspect.isawaitable(message):
+                    message = await message
+            except Exception as e:
+                logger.error(f"Error building message for {phone_number}: {str(e)}")
+                return {**result, "status": "failed", "attempts": 0, "error": f"Message build failed: {e}"}
+            result["message"] = message
+            sent_at = time.monotonic()
+            result.update(await self._send_with_retries(phone_number, message))
+            result["latency"] = time.monotonic() - sent_at
+            return result
+
+        async def worker():
+            nonlocal completed
+            while True:
+                try:
+                    index, recipient = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    result = await process(recipient)
+                except Exception as e:
+                    logger.error(f"Unexpected broadcast error: {str(e)}")
+                    result = {
+                        "employee_id": recipient.get("id"),
+                        "whatsapp_number": recipient.get("whatsapp_number"),
+                        "status": "failed",
+                        "attempts": 0,
+                        "error": str(e)
+                    }
+                results[index] = result
+                completed += 1
+                if on_progress is not None:
+                    try:
+                        progress = on_progress({**result, "completed": completed, "total": total})
+                        if inspect.isawaitable(progress):
+                            await progress
+                    except Exception as e:
+                        logger.error(f"Error in broadcast progress callback: {str(e)}")
+
+        workers = min(self.max_workers, total)
+        await asyncio.gather(*(worker() for _ in range(workers)))
+
+        sent = sum(1 for r in results if r["status"] == "sent")
+        duration = time.monotonic() - started
+        logger.info(f"Broadcast finished: {sent}/{total} sent in {duration:.2f}s")
+        return {
+            "total": total,
+            "sent": sent,
+            "failed": total - sent,
+            "duration": duration,
+            "results": results
+        }
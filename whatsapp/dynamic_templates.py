@@ -1,12 +1,18 @@
 # dynamic_templates.py
 
+import os
 import json
+from collections import Counter
 from typing import Dict, Any, Optional
-import openai
 import logging
 from datetime import datetime
-from .templates import MessageTemplates
+from .templates import MessageTemplates, TemplateStore
 from performance_analyzer import PerformanceAnalyzer
+from insights_cache import InsightsCache
+from prompt_compaction import PromptCompactor, get_default_compactor
+from llm_client import LLMClient, get_default_client
+from circuit_breaker import OPEN, CircuitOpenError
+from single_flight import SingleFlight
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,9 +23,35 @@ class DynamicTemplateGenerator:
     and context. Combines pre-written templates with dynamic content.
     """
     
-    def __init__(self):
-        self.base_templates = MessageTemplates()
-        self.performance_analyzer = PerformanceAnalyzer()
+    def __init__(self,
+                 performance_analyzer: Optional[PerformanceAnalyzer] = None,
+                 compactor: Optional[PromptCompactor] = None,
+                 llm_client: Optional[LLMClient] = None,
+                 llm_timeout: Optional[float] = None,
+                 template_store: Optional[TemplateStore] = None):
+        # Fallback templates come from an edited-in-place file when one is configured
+        templates_file = os.getenv("WHATSAPP_TEMPLATES_FILE")
+        self._owns_template_store = template_store is None and bool(templates_file)
+        if self._owns_template_store:
+            template_store = TemplateStore(templates_file).start()
+        self.template_store = template_store
+        self.base_templates = template_store or MessageTemplates()
+        self.compactor = compactor or get_default_compactor()
+        self.llm = llm_client or get_default_client()
+        # A static template beats a message that arrives after a long wait
+        self.llm_timeout = llm_timeout or float(os.getenv("TEMPLATE_LLM_TIMEOUT", "10"))
+        self.performance_analyzer = performance_analyzer or PerformanceAnalyzer(llm_client=self.llm)
+        # Insights are reused across messages until the employee's data changes
+        self.insights_cache = InsightsCache(self.performance_analyzer)
+        self.generated = 0
+        self.fallbacks: Counter = Counter()
+        # Identical concurrent requests (e.g. duplicate webhooks) share one generation
+        self.single_flight = SingleFlight("generate_personalized_message")
+
+    def close(self) -> None:
+        self.insights_cache.close()
+        if self._owns_template_store:
+            self.template_store.close()
         
     async def generate_personalized_message(
         self,
@@ -29,6 +61,7 @@ class DynamicTemplateGenerator:
     ) -> str:
         """
         Generate a personalized message based on employee data and context.
+        Concurrent calls with the same arguments share one generation.
         
         Args:
             employee_id: The employee's unique identifier
@@ -36,34 +69,92 @@ class DynamicTemplateGenerator:
             context: Additional context for message generation
             
         Returns:
-            Personalized message string
+            Personalized message string, or the static base template if the
+            LLM is unavailable (immediately, while its circuit breaker is open)
         """
+        key = (str(employee_id), message_type, json.dumps(context, sort_keys=True, default=str))
+        return await self.single_flight.run(
+            key, self._generate_personalized_message, employee_id, message_type, context
+        )
+
+    async def _generate_personalized_message(self,
+                                             employee_id: str,
+                                             message_type: str,
+                                             context: Optional[Dict[str, Any]]) -> str:
+        # Skip the insights lookup too: the message would fall back anyway
+        if self.llm.breaker.state == OPEN:
+            return self._fallback(message_type, "circuit_open")
+
         try:
             # Get employee performance insights
-            insights = await self.performance_analyzer.generate_insights(employee_id)
+            insights = await self.insights_cache.get(employee_id)
             
             # Create AI prompt based on message type and context
             prompt = self._create_prompt(message_type, insights, context)
             
             # Generate personalized content using GPT-3.5
-            response = await openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{
+            response = await self.llm.chat(
+                [{
                     "role": "user",
                     "content": prompt
-                }]
+                }],
+                model="gpt-3.5-turbo",
+                timeout=self.llm_timeout
             )
             
-            return response.choices[0].message.content.strip()
+            self.generated += 1
+            return response.strip()
             
+        except CircuitOpenError:
+            return self._fallback(message_type, "circuit_open")
         except Exception as e:
             logger.error(f"Error generating personalized message: {str(e)}")
-            # Fallback to base template
-            return self.base_templates.get_template(
-                message_type.split('/')[0],
-                message_type.split('/')[1]
-            )
+            return self._fallback(message_type, "error")
+
+    def _fallback(self, message_type: str, reason: str) -> str:
+        """Serve the base template for ``message_type`` and count why"""
+        self.fallbacks[reason] += 1
+        return self.base_templates.get_template(
+            message_type.split('/')[0],
+            message_type.split('/')[1]
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Personalized vs. fallback message counts, the LLM circuit breaker state and coalescing counters"""
+        return {
+            'generated': self.generated,
+            'fallbacks': dict(self.fallbacks),
+            'breaker': self.llm.breaker.stats(),
+            'single_flight': self.single_flight.stats()
+        }
     
+    @staticmethod
+    def _format_common_tasks(common_tasks) -> str:
+        return "\n".join(f"- {task} ({count}x)" for task, count in common_tasks)
+
+    @staticmethod
+    def _format_recommendations(recommendations) -> str:
+        lines = []
+        for recommendation in recommendations:
+            if isinstance(recommendation, dict):
+                lines.append(f"- {recommendation.get('area')}: {recommendation.get('suggestion')}")
+            else:
+                lines.append(f"- {recommendation}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _format_quality_trend(quality_trend) -> str:
+        """One summary line plus the model's feedback per update, newest last"""
+        scores = [q['average_score'] for q in quality_trend if isinstance(q, dict) and 'average_score' in q]
+        lines = []
+        if scores:
+            lines.append(f"Average score {sum(scores) / len(scores):.1f}/10 over {len(scores)} updates")
+        for quality in quality_trend:
+            feedback = quality.get('feedback') if isinstance(quality, dict) else quality
+            if feedback:
+                lines.append(f"- {' '.join(str(feedback).split())}")
+        return "\n".join(lines)
+
     def _create_prompt(
         self,
         message_type: str,
@@ -72,13 +163,18 @@ class DynamicTemplateGenerator:
     ) -> str:
         """
         Create an AI prompt based on message type and context.
+
+        Insights are rendered as short lists instead of raw Python reprs and
+        the prompt is compacted to the token budget (PROMPT_TOKEN_BUDGET).
         """
         base_prompts = {
-            "daily_updates/morning": f"""
+            "daily_updates/morning": """
 Create a personalized morning update request message considering:
-- Previous completion rate: {insights['performance_trend']['completion_rate_trend']}%
-- Recent task patterns: {insights['common_tasks']}
-- Current recommendations: {insights['recommendations']}
+- Previous completion rate: {completion_rate}%
+- Recent task patterns:
+{common_tasks}
+- Current recommendations:
+{recommendations}
 
 The message should be:
 1. Professional but friendly
@@ -87,11 +183,14 @@ The message should be:
 4. Be motivating and encouraging
             """.strip(),
             
-            "feedback/performance": f"""
+            "feedback/performance": """
 Generate constructive feedback based on:
-- Quality trends: {insights['performance_trend']['quality_trend']}
-- Task completion patterns: {insights['common_tasks']}
-- Areas for improvement: {insights['recommendations']}
+- Quality trends:
+{quality_trend}
+- Task completion patterns:
+{common_tasks}
+- Areas for improvement:
+{recommendations}
 
 The feedback should be:
 1. Specific and actionable
@@ -100,12 +199,35 @@ The feedback should be:
 4. Include concrete next steps
             """.strip()
         }
-        
-        # Add any additional context to the prompt
+        template = base_prompts.get(message_type)
+        if template is None:
+            return "Generate a professional and friendly message appropriate for WhatsApp."
+
+        trend = insights['performance_trend']
+        sections = {
+            'completion_rate': f"{trend['completion_rate_trend'] * 100:.0f}",
+            'common_tasks': self._format_common_tasks(insights['common_tasks']),
+            'recommendations': self._format_recommendations(insights['recommendations']),
+            'quality_trend': self._format_quality_trend(trend['quality_trend'])
+        }
+        # What the prompt used to contain, for the tokens-saved metric
+        raw_sections = {
+            'completion_rate': trend['completion_rate_trend'],
+            'common_tasks': insights['common_tasks'],
+            'recommendations': insights['recommendations'],
+            'quality_trend': trend['quality_trend']
+        }
+
+        # Add any additional context to the prompt. The heading and its blank
+        # line belong to the template: compaction drops blank lines in sections
         if context:
-            base_prompts[message_type] += f"\n\nAdditional context:\n{json.dumps(context, indent=2)}"
-            
-        return base_prompts.get(
+            template += "\n\nAdditional context:\n{context}"
+            sections['context'] = json.dumps(context, separators=(',', ':'), default=str)
+            raw_sections['context'] = json.dumps(context, indent=2, default=str)
+
+        return self.compactor.compact(
             message_type,
-            "Generate a professional and friendly message appropriate for WhatsApp."
-        )
\ No newline at end of file
+            template,
+            sections,
+            original=template.format(**raw_sections)
+        )
@@ -1,54 +1,85 @@
 import os
-from typing import Dict, List, Any
-import requests
+import asyncio
+from typing import Dict, List, Any, Optional, Callable, Iterable
 import json
 import logging
 from datetime import datetime
 from enhanced_data_manager import EnhancedDataManager
 from performance_analyzer import PerformanceAnalyzer
-from templates import MessageTemplates
-from dynamic_templates import DynamicTemplateGenerator
+from idempotency import IdempotencyStore
+from llm_client import LLMClient, get_default_client
+from whatsapp_service import WhatsAppService
+from .dynamic_templates import DynamicTemplateGenerator
+from .broadcast import BroadcastEngine
 
 class WhatsAppIntegrator:
-    def __init__(self):
-        self.templates = MessageTemplates()
-        self.dynamic_templates = DynamicTemplateGenerator()
+    def __init__(self,
+                 whatsapp: Optional[WhatsAppService] = None,
+                 dedupe_webhooks: bool = True,
+                 llm_client: Optional[LLMClient] = None):
         self.data_manager = EnhancedDataManager()
-        self.performance_analyzer = PerformanceAnalyzer()
-        self.api_key = os.getenv("WHAPI_API_KEY")
-        self.base_url = "https://whapi.cloud/api"
+        self.llm = llm_client or get_default_client()
+        self.performance_analyzer = PerformanceAnalyzer(data_manager=self.data_manager, llm_client=self.llm)
+        self.dynamic_templates = DynamicTemplateGenerator(self.performance_analyzer, llm_client=self.llm)
+        # One template source, so a reloaded file reaches every message path
+        self.templates = self.dynamic_templates.base_templates
+        self.whatsapp = whatsapp or WhatsAppService()
+        self.broadcaster = BroadcastEngine(self.whatsapp.send_text_message)
+        self.idempotency = IdempotencyStore(
+            self.data_manager,
+            max_entries=int(os.getenv("WEBHOOK_DEDUPE_CACHE_SIZE", "100000")),
+            retention_days=float(os.getenv("WEBHOOK_DEDUPE_RETENTION_DAYS", "7")),
+            prune_interval=float(os.getenv("WEBHOOK_DEDUPE_PRUNE_INTERVAL", "3600"))
+        ) if dedupe_webhooks else None
+
+    async def close(self) -> None:
+        self.dynamic_templates.close()
+        await self.whatsapp.close()
+        await self.llm.close()
+        await self.data_manager.close()
+
+    async def warm_up_insights(self, employee_ids: Iterable[str], time_period: str = "1w") -> Dict[str, int]:
+        """Precompute cached insights off-peak so campaign sends don't pay for them"""
+        return await self.dynamic_templates.insights_cache.warm_up(employee_ids, time_period)
         
     async def send_message(self, phone_number: str, message: str) -> Dict[str, Any]:
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "messaging_product": "whatsapp",
-            "to": phone_number,
-            "type": "text",
-            "text": {"body": message}
-        }
-        
-        response = requests.post(
-            f"{self.base_url}/messages",
-            headers=headers,
-            json=payload
-        )
-        
-        await self.data_manager.store_message_log(
-            phone_number, 
-            "outbound",
-            message,
-            response.json()
-        )
-        
-        return response.json()
+        """
+        Send a text message over the pooled WhatsApp session and log it.
+
+        Raises if the provider did not accept the message (an HTTP error
+        status, a connection failure or the session timeout); once it has,
+        nothing here raises, since the log write swallows its own errors.
+        """
+        response = await self.whatsapp.send_text_message(phone_number, message)
+        await self.data_manager.store_message_log(phone_number, "outbound", message, response)
+        return response
 
     async def process_webhook(self, webhook_data: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            message = webhook_data["messages"][0]
+            messages = webhook_data.get("messages") or []
+            results = await asyncio.gather(
+                *(self._process_webhook_message(message) for message in messages)
+            )
+            return {
+                "status": "success",
+                "message": "Webhook processed",
+                "processed": results.count("processed"),
+                "duplicates": results.count("duplicate"),
+                "failed": results.count("failed")
+            }
+            
+        except Exception as e:
+            logging.error(f"Webhook processing error: {str(e)}")
+            return {"status": "error", "message": str(e)}
+
+    async def _process_webhook_message(self, message: Dict[str, Any]) -> str:
+        message_id = message.get("id")
+        # Drop provider redeliveries before doing any DB, LLM or send work
+        if self.idempotency is not None and message_id is not None:
+            if not await self.idempotency.claim(message_id):
+                return "duplicate"
+
+        try:
             phone_number = message["from"]
             message_text = message["text"]["body"]
             
@@ -56,7 +87,7 @@ class WhatsAppIntegrator:
                 phone_number,
                 "inbound",
                 message_text,
-                webhook_data
+                message
             )
             
             response = await self.performance_analyzer.evaluate_response_quality(
@@ -68,12 +99,13 @@ class WhatsAppIntegrator:
                 phone_number,
                 "Thank you for your update. Your response has been recorded."
             )
-            
-            return {"status": "success", "message": "Webhook processed"}
-            
+            return "processed"
         except Exception as e:
-            logging.error(f"Webhook processing error: {str(e)}")
-            return {"status": "error", "message": str(e)}
+            logging.error(f"Error processing webhook message {message_id}: {str(e)}")
+            # Let a redelivery of this message be processed again
+            if self.idempotency is not None and message_id is not None:
+                await self.idempotency.release(message_id)
+            return "failed"
 
     async def send_morning_update_request(self, employee_id: str):
         message = await self.dynamic_templates.generate_personalized_message(
@@ -93,24 +125,79 @@ class WhatsAppIntegrator:
         await self.send_message(employee["whatsapp_number"], message)
 
     async def send_daily_reminder(self, employee_data: Dict[str, Any]) -> None:
-        message = (
+        await self.send_message(employee_data["whatsapp_number"], self._daily_reminder_message())
+
+    async def send_weekly_report(self, employee_id: str) -> None:
+        report_message = await self._weekly_report_message(employee_id)
+        employee = await self.data_manager.get_employee(employee_id)
+        await self.send_message(employee["whatsapp_number"], report_message)
+
+    def _daily_reminder_message(self) -> str:
+        return (
             "Hi! Please share your daily updates:\n"
             "1. Tasks completed today\n"
             "2. Any blockers or challenges\n"
             "3. Plans for tomorrow"
         )
-        await self.send_message(employee_data["whatsapp_number"], message)
 
-    async def send_weekly_report(self, employee_id: str) -> None:
-        insights = await self.performance_analyzer.generate_insights(employee_id)
+    async def _weekly_report_message(self, employee_id: str) -> str:
+        insights = await self.dynamic_templates.insights_cache.get(employee_id)
         report_message = (
             "Weekly Performance Summary:\n"
             f"Completion Rate: {insights['performance_trend']['completion_rate_trend']}%\n"
             "Key Recommendations:\n"
         )
-        
+
         for rec in insights['recommendations'][:2]:
             report_message += f"- {rec['suggestion']}\n"
-            
-        employee = await self.data_manager.get_employee(employee_id)
-        await self.send_message(employee["whatsapp_number"], report_message)
\ No newline at end of file
+
+        return report_message
+
+    async def _broadcast(self,
+                         employees: Iterable[Dict[str, Any]],
+                         message_type: str,
+                         message_factory: Callable[[Dict[str, Any]], Any],
+                         on_progress: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Dict[str, Any]:
+        def log_and_report(result: Dict[str, Any]) -> Any:
+            # Only messages the provider accepted are logged, with the attempts they took
+            if result["status"] == "sent" and result.get("employee_id"):
+                # Don't hold the next send on the log write; it may be batched
+                self.data_manager.log_message_nowait(
+                    result["employee_id"], message_type, result["message"], result["attempts"]
+                )
+            if on_progress is not None:
+                return on_progress(result)
+
+        return await self.broadcaster.broadcast(employees, message_factory, log_and_report)
+
+    async def broadcast_daily_reminder(self,
+                                       employees: Iterable[Dict[str, Any]],
+                                       on_progress: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Dict[str, Any]:
+        """Send the daily reminder to every employee (records with ``id`` and ``whatsapp_number``)"""
+        message = self._daily_reminder_message()
+        return await self._broadcast(employees, "daily_reminder", lambda employee: message, on_progress)
+
+    async def broadcast_morning_update_request(self,
+                                               employees: Iterable[Dict[str, Any]],
+                                               on_progress: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Dict[str, Any]:
+        """Send a personalized morning update request to every employee"""
+        return await self._broadcast(
+            employees,
+            "morning_update",
+            lambda employee: self.dynamic_templates.generate_personalized_message(
+                employee["id"],
+                "daily_updates/morning"
+            ),
+            on_progress
+        )
+
+    async def broadcast_weekly_report(self,
+                                      employees: Iterable[Dict[str, Any]],
+                                      on_progress: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Dict[str, Any]:
+        """Send each employee their weekly performance report"""
+        return await self._broadcast(
+            employees,
+            "weekly_report",
+            lambda employee: self._weekly_report_message(employee["id"]),
+            on_progress
+        )
\ No newline at end of file
@@ -1,13 +1,54 @@
 # templates.py
 
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Iterator, NamedTuple, Optional, Tuple
+from string import Formatter
+import os
 import json
 import logging
+import tempfile
+import threading
 from datetime import datetime
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+class TemplateRenderError(ValueError):
+    """Raised when a template is malformed or rendered without its placeholders"""
+
+
+class CompiledTemplate:
+    """
+    A template parsed once at load time.
+
+    The placeholder names are extracted and validated up front, so rendering
+    is a single ``str.format_map`` call and a missing parameter is reported
+    by name instead of surfacing as a generic formatting error.
+    """
+
+    __slots__ = ('text', 'fields', '_format_map')
+
+    def __init__(self, text: str):
+        self.text = text
+        try:
+            fields = [field for _, field, _, _ in Formatter().parse(text) if field is not None]
+        except ValueError as e:
+            raise TemplateRenderError(f"Malformed template: {e}") from e
+        for field in fields:
+            if not field.isidentifier():
+                raise TemplateRenderError(f"Unsupported placeholder {{{field}}}; use simple names")
+        self.fields = frozenset(fields)
+        self._format_map = text.format_map
+
+    def render(self, params: Dict[str, Any]) -> str:
+        if not self.fields:
+            return self.text
+        try:
+            return self._format_map(params)
+        except KeyError:
+            missing = sorted(self.fields - params.keys())
+            raise TemplateRenderError(f"Missing template parameters: {', '.join(missing)}") from None
+
 class MessageTemplates:
     """
     Handles storage and retrieval of WhatsApp message templates.
@@ -73,6 +114,24 @@ Week: {week_range}
                 """.strip()
             }
         }
+        self._compiled = self._compile_all(self.templates)
+        self._loaded_from: Optional[Tuple[str, int, int]] = None
+
+    @staticmethod
+    def _compile_all(templates: Dict[str, Dict[str, str]]) -> Dict[Tuple[str, str], CompiledTemplate]:
+        return {
+            (category, template_type): CompiledTemplate(template)
+            for category, types in templates.items()
+            for template_type, template in types.items()
+        }
+
+    def _get_compiled(self, category: str, template_type: str) -> CompiledTemplate:
+        compiled = self._compiled.get((category, template_type))
+        if compiled is None:
+            # Raises KeyError for unknown templates
+            compiled = CompiledTemplate(self.templates[category][template_type])
+            self._compiled[(category, template_type)] = compiled
+        return compiled
     
     def get_template(self, category: str, template_type: str, **kwargs) -> str:
         """
@@ -85,16 +144,41 @@ Week: {week_range}
             
         Returns:
             Formatted template string
+
+        Raises:
+            TemplateRenderError: If parameters are given but some placeholders are missing
         """
         try:
-            template = self.templates[category][template_type]
-            return template.format(**kwargs) if kwargs else template
+            compiled = self._get_compiled(category, template_type)
         except KeyError:
             logger.error(f"Template not found: {category}/{template_type}")
             return "Template not found. Please check the category and type."
-        except Exception as e:
-            logger.error(f"Error formatting template: {str(e)}")
-            return "Error formatting template. Please check the parameters."
+        return compiled.render(kwargs) if kwargs else compiled.text
+
+    def render_many(self,
+                    category: str,
+                    template_type: str,
+                    params_list: Iterable[Dict[str, Any]]) -> Iterator[str]:
+        """
+        Render one template for many recipients.
+
+        The template is looked up once and rendered lazily, so memory stays
+        flat no matter how many parameter dicts are streamed through.
+        
+        Args:
+            category: The template category
+            template_type: The specific template type
+            params_list: Iterable of per-recipient parameter dicts
+            
+        Returns:
+            Iterator of rendered messages, in input order
+
+        Raises:
+            KeyError: If the template does not exist
+            TemplateRenderError: While iterating, if a parameter dict lacks a placeholder
+        """
+        render = self._get_compiled(category, template_type).render
+        return map(render, params_list)
 
     def add_template(self, category: str, template_type: str, template: str) -> bool:
         """
@@ -109,30 +193,207 @@ Week: {week_range}
             bool: Success status
         """
         try:
+            compiled = CompiledTemplate(template.strip())
             if category not in self.templates:
                 self.templates[category] = {}
-            self.templates[category][template_type] = template.strip()
+            self.templates[category][template_type] = compiled.text
+            self._compiled[(category, template_type)] = compiled
             return True
         except Exception as e:
             logger.error(f"Error adding template: {str(e)}")
             return False
 
     def save_to_file(self, filepath: str) -> bool:
-        """Save templates to a JSON file for persistence"""
+        """
+        Save templates to a JSON file for persistence.
+
+        The file is written to a temporary sibling and moved into place, so a
+        TemplateStore watching it never reads a half-written file.
+        """
         try:
-            with open(filepath, 'w') as f:
-                json.dump(self.templates, f, indent=2)
+            directory = os.path.dirname(os.path.abspath(filepath))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self.templates, f, indent=2)
+                # mkstemp creates 0600 files; keep the permissions a plain open() would give
+                mode = os.stat(filepath).st_mode if os.path.exists(filepath) else 0o644
+                os.chmod(tmp_path, mode & 0o777)
+                os.replace(tmp_path, filepath)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
             return True
         except Exception as e:
             logger.error(f"Error saving templates: {str(e)}")
             return False
 
     def load_from_file(self, filepath: str) -> bool:
-        """Load templates from a JSON file"""
+        """Load templates from a JSON file, skipping the parse if it is unchanged since the last load"""
         try:
+            stat = os.stat(filepath)
+            signature = (os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+            if signature == self._loaded_from:
+                return True
             with open(filepath, 'r') as f:
-                self.templates = json.load(f)
+                templates = json.load(f)
+            # Compile before swapping so a bad file leaves the current templates intact
+            compiled = self._compile_all(templates)
+            self.templates = templates
+            self._compiled = compiled
+            self._loaded_from = signature
             return True
         except Exception as e:
             logger.error(f"Error loading templates: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+
+
+class RenderedTemplate(NamedTuple):
+    """A rendered message tagged with the template version that produced it"""
+    text: str
+    version: int
+
+
+class TemplateSnapshot:
+    """Immutable, fully compiled view of one version of the template file"""
+
+    __slots__ = ('version', 'compiled', 'signature')
+
+    def __init__(self,
+                 version: int,
+                 compiled: Dict[Tuple[str, str], CompiledTemplate],
+                 signature: Optional[Tuple[int, int]]):
+        self.version = version
+        self.compiled = compiled
+        self.signature = signature
+
+
+class TemplateStore:
+    """
+    Template file store that picks up edits without a restart.
+
+    After ``start()`` a background thread checks the file's mtime and size
+    every ``check_interval`` seconds; only a changed file is re-read and
+    compiled. The new version is published by swapping a single snapshot
+    reference, so renders never stat, lock or parse and always see one
+    consistent version, and every render is tagged with the version it used.
+    Invalid files are logged and the current version stays live.
+    """
+
+    def __init__(self, filepath: str, check_interval: Optional[float] = None):
+        """
+        Args:
+            filepath: Path of the JSON template file
+            check_interval: Seconds between file change checks once started
+        """
+        self.filepath = filepath
+        self.check_interval = check_interval or float(os.getenv("TEMPLATE_RELOAD_INTERVAL", "1"))
+        self._reload_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        # Version 0 is the built-in default set, used until the file loads
+        defaults = MessageTemplates()
+        self._snapshot = TemplateSnapshot(0, defaults._compile_all(defaults.templates), None)
+        self.reload()
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def start(self) -> 'TemplateStore':
+        """Start the background thread that picks up file changes"""
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name="template-store", daemon=True)
+            self._watcher.start()
+        return self
+
+    def close(self) -> None:
+        """Stop the background thread; the current version stays usable"""
+        self._stopped.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.check_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"Error checking templates file {self.filepath}: {str(e)}")
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Reload the file if it changed since the last load.
+
+        Returns:
+            True if a new version was published
+        """
+        # Only one thread reloads; everyone else keeps rendering the current snapshot
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            current = self._snapshot
+            try:
+                stat = os.stat(self.filepath)
+            except FileNotFoundError:
+                return False
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature == current.signature and not force:
+                return False
+            try:
+                with open(self.filepath, 'r') as f:
+                    templates = json.load(f)
+                compiled = MessageTemplates._compile_all(templates)
+            except Exception as e:
+                logger.error(f"Error reloading templates from {self.filepath}: {str(e)}")
+                # Remember the bad file so it isn't re-parsed until it changes again
+                self._snapshot = TemplateSnapshot(current.version, current.compiled, signature)
+                return False
+            self._snapshot = TemplateSnapshot(current.version + 1, compiled, signature)
+            logger.info(f"Loaded templates version {current.version + 1} from {self.filepath}")
+            return True
+        finally:
+            self._reload_lock.release()
+
+    def snapshot(self) -> TemplateSnapshot:
+        """Current snapshot; reloads happen on the watcher thread, never here"""
+        return self._snapshot
+
+    def get_template(self, category: str, template_type: str, **kwargs) -> str:
+        """
+        Drop-in for ``MessageTemplates.get_template`` over the current version.
+
+        Raises:
+            TemplateRenderError: If parameters are given but some placeholders are missing
+        """
+        compiled = self._snapshot.compiled.get((category, template_type))
+        if compiled is None:
+            logger.error(f"Template not found: {category}/{template_type}")
+            return "Template not found. Please check the category and type."
+        return compiled.render(kwargs) if kwargs else compiled.text
+
+    def render(self, category: str, template_type: str, **kwargs) -> RenderedTemplate:
+        """
+        Render a template from the current version.
+
+        Raises:
+            KeyError: If the template does not exist in the current version
+            TemplateRenderError: If placeholders are missing from kwargs
+        """
+        snapshot = self.snapshot()
+        compiled = snapshot.compiled[(category, template_type)]
+        text = compiled.render(kwargs) if kwargs else compiled.text
+        return RenderedTemplate(text, snapshot.version)
+
+    def render_many(self,
+                    category: str,
+                    template_type: str,
+                    params_list: Iterable[Dict[str, Any]]) -> Iterator[RenderedTemplate]:
+        """
+        Render one template for many recipients against a single version,
+        even if the file is reloaded while the iterator is being consumed.
+        """
+        snapshot = self.snapshot()
+        render = snapshot.compiled[(category, template_type)].render
+        version = snapshot.version
+        return (RenderedTemplate(render(params), version) for params in params_list)
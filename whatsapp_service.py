@@ -1,4 +1,5 @@
 import os
+import asyncio
 import aiohttp
 import logging
 from typing import Dict, Any, Optional
@@ -6,11 +7,94 @@ from typing import Dict, Any, Optional
 logger = logging.getLogger(__name__)
 
 class WhatsAppService:
-    def __init__(self):
-        """Initialize the WhatsAppService with the Whapi API key and base URL."""
+    def __init__(self,
+                 base_url: Optional[str] = None,
+                 limit: int = 100,
+                 limit_per_host: int = 20,
+                 ttl_dns_cache: int = 300,
+                 keepalive_timeout: float = 30.0,
+                 request_timeout: float = 30.0):
+        """
+        Initialize the WhatsAppService with the Whapi API key and base URL.
+
+        The service owns one long-lived ``aiohttp.ClientSession`` so that
+        consecutive sends reuse pooled keep-alive connections instead of paying
+        for a new TCP+TLS handshake each time. Call :meth:`start` and
+        :meth:`close` from the application lifespan; if :meth:`start` was not
+        called, the session is created lazily on the first request.
+
+        :param base_url: Whapi API URL. Defaults to ``WHAPI_BASE_URL`` or the dashboard URL.
+        :param limit: Maximum number of simultaneous connections in the pool.
+        :param limit_per_host: Maximum number of simultaneous connections per host.
+        :param ttl_dns_cache: Seconds to cache DNS lookups for (``None`` caches forever).
+        :param keepalive_timeout: Seconds an idle connection is kept open for reuse.
+        :param request_timeout: Total timeout for a single API request, in seconds.
+        """
         self.api_key = os.getenv("WHAPI_API_KEY")  # Use your API key
-        self.base_url = "https://glito.whapi.com"  # Use the API URL from the dashboard
-        
+        self.base_url = base_url or os.getenv("WHAPI_BASE_URL", "https://glito.whapi.com")  # Use the API URL from the dashboard
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.ttl_dns_cache = ttl_dns_cache
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        """
+        Create the pooled HTTP session. Safe to call more than once.
+        """
+        async with self._session_lock:
+            if self._session is not None and not self._session.closed:
+                return
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.ttl_dns_cache,
+                use_dns_cache=True,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+            )
+            logger.info(
+                f"WhatsApp HTTP session started (limit={self.limit}, "
+                f"limit_per_host={self.limit_per_host})"
+            )
+
+    async def close(self) -> None:
+        """
+        Close the pooled HTTP session and release its connections.
+        """
+        async with self._session_lock:
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+                logger.info("WhatsApp HTTP session closed")
+            self._session = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
+
+    async def _post(self, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        POST to the Whapi API over the shared session and return the JSON body.
+
+        :param path: API path relative to the base URL.
+        :param payload: Optional JSON payload.
+        :return: Response from the API.
+        """
+        session = await self._get_session()
+        async with session.post(f"{self.base_url}{path}", json=payload) as response:
+            response.raise_for_status()
+            return await response.json()
+
     async def send_text_message(self, phone_number: str, message: str) -> Dict[str, Any]:
         """
         Send a text message via WhatsApp.
@@ -19,31 +103,19 @@ class WhatsAppService:
         :param message: The text message to send.
         :return: Response from the API.
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "typing_time": 0,  # Optional typing simulation
             "to": phone_number,
             "body": message
         }
-        
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(
-                    f"{self.base_url}/messages/text",
-                    headers=headers,
-                    json=payload
-                ) as response:
-                    response.raise_for_status()
-                    return await response.json()
-            except aiohttp.ClientError as e:
-                logger.error(f"Error sending WhatsApp message: {str(e)}")
-                raise
-
-    async def send_template_message(self, phone_number: str, template_name: str, 
+
+        try:
+            return await self._post("/messages/text", payload)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Error sending WhatsApp message: {str(e) or type(e).__name__}")
+            raise
+
+    async def send_template_message(self, phone_number: str, template_name: str,
                                   components: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Send a template message.
@@ -53,11 +125,6 @@ class WhatsAppService:
         :param components: Optional components for the template.
         :return: Response from the API.
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "to": phone_number,
             "template": {
@@ -67,24 +134,17 @@ class WhatsAppService:
                 }
             }
         }
-        
+
         if components:
             payload["template"]["components"] = components
 
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(
-                    f"{self.base_url}/messages/template",
-                    headers=headers,
-                    json=payload
-                ) as response:
-                    response.raise_for_status()
-                    return await response.json()
-            except aiohttp.ClientError as e:
-                logger.error(f"Error sending template message: {str(e)}")
-                raise
-
-    async def send_media_message(self, phone_number: str, media_type: str, 
+        try:
+            return await self._post("/messages/template", payload)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Error sending template message: {str(e) or type(e).__name__}")
+            raise
+
+    async def send_media_message(self, phone_number: str, media_type: str,
                                media_url: str, caption: Optional[str] = None) -> Dict[str, Any]:
         """
         Send a media message (image, video, document).
@@ -95,11 +155,6 @@ class WhatsAppService:
         :param caption: Optional caption for the media.
         :return: Response from the API.
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "to": phone_number,
             "type": media_type,
@@ -107,22 +162,15 @@ class WhatsAppService:
                 "url": media_url
             }
         }
-        
+
         if caption:
             payload["media"]["caption"] = caption
 
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(
-                    f"{self.base_url}/messages/media",
-                    headers=headers,
-                    json=payload
-                ) as response:
-                    response.raise_for_status()
-                    return await response.json()
-            except aiohttp.ClientError as e:
-                logger.error(f"Error sending media message: {str(e)}")
-                raise
+        try:
+            return await self._post("/messages/media", payload)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Error sending media message: {str(e) or type(e).__name__}")
+            raise
 
     async def mark_message_as_read(self, message_id: str) -> Dict[str, Any]:
         """
@@ -131,19 +179,8 @@ class WhatsAppService:
         :param message_id: The ID of the message to mark as read.
         :return: Response from the API.
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(
-                    f"{self.base_url}/messages/{message_id}/read",
-                    headers=headers
-                ) as response:
-                    response.raise_for_status()
-                    return await response.json()
-            except aiohttp.ClientError as e:
-                logger.error(f"Error marking message as read: {str(e)}")
-                raise
\ No newline at end of file
+        try:
+            return await self._post(f"/messages/{message_id}/read")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Error marking message as read: {str(e) or type(e).__name__}")
+            raise
@@ -3,18 +3,24 @@ from fastapi import FastAPI, Request, HTTPException
 from typing import Dict, Any
 import logging
 import asyncio
+from contextlib import asynccontextmanager
 from whatsapp_service import WhatsAppService
+from whatsapp.integrator import WhatsAppIntegrator
+from webhook_queue import WebhookQueue
+from campaign_scheduler import CampaignScheduler, default_jobs
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize FastAPI app
-app = FastAPI()
+# Shared WhatsApp client; its pooled HTTP session lives for the app lifetime
+whatsapp = WhatsAppService(
+    limit_per_host=int(os.getenv("WHAPI_LIMIT_PER_HOST", "20")),
+    ttl_dns_cache=int(os.getenv("WHAPI_DNS_CACHE_TTL", "300")),
+)
 
 # Function to send initial message
 async def send_initial_message():
-    whatsapp = WhatsAppService()
     try:
         response = await whatsapp.send_text_message(
             phone_number="+91 6299269697",  # Your number
@@ -24,42 +30,90 @@ async def send_initial_message():
     except Exception as e:
         logger.error(f"Failed to send initial message: {str(e)}")
 
-# Send initial message when the server starts
-@app.on_event("startup")
-async def startup_event():
+# Open the WhatsApp session and start the webhook workers (and, with
+# SCHEDULER_ENABLED=1, the campaign scheduler) on startup; on shutdown
+# drain the queue before closing the session and database pool
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await whatsapp.start()
+    integrator = WhatsAppIntegrator(whatsapp=whatsapp)
+    app.state.integrator = integrator
+    app.state.webhook_queue = WebhookQueue(
+        integrator.process_webhook,
+        maxsize=int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000")),
+        workers=int(os.getenv("WEBHOOK_WORKERS", "8")),
+    )
+    await app.state.webhook_queue.start()
+    app.state.scheduler = None
+    if os.getenv("SCHEDULER_ENABLED", "0") == "1":
+        from config import settings
+        app.state.scheduler = CampaignScheduler(
+            integrator.data_manager.get_active_employees,
+            default_jobs(integrator),
+            default_timezone=settings.TIMEZONE,
+            max_concurrency=int(os.getenv("SCHEDULER_CONCURRENCY", "20")),
+        )
+        await app.state.scheduler.start()
     await send_initial_message()
+    try:
+        yield
+    finally:
+        if app.state.scheduler is not None:
+            await app.state.scheduler.stop()
+        await app.state.webhook_queue.stop(timeout=float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30")))
+        await integrator.close()
+        await whatsapp.close()
+
+# Initialize FastAPI app
+app = FastAPI(lifespan=lifespan)
 
 # Root endpoint
 @app.get("/")
 async def root():
     return {"message": "WhatsApp Webhook Server is running"}
 
-# Webhook endpoint
+# Webhook endpoint: validate, enqueue and acknowledge right away so the
+# provider does not retry; the queue workers do the actual processing
 @app.post("/webhook/whatsapp")
 async def whatsapp_webhook(request: Request):
     try:
         webhook_data = await request.json()
-        logger.info(f"Received webhook data: {webhook_data}")  # Log the payload
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
 
-        # Verify if it's a message notification
-        if "messages" in webhook_data:
-            message = webhook_data["messages"][0]
-            phone_number = message["from"]  # Sender's phone number
-            message_text = message["text"]["body"]  # Message content
-            message_id = message["id"]  # Unique message ID
+    if not isinstance(webhook_data, dict):
+        raise HTTPException(status_code=400, detail="Webhook payload must be a JSON object")
+    if "messages" in webhook_data and not isinstance(webhook_data["messages"], list):
+        raise HTTPException(status_code=400, detail="'messages' must be a list")
 
-            # Log the message details
-            logger.info(f"Received message from {phone_number}: {message_text}")
+    if not request.app.state.webhook_queue.submit(webhook_data):
+        # Let the provider redeliver once we have caught up
+        raise HTTPException(status_code=503, detail="Webhook queue is full")
 
-            # Send a response
-            response_text = "Thanks for your message! How can I help you today?"
-            return {"status": "success", "message": response_text}
+    return {"status": "success", "message": "Webhook received"}
 
-        return {"status": "success", "message": "Webhook received"}
+# Webhook queue metrics
+@app.get("/webhook/stats")
+async def webhook_stats(request: Request):
+    return request.app.state.webhook_queue.stats()
 
-    except Exception as e:
-        logger.error(f"Error in webhook handler: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+# LLM client, circuit breaker, template fallback and request coalescing metrics
+@app.get("/llm/stats")
+async def llm_stats(request: Request):
+    integrator = request.app.state.integrator
+    return {
+        'client': integrator.llm.stats(),
+        'templates': integrator.dynamic_templates.stats(),
+        'insights': integrator.performance_analyzer.single_flight.stats()
+    }
+
+# Campaign scheduler progress for this worker's shard
+@app.get("/scheduler/stats")
+async def scheduler_stats(request: Request):
+    scheduler = request.app.state.scheduler
+    if scheduler is None:
+        raise HTTPException(status_code=404, detail="Scheduler is not enabled")
+    return scheduler.stats()
 
 # Run the server
 if __name__ == "__main__":